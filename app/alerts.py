@@ -0,0 +1,231 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from app import instrument
+
+# Override to point at a local stub (utils/telegram_stub.py) in tests / load runs
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LEN = 4096
+
+# Separator between coalesced events in one message
+EVENT_SEPARATOR = "\n\n"
+
+def coalesce(messages, limit=MAX_MESSAGE_LEN):
+    """
+    Packs messages into as few Telegram-sized chunks as possible, keeping order.
+    A single message longer than `limit` is split on line boundaries; a line longer than
+    `limit` on its last space (hard split only for a space-less run). A split can still cut
+    a Markdown entity: the dispatcher then resends that chunk as plain text.
+    """
+    pieces = []
+    for msg in messages:
+        if len(msg) <= limit:
+            pieces.append(msg)
+            continue
+        current = ""
+        for line in msg.split("\n"):
+            while len(line) > limit:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                cut = line.rfind(" ", 1, limit + 1)
+                cut = cut if cut > 0 else limit
+                pieces.append(line[:cut])
+                line = line[cut:].lstrip(" ")
+            candidate = f"{current}\n{line}" if current else line
+            if len(candidate) > limit:
+                pieces.append(current)
+                current = line
+            else:
+                current = candidate
+        if current:
+            pieces.append(current)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}{EVENT_SEPARATOR}{piece}" if current else piece
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+class AlertDispatcher:
+    """
+    Background Telegram sender.
+
+    - send() / send_photo() only enqueue, so a slow Telegram never blocks the trading loop.
+    - One pooled requests.Session is reused for every call.
+    - Inside `with dispatcher.batch():` messages are held and coalesced into as few
+      messages as the size limit allows when the block exits.
+    - Failed calls are retried with exponential backoff (honours 429 retry_after).
+    - stats() reports delivery latency (enqueue -> delivered).
+    """
+    def __init__(self, token=None, chat_id=None, base_url=None, timeout=10, max_retries=3, backoff=1.0, pool_size=4):
+        self.token = token if token is not None else os.getenv("TELEGRAM_TOKEN")
+        self.chat_id = chat_id if chat_id is not None else os.getenv("TELEGRAM_CHAT_ID")
+        self.base_url = (base_url or TELEGRAM_API_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._queue = queue.Queue()
+        self._pending = []
+        self._batch_depth = 0
+        self._lock = threading.Lock()
+        self._worker = None
+        self._warned = False
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.latencies = []
+
+    @property
+    def enabled(self):
+        return bool(self.token and self.chat_id)
+
+    def send(self, message):
+        print(f"ALERT: {message}")
+        if not self.enabled:
+            if not self._warned:
+                print("Telegram Chat ID not found. Set TELEGRAM_CHAT_ID env var.")
+                self._warned = True
+            return
+        with self._lock:
+            if self._batch_depth:
+                self._pending.append(message)
+                return
+        self._enqueue(('sendMessage', message))
+
+    def send_photo(self, path, caption=""):
+        print(f"CHART: {path}")
+        if not self.enabled:
+            return
+        self._enqueue(('sendPhoto', (path, caption)))
+
+    @contextmanager
+    def batch(self):
+        """Coalesce every send() in the block into the minimum number of messages."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                pending = self._pending if not self._batch_depth else []
+                if not self._batch_depth:
+                    self._pending = []
+            for chunk in coalesce(pending):
+                self._enqueue(('sendMessage', chunk))
+
+    def flush(self):
+        """Blocks until every queued alert was delivered or gave up."""
+        if self._worker is not None:
+            self._queue.join()
+
+    def close(self):
+        self.flush()
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+        self.session.close()
+        if self.sent or self.failed:
+            print(f"Alerts: {self.stats()}")
+
+    def stats(self):
+        lat = sorted(self.latencies)
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'latency_ms_p50': pct(0.50),
+            'latency_ms_p95': pct(0.95),
+            'latency_ms_max': round(lat[-1] * 1000, 1) if lat else None,
+        }
+
+    def _enqueue(self, item):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._worker.start()
+        self._queue.put((time.monotonic(), item))
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                queued_at, (method, payload) = entry
+                if self._deliver(method, payload):
+                    self.sent += 1
+                    self.latencies.append(time.monotonic() - queued_at)
+                else:
+                    self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, method, payload):
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        for attempt in range(self.max_retries + 1):
+            instrument.network_call("telegram")
+            try:
+                if method == 'sendPhoto':
+                    path, caption = payload
+                    with open(path, "rb") as f:
+                        resp = self.session.post(url, data={'chat_id': self.chat_id, 'caption': caption},
+                                                 files={'photo': f}, timeout=self.timeout)
+                else:
+                    resp = self.session.post(url, data={'chat_id': self.chat_id, 'text': payload, 'parse_mode': 'Markdown'},
+                                             timeout=self.timeout)
+                    if resp.status_code == 400 and "can't parse" in resp.text.lower():
+                        # Broken Markdown (e.g. an entity cut by a split): send the text as is
+                        print(f"Telegram could not parse Markdown, resending as plain text: {resp.text[:200]}")
+                        instrument.network_call("telegram")
+                        resp = self.session.post(url, data={'chat_id': self.chat_id, 'text': payload},
+                                                 timeout=self.timeout)
+
+                if resp.status_code == 200:
+                    return True
+
+                delay = self.backoff * (2 ** attempt)
+                if resp.status_code == 429:
+                    try:
+                        delay = max(delay, resp.json().get('parameters', {}).get('retry_after', 0))
+                    except ValueError:
+                        pass
+                elif 400 <= resp.status_code < 500:
+                    # Bad request (e.g. broken Markdown) won't succeed on retry
+                    print(f"Telegram rejected {method}: {resp.status_code} {resp.text[:200]}")
+                    return False
+                error = f"HTTP {resp.status_code}"
+            except (requests.RequestException, OSError) as e:
+                delay = self.backoff * (2 ** attempt)
+                error = str(e)
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                time.sleep(delay)
+
+        print(f"Failed to send Telegram {method} after {self.max_retries + 1} attempts: {error}")
+        return False
@@ -0,0 +1,331 @@
+"""
+Gap detection and targeted backfill for daily_prices.
+
+detect_gaps compares every ticker's stored dates with the NSE session calendar
+(app.trading_calendar) in one pass over a (ticker x session) matrix and coalesces
+missing sessions into date ranges:
+- holes in the middle of the history,
+- the tail since the last stored bar (which is refetched too, it may have been partial),
+- a HISTORY_DAYS initial pull for tickers with no bars.
+
+Ranges go to the price_gaps queue; drain() fetches exactly those ranges. A range for which
+the source has no bars (suspension, pre-listing) is marked empty and not asked for again.
+
+Run: python -m app.backfill [--tickers A B ...] [--bridge N] [--dry-run]
+"""
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+from app.database import DailyPrice, PriceGap, Stock
+from app.corporate_actions import invalidate_derived
+from app.fundamentals import RateLimiter
+from app.sources import get_source
+from app import instrument, trading_calendar
+
+# Initial pull for tickers without bars
+HISTORY_DAYS = 365 * 2
+
+# Failed fetches of a range are retried on later runs up to this many times
+MAX_ATTEMPTS = 5
+
+# A capped range is tried again (attempts reset) once its last failure is this old
+RETRY_AFTER = timedelta(days=3)
+
+# Bars loaded before the first new bar so indicators (EMA 200) are computed over real history
+INDICATOR_WARMUP_DAYS = 400
+
+INDICATOR_COLUMNS = {'RSI_14': 'rsi_14', 'EMA_200': 'ema_200', 'EMA_50': 'ema_50', 'EMA_20': 'ema_20'}
+
+def _stored_dates(db: Session, tickers):
+    """
+    {ticker: datetime64[D] array} of stored dates. One group_concat row per ticker keeps
+    this far cheaper than materialising a Python row per bar.
+    """
+    wanted = set(tickers)
+    rows = db.connection().exec_driver_sql(
+        "SELECT ticker, group_concat(date, ',') FROM daily_prices GROUP BY ticker").fetchall()
+    stored = {t: np.unique(np.array(dates.split(','), dtype='datetime64[D]'))
+              for t, dates in rows if t in wanted and dates}
+    instrument.count("rows_read", sum(len(d) for d in stored.values()))
+    return stored
+
+def _known_empty(db: Session, tickers):
+    rows = db.query(PriceGap.ticker, PriceGap.start_date, PriceGap.end_date).filter(
+        PriceGap.status == 'empty', PriceGap.ticker.in_(tickers)).all()
+    return rows
+
+def coalesce(missing, session_days, tickers, bridge=0):
+    """
+    (ticker x session) boolean matrix -> ticker, start_date, end_date, sessions rows, one per
+    run of missing sessions. Runs separated by <= `bridge` present sessions are merged
+    (one fetch instead of two, at the cost of refetching the bridged bars).
+    """
+    padded = np.zeros((missing.shape[0], missing.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = missing
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1) # row-major, so aligned with the starts
+    ranges = pd.DataFrame({'row': rows, 'start': starts, 'end': ends - 1})
+    if ranges.empty:
+        return pd.DataFrame(columns=['ticker', 'start_date', 'end_date', 'sessions'])
+
+    if bridge:
+        new_group = (ranges['row'] != ranges['row'].shift()) | (ranges['start'] - ranges['end'].shift() - 1 > bridge)
+        ranges = ranges.groupby(new_group.cumsum()).agg(row=('row', 'first'), start=('start', 'first'), end=('end', 'last'))
+
+    session_days = np.asarray(session_days)
+    return pd.DataFrame({
+        'ticker': np.asarray(tickers, dtype=object)[ranges['row'].to_numpy()],
+        'start_date': pd.to_datetime(session_days[ranges['start'].to_numpy()]).date,
+        'end_date': pd.to_datetime(session_days[ranges['end'].to_numpy()]).date,
+        'sessions': (ranges['end'] - ranges['start'] + 1).to_numpy(),
+    })
+
+def detect_gaps(db: Session, tickers, end=None, history_days=HISTORY_DAYS, bridge=0, refresh_last=True):
+    """Missing sessions per ticker, coalesced into ranges (see module docstring)."""
+    tickers = list(dict.fromkeys(tickers))
+    end = trading_calendar.last_session(end)
+    if not tickers or end is None:
+        return coalesce(np.zeros((0, 0), dtype=bool), [], [])
+
+    stored = _stored_dates(db, tickers)
+    default_start = np.datetime64(end - timedelta(days=history_days), 'D')
+    start = min([d[0] for d in stored.values()] + [default_start])
+    days = trading_calendar.sessions(pd.Timestamp(start).date(), end)
+
+    index = {t: i for i, t in enumerate(tickers)}
+    codes = np.concatenate([np.full(len(d), index[t]) for t, d in stored.items()] + [np.zeros(0, dtype=int)])
+    dates = np.concatenate(list(stored.values()) + [np.zeros(0, dtype='datetime64[D]')])
+
+    if not trading_calendar.has_exchange_calendar() and len(dates):
+        # Weekday calendar: weekdays nobody has a bar for are holidays
+        holidays = trading_calendar.observed_holidays(days, dates, before=dates.max())
+        days = days[~np.isin(days, holidays)]
+
+    # Presence matrix
+    pos = np.searchsorted(days, dates)
+    on_session = pos < len(days)
+    on_session[on_session] = days[pos[on_session]] == dates[on_session]
+    present = np.zeros((len(tickers), len(days)), dtype=bool)
+    present[codes[on_session], pos[on_session]] = True
+
+    # Expected from each ticker's first bar (listing), or the default history start
+    first = np.array([stored[t][0] if t in stored else default_start for t in tickers], dtype='datetime64[D]')
+    expected = np.arange(len(days))[None, :] >= np.searchsorted(days, first)[:, None]
+    missing = expected & ~present
+
+    if refresh_last:
+        has_bars = present.any(axis=1)
+        last_idx = len(days) - 1 - np.argmax(present[:, ::-1], axis=1)
+        missing[np.nonzero(has_bars)[0], last_idx[has_bars]] = True
+
+    # Ranges the source already answered with no bars
+    for ticker, s, e in _known_empty(db, tickers):
+        cols = (days >= np.datetime64(s, 'D')) & (days <= np.datetime64(e, 'D'))
+        missing[index[ticker], cols] = False
+
+    return coalesce(missing, days, tickers, bridge=bridge)
+
+def enqueue(db: Session, ranges):
+    """
+    Replaces the tickers' queued ranges with `ranges` (pending), keeping attempt counts,
+    last error and last attempt time (updated_at) of the same ranges seen before. A range
+    whose end moved (the tail range after a new session) or whose last attempt is older
+    than RETRY_AFTER starts again from 0, so an outage does not cap a ticker for good.
+    Empty ranges are kept, they are what stops refetching.
+    """
+    now = datetime.utcnow()
+    tickers = ranges['ticker'].unique().tolist()
+    kept = {}
+    if tickers:
+        kept = {(t, s, e): {'attempts': a or 0, 'last_error': error, 'updated_at': updated}
+                for t, s, e, a, error, updated in db.query(
+                    PriceGap.ticker, PriceGap.start_date, PriceGap.end_date, PriceGap.attempts,
+                    PriceGap.last_error, PriceGap.updated_at
+                ).filter(PriceGap.status == 'pending', PriceGap.ticker.in_(tickers)).all()
+                if updated is not None and now - updated < RETRY_AFTER}
+        db.query(PriceGap).filter(PriceGap.status != 'empty', PriceGap.ticker.in_(tickers)).delete(
+            synchronize_session=False)
+
+    fresh = {'attempts': 0, 'last_error': None, 'updated_at': now}
+    records = [
+        {**r, 'sessions': int(r['sessions']), 'status': 'pending',
+         **kept.get((r['ticker'], r['start_date'], r['end_date']), fresh)}
+        for r in ranges.to_dict('records')
+    ]
+    if records:
+        db.execute(PriceGap.__table__.insert(), records)
+    db.commit()
+    return len(records)
+
+def parse_history(data):
+    """nselib equity history frame -> date, Open, High, Low, Close, Volume (EQ series, sorted)."""
+    if 'Series' in data.columns:
+        data = data[data['Series'] == 'EQ']
+    rename_map = {'OpenPrice': 'Open', 'HighPrice': 'High', 'LowPrice': 'Low',
+                  'ClosePrice': 'Close', 'TotalTradedQuantity': 'Volume'}
+    df = pd.DataFrame({'date': pd.to_datetime(data['Date'], format='%d-%b-%Y').dt.date})
+    for src, col in rename_map.items():
+        df[col] = pd.to_numeric(data[src].astype(str).str.replace(',', '', regex=False), errors='coerce')
+    df = df.dropna(subset=['Close'])
+    return df.drop_duplicates(subset=['date'], keep='last').sort_values('date').reset_index(drop=True)
+
+def _write_bars(db: Session, ticker, bars):
+    """Inserts new bars; bars already stored (the refreshed last bar) are merged like before. Returns (added, updated)."""
+    existing = {r.date: r for r in db.query(DailyPrice).filter(
+        DailyPrice.ticker == ticker, DailyPrice.date.in_(bars['date'].tolist())).all()}
+    new = bars[~bars['date'].isin(existing)]
+    for row in bars[bars['date'].isin(existing)].itertuples(index=False):
+        rec = existing[row.date]
+        rec.high = max(rec.high, row.High)
+        rec.low = min(rec.low, row.Low)
+        rec.close = row.Close
+        rec.volume = int(row.Volume)
+    if not new.empty:
+        records = pd.DataFrame({
+            'ticker': ticker, 'date': new['date'], 'open': new['Open'], 'high': new['High'],
+            'low': new['Low'], 'close': new['Close'], 'volume': new['Volume'].fillna(0).astype('int64'),
+        })
+        db.execute(DailyPrice.__table__.insert(), records.astype(object).to_dict('records'))
+    return len(new), len(existing)
+
+def _update_indicators(db: Session, ticker, from_date, indicators):
+    """Recomputes indicator columns from `from_date` over stored bars plus a warm-up window."""
+    from app.prices import load_price_frame
+    df = load_price_frame(db, ticker, start_date=from_date - timedelta(days=INDICATOR_WARMUP_DAYS), adjusted=False)
+    if df.empty:
+        return
+    df = indicators(ticker, df)
+    df = df[df.index >= pd.Timestamp(from_date)]
+    cols = [c for c in INDICATOR_COLUMNS if c in df.columns]
+    out = df[['id'] + cols].rename(columns={'id': '_id', **INDICATOR_COLUMNS})
+    records = out.astype(object).where(out.notna(), None).to_dict('records')
+    if records:
+        table = DailyPrice.__table__
+        db.execute(table.update().where(table.c.id == bindparam('_id')).values(
+            **{INDICATOR_COLUMNS[c]: bindparam(INDICATOR_COLUMNS[c]) for c in cols}), records)
+
+def drain(db: Session, tickers=None, source=None, rate=1.0, indicators=None, limit=None):
+    """
+    Fetches pending ranges (fewest attempts first) and writes their bars, one commit per range.
+    `indicators(ticker, df) -> df` adds RSI_14 / EMA_* columns (fetcher.process_stock_data).
+    Returns a summary dict.
+    """
+    source = source or get_source()
+    limiter = RateLimiter(rate)
+    query = db.query(PriceGap).filter(PriceGap.status == 'pending', PriceGap.attempts < MAX_ATTEMPTS)
+    if tickers is not None:
+        query = query.filter(PriceGap.ticker.in_(list(tickers)))
+    gaps = query.order_by(PriceGap.attempts.asc(), PriceGap.ticker.asc(), PriceGap.start_date.asc()).all()
+    if limit is not None:
+        gaps = gaps[:limit]
+
+    # Today's bar may simply not be published yet: never mark the latest session empty
+    latest = trading_calendar.last_session()
+    summary = {'ranges': len(gaps), 'filled': 0, 'empty': 0, 'failed': 0, 'added': 0, 'updated': 0}
+    print(f"Backfilling {len(gaps)} ranges ({sum(g.sessions for g in gaps)} sessions)...")
+    for gap in gaps:
+        ticker, start, end = gap.ticker, gap.start_date, gap.end_date
+        try:
+            limiter.wait()
+            data = source.equity_history(ticker, start, end)
+            bars = parse_history(data) if data is not None and not data.empty else pd.DataFrame(columns=['date'])
+            bars = bars[(bars['date'] >= start) & (bars['date'] <= end)]
+
+            gap.updated_at = datetime.utcnow()
+            gap.status = 'filled'
+            if not bars.empty:
+                added, updated = _write_bars(db, ticker, bars)
+                if indicators is not None:
+                    # Price frames are read through db.bind, which only sees committed bars
+                    db.commit()
+                    _update_indicators(db, ticker, bars['date'].iloc[0], indicators)
+                # Signals / weekly and monthly bars over the filled sessions were built without them
+                invalidate_derived(db, ticker, bars['date'].iloc[0])
+                summary['added'] += added
+                summary['updated'] += updated
+                instrument.count("rows_written", added + updated)
+                print(f"Processed {ticker} {start} -> {end}: Added {added}, Updated {updated}")
+
+            # Sessions the source has no bar for are remembered as empty ranges
+            absent = _absent_runs(ticker, start, min(end, latest - timedelta(days=1)), bars['date'])
+            for run in absent.to_dict('records'):
+                if run['start_date'] == start:
+                    gap.status, gap.end_date, gap.sessions = 'empty', run['end_date'], int(run['sessions'])
+                else:
+                    db.merge(PriceGap(
+                        ticker=ticker, start_date=run['start_date'], end_date=run['end_date'],
+                        sessions=int(run['sessions']), status='empty', attempts=0, updated_at=gap.updated_at))
+            if bars.empty and gap.status != 'empty':
+                gap.status = 'pending' # Latest session not published yet, picked up again next run
+            if not absent.empty:
+                summary['empty'] += 1
+                print(f"No bars for {ticker} on {int(absent['sessions'].sum())} sessions in {start} -> {end}")
+            db.commit()
+            summary['filled'] += gap.status == 'filled'
+        except Exception as e:
+            db.rollback()
+            gap.attempts = (gap.attempts or 0) + 1
+            gap.last_error = str(e)[:500]
+            gap.updated_at = datetime.utcnow()
+            db.commit()
+            summary['failed'] += 1
+            print(f"Failed {ticker} {start} -> {end}: {e}")
+    return summary
+
+def _absent_runs(ticker, start, end, got_dates):
+    """Sessions in [start, end] without a bar in got_dates, coalesced into ranges."""
+    if end < start:
+        return coalesce(np.zeros((0, 0), dtype=bool), [], [])
+    days = trading_calendar.sessions(start, end)
+    got = np.array(pd.to_datetime(pd.Series(list(got_dates), dtype=object)).values, dtype='datetime64[D]')
+    return coalesce(~np.isin(days, got)[None, :], days, [ticker])
+
+def ensure_stocks(db: Session, tickers):
+    known = {t for (t,) in db.query(Stock.ticker).filter(Stock.ticker.in_(list(tickers)))}
+    missing = [t for t in dict.fromkeys(tickers) if t not in known]
+    if missing:
+        db.add_all([Stock(ticker=t, company_name=t, sector="Unknown") for t in missing])
+        db.commit()
+
+def backfill(db: Session, tickers, source=None, rate=1.0, indicators=None, end=None, bridge=0):
+    """Detect, enqueue and drain in one go. Returns the drain summary plus the detected ranges."""
+    ensure_stocks(db, tickers)
+    with instrument.stage("detect_gaps"):
+        ranges = detect_gaps(db, tickers, end=end, bridge=bridge)
+    enqueue(db, ranges)
+    print(f"Detected {len(ranges)} ranges / {int(ranges['sessions'].sum())} sessions "
+          f"across {ranges['ticker'].nunique()} tickers.")
+    with instrument.stage("backfill"):
+        summary = drain(db, tickers, source=source, rate=rate, indicators=indicators)
+    summary['detected'] = len(ranges)
+    return summary
+
+def main():
+    import argparse
+    from app.database import get_db, init_db
+
+    parser = argparse.ArgumentParser(description="Detect missing daily bars and backfill exactly those ranges.")
+    parser.add_argument("--tickers", nargs="+", help="Default: every ticker in stocks")
+    parser.add_argument("--bridge", type=int, default=0, help="Merge ranges separated by <= N stored sessions")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the detected ranges")
+    args = parser.parse_args()
+
+    init_db()
+    db = next(get_db())
+    try:
+        tickers = args.tickers or [t for (t,) in db.query(Stock.ticker)]
+        if args.dry_run:
+            ranges = detect_gaps(db, tickers, bridge=args.bridge)
+            print(ranges.to_string(index=False) if not ranges.empty else "No gaps.")
+            return
+        from app.fetcher import process_stock_data, HISTORY_RATE
+        with instrument.run("backfill"):
+            backfill(db, tickers, rate=HISTORY_RATE, indicators=process_stock_data, bridge=args.bridge)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import pandas as pd
+from datetime import timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import DailyPrice, Signal
+from app.prices import load_price_frame
+from app.smc_agent import analyze_ticker
+
+# Bars loaded before the window so SMC flags at the left edge see full context.
+# EMA 200 is not recomputed here, it is read from daily_prices (full-history EMA).
+WARMUP_BARS = 20
+
+# More candles than this can't be told apart on a dashboard-width chart
+MAX_POINTS = 500
+
+# Downsampling steps, tried in order until the series fits in max_points
+RESAMPLE_RULES = [('W-FRI', 'Weekly'), ('MS', 'Monthly'), ('QS', 'Quarterly')]
+
+RANGES = {
+    '3M': 91, '6M': 182, '1Y': 365, '3Y': 365 * 3, '5Y': 365 * 5, 'Max': None
+}
+
+MARKERS = ['bullish_ob', 'bullish_fvg']
+
+def _window_start(db: Session, ticker, start):
+    """Date WARMUP_BARS bars before `start` (None = from the first bar)."""
+    if start is None:
+        return None
+    warmup = [d for (d,) in db.query(DailyPrice.date).filter(
+        DailyPrice.ticker == ticker, DailyPrice.date < start
+    ).order_by(DailyPrice.date.desc()).limit(WARMUP_BARS).all()]
+    return warmup[-1] if warmup else start
+
+def _markers(db: Session, ticker, df):
+    """SMC marker columns, from the signals table when it covers the window, else analyze_ticker."""
+    first, last = df.index[0].date(), df.index[-1].date()
+    covered = db.query(func.max(Signal.date)).filter(Signal.ticker == ticker).scalar()
+
+    if covered is not None and covered >= last:
+        sig = pd.read_sql(db.query(Signal.date, *[getattr(Signal, m) for m in MARKERS]).filter(
+            Signal.ticker == ticker, Signal.date >= first, Signal.date <= last
+        ).statement, db.bind)
+        sig['date'] = pd.to_datetime(sig['date'])
+        sig = sig.set_index('date').reindex(df.index)
+        for m in MARKERS:
+            df[m] = sig[m].fillna(False).astype(bool)
+        return df
+
+    _, s_df = analyze_ticker(ticker, df)
+    for m in MARKERS:
+        df[m] = s_df[m].astype(bool)
+    return df
+
+def downsample(df, max_points=MAX_POINTS):
+    """
+    OHLC-aggregates df to the finest of weekly / monthly / quarterly bars that
+    fits in max_points. Markers are kept if any bar in the period had one.
+    Returns (df, timeframe label).
+    """
+    if len(df) <= max_points:
+        return df, 'Daily'
+
+    agg = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
+    if 'Volume' in df.columns:
+        agg['Volume'] = 'sum'
+    if 'EMA_200' in df.columns:
+        agg['EMA_200'] = 'last'
+    for m in MARKERS:
+        if m in df.columns:
+            agg[m] = 'max'
+
+    out, label = df, 'Daily'
+    for rule, label in RESAMPLE_RULES:
+        out = df.resample(rule).agg(agg).dropna(subset=['Close'])
+        if len(out) <= max_points:
+            break
+    for m in MARKERS:
+        if m in out.columns:
+            out[m] = out[m].astype(bool)
+    return out, label
+
+def load_chart_data(db: Session, ticker, start=None, end=None, max_points=MAX_POINTS):
+    """
+    Chart series for one ticker and date window.
+
+    Loads only the window plus WARMUP_BARS bars, takes EMA 200 from the stored
+    (full-history) column, attaches SMC markers and downsamples when the window
+    has more bars than the chart can show.
+
+    Returns (df, timeframe) where df has Open/High/Low/Close/Volume/EMA_200 + marker columns.
+    """
+    df = load_price_frame(db, ticker, start_date=_window_start(db, ticker, start), end_date=end)
+    if df.empty:
+        return df, 'Daily'
+
+    if 'EMA_200' not in df.columns or df['EMA_200'].isna().all():
+        # Not stored yet (new ticker): best effort over what is loaded
+        df['EMA_200'] = df['Close'].ewm(span=200).mean()
+
+    df = _markers(db, ticker, df)
+
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+
+    cols = ['Open', 'High', 'Low', 'Close', 'Volume', 'EMA_200'] + MARKERS
+    return downsample(df[[c for c in cols if c in df.columns]], max_points=max_points)
+
+def range_start(latest_date, label):
+    """Start date for a range label ('6M', '1Y', ... 'Max') ending at latest_date."""
+    days = RANGES[label]
+    if days is None or latest_date is None:
+        return None
+    return latest_date - timedelta(days=days)
@@ -0,0 +1,263 @@
+"""
+Corporate actions and split / bonus adjusted prices.
+
+daily_prices always holds raw (as traded) bars. Each ticker's actions are folded into a
+step series of cumulative factors (adjustment_factors): a bar dated before the first
+ex_date is multiplied by the product of every action's factor, a bar on or after the last
+ex_date by 1. Adjusted OHLC is produced at load time (adjust_frame / adjust_panel) as one
+searchsorted + multiply, so raw bars never need rewriting or refetching.
+
+record_action rebuilds the ticker's factors and drops what was derived from unadjusted
+prices (signals, resampled bars) so the next EOD run rebuilds them.
+
+Run:
+    python -m app.corporate_actions add TICKER 2024-06-14 --split 10:2 | --bonus 1:1 | --factor 0.5
+    python -m app.corporate_actions list [TICKER]
+    python -m app.corporate_actions scan      # overnight gaps that look like unrecorded actions
+"""
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import CorporateAction, AdjustmentFactor, DailyPrice, Signal, ResampledPrice
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+EMA_LENGTH = 200 # Stored EMA_200 (app.fetcher)
+
+# Price ratios of common splits / bonuses, used by scan_gaps
+COMMON_FACTORS = (1 / 2, 1 / 3, 1 / 4, 1 / 5, 1 / 10, 2 / 3, 4 / 5)
+
+# ticker -> (ex_dates datetime64[D], multipliers); multipliers has one more entry (1.0) than ex_dates
+_cache = {}
+_cache_stamp = None
+
+def split_factor(old_face_value, new_face_value):
+    """Face value split, e.g. Rs 10 -> Rs 2 gives 0.2."""
+    return new_face_value / old_face_value
+
+def bonus_factor(new_shares, held_shares):
+    """Bonus of `new_shares` for every `held_shares`, e.g. 1:1 gives 0.5."""
+    return held_shares / (held_shares + new_shares)
+
+def rebuild_factors(db: Session, ticker):
+    """Recomputes a ticker's adjustment_factors rows from its actions (caller commits)."""
+    actions = db.query(CorporateAction.ex_date, CorporateAction.factor).filter(
+        CorporateAction.ticker == ticker).order_by(CorporateAction.ex_date.asc()).all()
+
+    # Several actions on one ex_date combine
+    by_date = {}
+    for ex_date, factor in actions:
+        by_date[ex_date] = by_date.get(ex_date, 1.0) * factor
+    dates = sorted(by_date)
+    cum = np.cumprod([by_date[d] for d in dates][::-1])[::-1] if dates else []
+
+    db.query(AdjustmentFactor).filter(AdjustmentFactor.ticker == ticker).delete(synchronize_session=False)
+    if dates:
+        db.execute(AdjustmentFactor.__table__.insert(), [
+            {'ticker': ticker, 'ex_date': d, 'cum_factor': float(c)} for d, c in zip(dates, cum)
+        ])
+    _cache.pop(ticker, None)
+    return len(dates)
+
+def invalidate_derived(db: Session, ticker, from_date=None):
+    """
+    Drops rows computed from the ticker's prices (all of them, or those covering bars from
+    `from_date` on); the next EOD run rebuilds them.
+    """
+    signals = db.query(Signal).filter(Signal.ticker == ticker)
+    resampled = db.query(ResampledPrice).filter(ResampledPrice.ticker == ticker)
+    if from_date is not None:
+        signals = signals.filter(Signal.date >= from_date)
+        resampled = resampled.filter(ResampledPrice.period_end >= from_date)
+    signals.delete(synchronize_session=False)
+    resampled.delete(synchronize_session=False)
+
+def record_action(db: Session, ticker, ex_date, factor, kind='SPLIT', note=None):
+    """Adds (or replaces) an action, then refreshes factors and invalidates derived data in one commit."""
+    if not factor or factor <= 0:
+        raise ValueError(f"Invalid adjustment factor: {factor}")
+    try:
+        db.merge(CorporateAction(ticker=ticker, ex_date=ex_date, kind=kind, factor=factor, note=note,
+                                 created_at=datetime.utcnow()))
+        db.flush()
+        rebuild_factors(db, ticker)
+        invalidate_derived(db, ticker)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    print(f"Recorded {kind} for {ticker} ex {ex_date} (factor {factor:.4f}).")
+
+def actions_stamp(db: Session):
+    """(count, latest created_at) of corporate_actions; changes whenever an action is recorded."""
+    return db.query(func.count(CorporateAction.ticker), func.max(CorporateAction.created_at)).one()
+
+def sync_cache(db: Session):
+    """Clears the factor cache if another process recorded actions (long-lived processes: dashboard)."""
+    global _cache_stamp
+    stamp = tuple(actions_stamp(db))
+    if stamp != _cache_stamp:
+        _cache.clear()
+        _cache_stamp = stamp
+
+def get_factors(db: Session, ticker):
+    """(ex_dates, multipliers) for a ticker, cached per process. None if it has no actions."""
+    if ticker not in _cache:
+        rows = db.query(AdjustmentFactor.ex_date, AdjustmentFactor.cum_factor).filter(
+            AdjustmentFactor.ticker == ticker).order_by(AdjustmentFactor.ex_date.asc()).all()
+        if rows:
+            ex_dates = np.array([d for d, _ in rows], dtype='datetime64[D]')
+            multipliers = np.append(np.array([c for _, c in rows], dtype=float), 1.0)
+            _cache[ticker] = (ex_dates, multipliers)
+        else:
+            _cache[ticker] = None
+    return _cache[ticker]
+
+def factor_series(dates, factors):
+    """Multiplier per bar date: the cumulative factor of the first ex_date after it (1.0 past the last)."""
+    ex_dates, multipliers = factors
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    return multipliers[np.searchsorted(ex_dates, dates, side='right')]
+
+def adjusted_ema(stored_ema, adjusted_close, f, length=EMA_LENGTH):
+    """
+    EMA of the adjusted closes. The stored EMA was computed on raw closes, so scaling it
+    by f is only right before the ex_date; for ~length bars after it the pre-split prices
+    still dominate. The first stored value (scaled by its factor) seeds the recursion, which
+    is exact when the frame starts at the ticker's first bar or after no ex_date.
+    """
+    stored_ema = np.asarray(stored_ema, dtype=float)
+    valid = np.flatnonzero(~np.isnan(stored_ema))
+    if not len(valid):
+        return stored_ema
+    start = valid[0]
+    x = np.asarray(adjusted_close, dtype=float).copy()
+    x[:start] = np.nan
+    x[start] = stored_ema[start] * f[start]
+    return pd.Series(x).ewm(span=length, adjust=False).mean().to_numpy()
+
+def adjust_frame(db: Session, ticker, df):
+    """
+    Split / bonus adjusted copy of a date-indexed Title Case price frame (volume scaled
+    inversely, EMA_200 recomputed from the adjusted closes).
+    """
+    factors = get_factors(db, ticker)
+    if factors is None or df.empty:
+        return df
+    f = factor_series(df.index.values, factors)
+    if (f == 1.0).all():
+        return df
+    df = df.copy()
+    cols = [c for c in PRICE_COLUMNS if c in df.columns]
+    df[cols] = df[cols].to_numpy(dtype=float) * f[:, None]
+    if 'EMA_200' in df.columns:
+        df['EMA_200'] = adjusted_ema(df['EMA_200'].to_numpy(dtype=float), df['Close'].to_numpy(dtype=float), f)
+    if 'Volume' in df.columns:
+        df['Volume'] = (df['Volume'].to_numpy(dtype=float) / f).round()
+    return df
+
+def adjust_panel(db: Session, panel):
+    """Adjusts a (date x ticker) close panel in place and returns it."""
+    if panel.empty:
+        return panel
+    tickers = [t for (t,) in db.query(AdjustmentFactor.ticker).filter(
+        AdjustmentFactor.ticker.in_(list(panel.columns))).distinct()]
+    for ticker in tickers:
+        panel[ticker] = panel[ticker].to_numpy(dtype=float) * factor_series(panel.index.values, get_factors(db, ticker))
+    return panel
+
+def adjust_rows(db: Session, df, price_columns=('open', 'high', 'low', 'close'), volume_column='volume'):
+    """Adjusts a long (ticker, date, ...) frame of daily_prices rows in place and returns it."""
+    if df.empty:
+        return df
+    tickers = [t for (t,) in db.query(AdjustmentFactor.ticker).filter(
+        AdjustmentFactor.ticker.in_(df['ticker'].unique().tolist())).distinct()]
+    cols = list(price_columns)
+    for ticker in tickers:
+        rows = (df['ticker'] == ticker).to_numpy()
+        f = factor_series(pd.to_datetime(df.loc[rows, 'date']).values, get_factors(db, ticker))
+        df.loc[rows, cols] = df.loc[rows, cols].to_numpy(dtype=float) * f[:, None]
+        if volume_column in df.columns:
+            df.loc[rows, volume_column] = (df.loc[rows, volume_column].to_numpy(dtype=float) / f).round()
+    return df
+
+def scan_gaps(db: Session, tickers=None, start_date=None, tolerance=0.03):
+    """
+    Overnight gaps whose open / previous close ratio is within `tolerance` of a common
+    split / bonus factor and that are not explained by a recorded action.
+    Returns ticker, date, prev_close, open, ratio, factor.
+    """
+    query = db.query(DailyPrice.ticker, DailyPrice.date, DailyPrice.open, DailyPrice.close)
+    if tickers is not None:
+        query = query.filter(DailyPrice.ticker.in_(tickers))
+    if start_date is not None:
+        query = query.filter(DailyPrice.date >= start_date)
+    df = pd.read_sql(query.statement, db.bind)
+    if df.empty:
+        return df
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values(['ticker', 'date']).drop_duplicates(['ticker', 'date'], keep='last')
+    df['prev_close'] = df.groupby('ticker')['close'].shift(1)
+    df['ratio'] = df['open'] / df['prev_close']
+
+    ratio = df['ratio'].to_numpy()
+    candidates = np.array(COMMON_FACTORS)
+    with np.errstate(invalid='ignore'):
+        nearest = candidates[np.nan_to_num(np.abs(ratio[:, None] - candidates), nan=np.inf).argmin(axis=1)]
+        close = np.abs(ratio / nearest - 1) <= tolerance
+    hits = df[close].assign(factor=nearest[close])
+
+    known = pd.read_sql(db.query(CorporateAction.ticker, CorporateAction.ex_date).statement, db.bind)
+    known_keys = set(zip(known['ticker'], pd.to_datetime(known['ex_date'])))
+    hits = hits[[k not in known_keys for k in zip(hits['ticker'], hits['date'])]]
+    hits['date'] = hits['date'].dt.date
+    return hits[['ticker', 'date', 'prev_close', 'open', 'ratio', 'factor']].reset_index(drop=True)
+
+def _ratio(text):
+    a, b = text.split(":")
+    return float(a), float(b)
+
+def main():
+    from app.database import get_db, init_db
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add")
+    add.add_argument("ticker")
+    add.add_argument("ex_date", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
+    kind = add.add_mutually_exclusive_group(required=True)
+    kind.add_argument("--split", type=_ratio, help="OLD:NEW face value, e.g. 10:2")
+    kind.add_argument("--bonus", type=_ratio, help="NEW:HELD shares, e.g. 1:1")
+    kind.add_argument("--factor", type=float, help="Raw price multiplier")
+    add.add_argument("--note")
+    show = sub.add_parser("list")
+    show.add_argument("ticker", nargs="?")
+    scan = sub.add_parser("scan")
+    scan.add_argument("--tolerance", type=float, default=0.03)
+    args = parser.parse_args()
+
+    init_db()
+    db = next(get_db())
+    try:
+        if args.command == "add":
+            if args.split:
+                record_action(db, args.ticker, args.ex_date, split_factor(*args.split), 'SPLIT', args.note)
+            elif args.bonus:
+                record_action(db, args.ticker, args.ex_date, bonus_factor(*args.bonus), 'BONUS', args.note)
+            else:
+                record_action(db, args.ticker, args.ex_date, args.factor, 'OTHER', args.note)
+        elif args.command == "list":
+            query = db.query(CorporateAction)
+            if args.ticker:
+                query = query.filter(CorporateAction.ticker == args.ticker)
+            print(pd.read_sql(query.order_by(CorporateAction.ticker, CorporateAction.ex_date).statement, db.bind).to_string(index=False))
+        else:
+            hits = scan_gaps(db, tolerance=args.tolerance)
+            print("No unexplained split-like gaps." if hits.empty else hits.to_string(index=False))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,48 +3,183 @@ import pandas as pd
 import plotly.graph_objects as go
 import sys
 import os
+import time
 
 # Add project root to path so 'app.database' is found
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import get_db, DailyPrice, Stock
+from sqlalchemy import select, func
+from app.database import get_db, get_engine, DailyPrice, Stock, FundamentalSnapshot, Signal, TradeStat, RelativeStrength
 from app.smc_agent import analyze_ticker
+from app.relative_strength import get_rs_ranking, RS_WINDOWS
+from app.signals import scan_trend_ob
+from app.prices import load_price_frame
+from app import corporate_actions
+from app.chart_data import load_chart_data, range_start, RANGES
+from app.trade_stats import get_trade_stats, load_closed_trades, equity_curve, DIMENSIONS
 import numpy as np
 
 # Page Config
 st.set_page_config(page_title="Sniper Trading Dashboard", layout="wide", page_icon="🎯")
 
 # --- DATA LOADING ---
+# Cached loaders take a stamp of the stored bars as an argument, so the cache
+# key changes (and entries invalidate) as soon as new bars are written or the last one is rewritten.
+
+def price_stamp(ticker):
+    """
+    (latest date, bar count, latest bar OHLCV) of a ticker, the cache key of its price
+    loaders (two indexed lookups). Unlike MAX(date) alone it also changes when the last
+    bar is rewritten on the same date (intraday / EOD refresh, verify_data --repair).
+    """
+    last_bar = select(DailyPrice.date, DailyPrice.open, DailyPrice.high, DailyPrice.low, DailyPrice.close,
+                      DailyPrice.volume).where(DailyPrice.ticker == ticker).order_by(
+        DailyPrice.date.desc(), DailyPrice.id.desc()).limit(1)
+    with get_engine().connect() as conn:
+        bars = conn.execute(select(func.count()).where(DailyPrice.ticker == ticker)).scalar()
+        last = conn.execute(last_bar).first()
+    if last is None:
+        return (None, bars)
+    return (last[0], bars) + tuple(last[1:])
+
+def fundamentals_stamp():
+    with get_engine().connect() as conn:
+        return conn.execute(select(func.max(FundamentalSnapshot.fetched_at))).scalar()
+
 @st.cache_data
+def _load_tracked_stocks(stamp):
+    query = select(Stock.ticker, Stock.sector, Stock.current_pe, Stock.peg_ratio, Stock.quarterly_earnings_growth)
+    df = pd.read_sql(query, get_engine())
+    df['quarterly_earnings_growth'] = df['quarterly_earnings_growth'] * 100
+    return df.rename(columns={
+        'ticker': 'Ticker', 'sector': 'Sector', 'current_pe': 'PE',
+        'peg_ratio': 'PEG', 'quarterly_earnings_growth': 'Growth%'
+    })
+
 def load_tracked_stocks():
+    return _load_tracked_stocks(fundamentals_stamp())
+
+def actions_stamp():
+    """
+    Changes when a corporate action is recorded, so adjusted prices are reloaded.
+    Computed once per rerun and passed to the loaders.
+    """
     db = next(get_db())
-    stocks = db.query(Stock).all()
-    # Convert to list of dicts
-    data = []
-    for s in stocks:
-        data.append({
-            'Ticker': s.ticker,
-            'Sector': s.sector,
-            'PE': s.current_pe,
-            'PEG': s.peg_ratio,
-            'Growth%': s.quarterly_earnings_growth * 100 if s.quarterly_earnings_growth else None
-        })
-    db.close()
-    return pd.DataFrame(data)
-
-def load_price_data(ticker):
+    try:
+        stamp = tuple(corporate_actions.actions_stamp(db))
+        corporate_actions.sync_cache(db)
+    finally:
+        db.close()
+    return stamp
+
+@st.cache_data(max_entries=256)
+def _load_price_data(ticker, stamp, adjusted_at):
     db = next(get_db())
-    query = db.query(DailyPrice).filter(DailyPrice.ticker == ticker).order_by(DailyPrice.date.asc())
-    df = pd.read_sql(query.statement, db.bind)
-    db.close()
-    if not df.empty:
-        df['date'] = pd.to_datetime(df['date'])
-        # Handle duplicates to prevent reindexing errors
-        df = df.drop_duplicates(subset=['date'], keep='last')
-        df.set_index('date', inplace=True)
-        # Rename for consistency
-        df = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume', 'ema_200': 'EMA_200'})
-    return df
+    try:
+        return load_price_frame(db, ticker)
+    finally:
+        db.close()
+
+def load_price_data(ticker, adjusted_at):
+    return _load_price_data(ticker, price_stamp(ticker), adjusted_at)
+
+@st.cache_data(max_entries=256)
+def _analyze(ticker, stamp, adjusted_at):
+    df = _load_price_data(ticker, stamp, adjusted_at)
+    if df.empty:
+        return None, df
+    return analyze_ticker(ticker, df)
+
+def load_analysis(ticker, adjusted_at):
+    """(results, smc_df) for a ticker, recomputed only when its bars or corporate actions change."""
+    return _analyze(ticker, price_stamp(ticker), adjusted_at)
+
+# Sessions the scanner looks back over for a bullish OB
+SCAN_LOOKBACK = 3
+
+@st.cache_data(max_entries=8)
+def _scan_trend_ob(stamp):
+    """
+    Trend + OB scan read from the precomputed signals table (written by the EOD run).
+    1. Trend UP (Latest Close > EMA200)
+    2. Bullish OB within last SCAN_LOOKBACK sessions
+    """
+    db = next(get_db())
+    try:
+        hits = scan_trend_ob(db, lookback=SCAN_LOOKBACK)
+    finally:
+        db.close()
+    if hits.empty:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        'Ticker': hits['ticker'],
+        'Signal': 'BULLISH OB 🚀',
+        'Price': hits['close'],
+        'Date': hits['ob_date']
+    })
+
+def signals_stamp():
+    """
+    (signal rows, then latest date, rows, and close / EMA / trend / OB checksums of the
+    scanned sessions). Changes when signals are recomputed on the same date or dropped
+    after a corporate action / repair, not only when a new session is added.
+    """
+    sessions = select(Signal.date).distinct().order_by(Signal.date.desc()).limit(SCAN_LOOKBACK).scalar_subquery()
+    recent = select(func.max(Signal.date), func.count(), func.total(Signal.close), func.total(Signal.ema_200),
+                    func.total(Signal.trend == 'UP'), func.total(Signal.bullish_ob)).where(Signal.date.in_(sessions))
+    with get_engine().connect() as conn:
+        rows = conn.execute(select(func.count()).select_from(Signal)).scalar()
+        return (rows,) + tuple(conn.execute(recent).one())
+
+def load_scanner_results():
+    return _scan_trend_ob(signals_stamp())
+
+@st.cache_data(max_entries=256)
+def _load_chart(ticker, range_label, stamp, adjusted_at):
+    db = next(get_db())
+    try:
+        return load_chart_data(db, ticker, start=range_start(stamp[0], range_label))
+    finally:
+        db.close()
+
+def load_chart(ticker, range_label, adjusted_at):
+    return _load_chart(ticker, range_label, price_stamp(ticker), adjusted_at)
+
+def rs_stamp(window):
+    """(latest scored date, its rows, score checksum) of one RS window; changes when update_rs_table writes."""
+    latest = select(func.max(RelativeStrength.date)).where(RelativeStrength.window == window).scalar_subquery()
+    query = select(func.max(RelativeStrength.date), func.count(), func.total(RelativeStrength.rs_score)).where(
+        RelativeStrength.window == window, RelativeStrength.date == latest)
+    with get_engine().connect() as conn:
+        return tuple(conn.execute(query).one())
+
+@st.cache_data(max_entries=16)
+def _load_rs_ranking(window, stamp):
+    db = next(get_db())
+    try:
+        return get_rs_ranking(db, window=window, as_of=stamp[0]) if stamp[0] is not None else pd.DataFrame()
+    finally:
+        db.close()
+
+def load_rs_ranking(window):
+    return _load_rs_ranking(window, rs_stamp(window))
+
+def trade_stats_stamp():
+    """Latest trade_stats refresh; changes whenever closed trades are folded in."""
+    with get_engine().connect() as conn:
+        return conn.execute(select(func.max(TradeStat.updated_at))).scalar()
+
+@st.cache_data(max_entries=4)
+def _load_trade_stats(stamp):
+    db = next(get_db())
+    try:
+        stats = {dimension: get_trade_stats(db, dimension) for dimension in DIMENSIONS}
+        return stats, equity_curve(load_closed_trades(db))
+    finally:
+        db.close()
+
+def load_trade_stats():
+    return _load_trade_stats(trade_stats_stamp())
 
 # --- UI COMPONENTS ---
 st.title("🎯 Techno-Fundamental Sniper | Indian Markets")
@@ -52,17 +187,21 @@ st.title("🎯 Techno-Fundamental Sniper | Indian Markets")
 # Sidebar
 st.sidebar.header("Stock Selection")
 input_file = load_tracked_stocks()
+adjusted_at = actions_stamp()
 selected_ticker = st.sidebar.selectbox("Select Ticker", input_file['Ticker'].unique())
+chart_range = st.sidebar.radio("Chart Range", list(RANGES), index=2, horizontal=True)
 
 # --- MAIN ANALYSIS ---
 if selected_ticker:
-    df = load_price_data(selected_ticker)
+    load_start = time.perf_counter()
+    df = load_price_data(selected_ticker, adjusted_at)
     
     if df.empty:
         st.error("No data found for this ticker.")
     else:
-        # Run SMC Analysis
-        results, smc_df = analyze_ticker(selected_ticker, df)
+        # Run SMC Analysis (cached per ticker + latest stored date)
+        results, smc_df = load_analysis(selected_ticker, adjusted_at)
+        st.sidebar.caption(f"Data + analysis loaded in {(time.perf_counter() - load_start) * 1000:.0f} ms")
         
         # Latest Values
         latest = smc_df.iloc[-1]
@@ -101,8 +240,10 @@ if selected_ticker:
         # --- CHART ---
         st.subheader("Price Chart with Order Blocks")
         
-        # Filter for plotting (last 200 days)
-        plot_df = smc_df.tail(200)
+        # Window + warm-up only, stored EMA 200, downsampled for long ranges
+        plot_df, timeframe = load_chart(selected_ticker, chart_range, adjusted_at)
+        if timeframe != 'Daily':
+            st.caption(f"{timeframe} candles ({len(plot_df)} bars)")
         
         fig = go.Figure()
         
@@ -116,10 +257,8 @@ if selected_ticker:
             name='Price'
         ))
         
-        # EMA
-        # Calc EMA
-        plot_df['EMA_200_Plot'] = plot_df['Close'].ewm(span=200).mean()
-        fig.add_trace(go.Scatter(x=plot_df.index, y=plot_df['EMA_200_Plot'], mode='lines', name='200 EMA', line=dict(color='orange')))
+        # EMA (stored full-history EMA 200)
+        fig.add_trace(go.Scatter(x=plot_df.index, y=plot_df['EMA_200'], mode='lines', name='200 EMA', line=dict(color='orange')))
         
         # SMC Annotations (Markers)
         # Bullish OB
@@ -147,48 +286,53 @@ if selected_ticker:
         fig.update_layout(height=600, xaxis_rangeslider_visible=False)
         st.plotly_chart(fig, use_container_width=True)
 
+# --- RELATIVE STRENGTH ---
+st.header("📈 Relative Strength Leaders")
+rs_col1, rs_col2 = st.columns(2)
+rs_window = rs_col1.selectbox("RS Window (days)", RS_WINDOWS, index=1)
+rs_df = load_rs_ranking(rs_window)
+
+if rs_df.empty:
+    st.info("RS table is empty. It is filled by the EOD run.")
+else:
+    sectors = ["All"] + sorted(rs_df['sector'].dropna().unique().tolist())
+    rs_sector = rs_col2.selectbox("Sector", sectors)
+    if rs_sector != "All":
+        rs_df = rs_df[rs_df['sector'] == rs_sector]
+    st.caption(f"As of {rs_df['date'].iloc[0] if not rs_df.empty else '-'} (vs Nifty 50)")
+    st.dataframe(rs_df[['ticker', 'sector', 'rank', 'sector_rank', 'pct_change', 'rs_score']].head(25), use_container_width=True)
+
+# --- TRADE PERFORMANCE ---
+st.header("📊 Trade Performance")
+trade_stats, trade_curve = load_trade_stats()
+
+if trade_stats['all'].empty:
+    st.info("No closed trades yet. Stats are refreshed as trades close.")
+else:
+    overall = trade_stats['all'].iloc[0]
+    p1, p2, p3, p4, p5 = st.columns(5)
+    p1.metric("Closed Trades", int(overall['trades']))
+    p2.metric("Win Rate", f"{overall['win_rate']:.1f}%")
+    p3.metric("Expectancy", f"{overall['avg_r']:+.2f}R" if pd.notna(overall['avg_r']) else "N/A")
+    p4.metric("Total PnL", f"{overall['total_pnl']:.2f}")
+    p5.metric("Max Drawdown", f"{overall['max_drawdown']:.2f}")
+    st.line_chart(trade_curve[['cum_pnl', 'drawdown']])
+
+    breakdown = st.selectbox("Breakdown", [d for d in DIMENSIONS if d != 'all'])
+    st.dataframe(trade_stats[breakdown][['key', 'trades', 'win_rate', 'avg_r', 'profit_factor', 'total_pnl',
+                                         'max_drawdown', 'last_exit']], use_container_width=True)
+
 # --- WATCHLIST SCAN ---
 st.header("🔍 Market Scanner")
 st.write("Checking all tracked stocks for **Trend + OB** signals today...")
 
 if st.button("Run Scanner"):
-    alerts = []
-    progress = st.progress(0)
-    total = len(input_file)
-    
-    for i, row in input_file.iterrows():
-        t = row['Ticker']
-        d = load_price_data(t)
-        if d.empty: continue
-        
-        # Fast Analyze
-        # Only need last few rows? No, analyze_ticker needs context.
-        # But we can limit history passed if it helps speed. 
-        # analyze_ticker is fast enough for 5 years data on 10 stocks.
-        _, s_df = analyze_ticker(t, d)
-        
-        # Logic: 
-        # 1. Trend UP (Latest Close > EMA200)
-        # 2. Bullish OB within last 3 days?
-        
-        curr = s_df.iloc[-1]
-        ema = s_df['Close'].ewm(span=200).mean().iloc[-1]
-        
-        if curr['Close'] > ema:
-            # Check for OB in last 3 days
-            recent_3 = s_df.tail(3)
-            if recent_3['bullish_ob'].any():
-                alerts.append({
-                    'Ticker': t,
-                    'Signal': 'BULLISH OB 🚀',
-                    'Price': curr['Close'],
-                    'Date': recent_3[recent_3['bullish_ob']].index[-1].date()
-                })
-        
-        progress.progress((i + 1) / total)
+    # Precomputed per stored date; only the first click after an EOD update pays for the scan
+    with st.spinner("Scanning..."):
+        scan_df = load_scanner_results()
         
-    if alerts:
-        st.success(f"Found {len(alerts)} High Confidence Setups!")
-        st.table(pd.DataFrame(alerts))
+    if not scan_df.empty:
+        st.success(f"Found {len(scan_df)} High Confidence Setups!")
+        st.table(scan_df)
     else:
         st.info("No 'Trend + OB' signals found today.")
@@ -1,6 +1,8 @@
+import atexit
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Date, Float, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, String, Date, DateTime, Float, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
 
 Base = declarative_base()
 
@@ -62,19 +64,257 @@ class Trade(Base):
     
     stock = relationship("Stock", back_populates="trades")
 
+class Signal(Base):
+    """Daily SMC / trend flags per ticker, written incrementally by the EOD run."""
+    __tablename__ = "signals"
+    
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    
+    close = Column(Float)
+    low = Column(Float)
+    ema_200 = Column(Float, nullable=True)
+    trend = Column(String, nullable=True) # UP (Close > EMA200), DOWN, None if EMA not available yet
+    rs_5 = Column(Float, nullable=True) # 5-day RS vs Nifty (rs_scores)
+    history_bars = Column(Integer) # Bars of history up to and including this date
+    
+    # SMC flags (see app.smc_agent)
+    swing_high = Column(Boolean, default=False)
+    swing_low = Column(Boolean, default=False)
+    bullish_fvg = Column(Boolean, default=False)
+    bearish_fvg = Column(Boolean, default=False)
+    bullish_ob = Column(Boolean, default=False)
+    bearish_ob = Column(Boolean, default=False)
+    fvg_top = Column(Float, nullable=True)
+    fvg_bottom = Column(Float, nullable=True)
+    setup_low = Column(Float, nullable=True) # Low of candle i-2 on a bullish FVG (stop loss for FVG entries)
+    
+    __table_args__ = (
+        Index('ix_signals_date_fvg', 'date', 'bullish_fvg', 'trend'),
+        Index('ix_signals_date_ob', 'date', 'bullish_ob', 'trend'),
+    )
+
+class FundamentalSnapshot(Base):
+    """Raw nse_eq payload per ticker, used to skip refetching fresh fundamentals."""
+    __tablename__ = "fundamentals_cache"
+    
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    fetched_at = Column(DateTime, index=True) # UTC
+    payload = Column(Text) # JSON
+
+class SectorStats(Base):
+    """Materialized per-sector fundamentals, refreshed when fundamentals change."""
+    __tablename__ = "sector_stats"
+    
+    sector = Column(String, primary_key=True) # '__ALL__' holds the universe-wide values
+    median_pe = Column(Float, nullable=True) # Median PE of profitable (PE > 0) stocks
+    stock_count = Column(Integer)
+    updated_at = Column(DateTime) # UTC
+
+class RelativeStrength(Base):
+    """Precomputed relative strength vs Nifty, one row per (date, window, ticker)."""
+    __tablename__ = "rs_scores"
+    
+    date = Column(Date, primary_key=True)
+    window = Column(Integer, primary_key=True) # Lookback in trading days (5, 20, 60, 120)
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    
+    pct_change = Column(Float) # Ticker return over the window
+    rs_score = Column(Float) # Ticker return minus Nifty return over the same window
+    rank = Column(Integer) # 1 = strongest in the universe
+    pct_rank = Column(Float) # 0..1, 1 = strongest
+    sector_rank = Column(Integer, nullable=True) # 1 = strongest within its sector
+    
+    __table_args__ = (
+        Index('ix_rs_scores_lookup', 'date', 'window', 'rank'),
+        Index('ix_rs_scores_ticker', 'ticker', 'window', 'date'),
+    )
+
+class ResampledPrice(Base):
+    """Weekly / monthly OHLCV folded from daily_prices (app.resampled). The latest period per ticker may be partial."""
+    __tablename__ = "resampled_prices"
+    
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    timeframe = Column(String, primary_key=True) # W (weeks starting Monday), M (calendar months)
+    period_start = Column(Date, primary_key=True)
+    period_end = Column(Date) # Last daily bar folded into this period
+    
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Integer)
+    bars = Column(Integer) # Daily bars in the period
+
+class CorporateAction(Base):
+    """Splits / bonuses. Bars dated before ex_date are multiplied by `factor` when adjusted (app.corporate_actions)."""
+    __tablename__ = "corporate_actions"
+    
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    ex_date = Column(Date, primary_key=True)
+    kind = Column(String, primary_key=True) # SPLIT, BONUS, OTHER
+    factor = Column(Float) # Price multiplier, e.g. 0.5 for a 1:1 bonus or a 10 -> 5 face value split
+    note = Column(String, nullable=True)
+    created_at = Column(DateTime) # UTC
+
+class AdjustmentFactor(Base):
+    """
+    Cumulative adjustment factors, rebuilt from corporate_actions whenever a ticker gets a new action.
+    Bars dated before ex_date (and on / after the previous ex_date) are multiplied by cum_factor.
+    """
+    __tablename__ = "adjustment_factors"
+    
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    ex_date = Column(Date, primary_key=True)
+    cum_factor = Column(Float) # Product of the factors of this and all later actions
+
+class PriceGap(Base):
+    """Backfill queue: missing daily_prices sessions per ticker, coalesced into date ranges (app.backfill)."""
+    __tablename__ = "price_gaps"
+    
+    ticker = Column(String, ForeignKey('stocks.ticker'), primary_key=True)
+    start_date = Column(Date, primary_key=True)
+    end_date = Column(Date)
+    sessions = Column(Integer) # Missing sessions in the range
+    status = Column(String, index=True) # pending, filled, empty (source has no bars: suspension, pre-listing)
+    attempts = Column(Integer, default=0)
+    last_error = Column(String, nullable=True)
+    updated_at = Column(DateTime) # UTC
+
+class TradeStat(Base):
+    """Closed-trade performance per dimension value (app.trade_stats), refreshed as trades close."""
+    __tablename__ = "trade_stats"
+    
+    dimension = Column(String, primary_key=True) # all, ticker, sector, month, exit_reason
+    key = Column(String, primary_key=True) # '__ALL__' for dimension 'all', month as YYYY-MM
+    
+    trades = Column(Integer)
+    wins = Column(Integer)
+    losses = Column(Integer)
+    win_rate = Column(Float) # %
+    total_pnl = Column(Float) # Per share, as stored on trades
+    avg_return_pct = Column(Float)
+    avg_r = Column(Float, nullable=True) # Mean R-multiple = expectancy per unit of risk
+    avg_win_r = Column(Float, nullable=True)
+    avg_loss_r = Column(Float, nullable=True)
+    profit_factor = Column(Float, nullable=True) # Gross profit / gross loss, NULL without losses
+    max_drawdown = Column(Float) # Deepest fall of cumulative PnL from its running peak (<= 0)
+    first_exit = Column(Date)
+    last_exit = Column(Date)
+    updated_at = Column(DateTime) # UTC
+
+class SyncLog(Base):
+    """Base snapshot / changelog segments (app.db_sync) already applied to this DB file."""
+    __tablename__ = "sync_log"
+    
+    name = Column(String, primary_key=True) # File name under data/sync
+    kind = Column(String) # base, segment
+    applied_at = Column(DateTime) # UTC
+
 # Create database connection
-# Ensure data directory exists
-os.makedirs("data", exist_ok=True)
-DB_PATH = "sqlite:///data/market_data.db"
-engine = create_engine(DB_PATH, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DB_FILE = os.getenv("MARKET_DB_FILE", "data/market_data.db")
+DB_PATH = f"sqlite:///{DB_FILE}"
+
+# Applied on every new connection (see create_db_engine).
+# WAL lets readers (dashboard, analysis workers) run while the EOD job writes.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    'synchronous': os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"), # Safe with WAL, far fewer fsyncs than FULL
+    'cache_size': int(os.getenv("SQLITE_CACHE_KB", "65536")) * -1, # Negative = KiB
+    'mmap_size': int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 10000, # ms to wait on a lock instead of failing with 'database is locked'
+}
+
+def read_only_url(db_file=DB_FILE):
+    """SQLite URI opening the DB read-only (for analysis workers)."""
+    return f"sqlite:///file:{os.path.abspath(db_file)}?mode=ro&uri=true"
+
+def create_db_engine(db_file=DB_FILE, read_only=False, pragmas=None, pool_size=5, echo=False):
+    """
+    SQLite engine with the performance profile applied.
+
+    - pragmas: overrides SQLITE_PRAGMAS ({} = SQLite defaults)
+    - read_only: opens via a mode=ro URI, so a worker can never take the write lock
+    - QueuePool keeps connections (and their page cache / mmap) alive between sessions
+    """
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    if read_only:
+        url = read_only_url(db_file)
+    else:
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        url = f"sqlite:///{db_file}"
+
+    db_engine = create_engine(
+        url,
+        echo=echo,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        connect_args={'check_same_thread': False, 'timeout': pragmas.get('busy_timeout', 5000) / 1000},
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def _apply_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            if read_only and name == 'journal_mode':
+                continue # Journal mode is a property of the file, set by the writer
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return db_engine
+
+def checkpoint(db_engine=None):
+    """Folds the WAL back into the main DB file (call before copying / committing the .db file)."""
+    db_engine = db_engine or _engine
+    if db_engine is None:
+        return # Nothing was opened in this process
+    with db_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def _checkpoint_at_exit():
+    # Any script that wrote through get_engine() leaves the .db file self-contained
+    try:
+        checkpoint()
+    except Exception as e:
+        print(f"WAL checkpoint at exit failed: {e}")
+
+# Created on first use (get_engine / get_db), not at import: importing the models
+# must not touch the filesystem or open the DB (CLI startup, benchmarks, workers).
+_engine = None
+_session_factory = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine()
+        atexit.register(_checkpoint_at_exit)
+    return _engine
+
+def get_session_factory():
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory
+
+def __getattr__(name):
+    # Keeps `from app.database import engine / SessionLocal` working, lazily
+    if name == 'engine':
+        return get_engine()
+    if name == 'SessionLocal':
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
     print("Database initialized.")
 
 def get_db():
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
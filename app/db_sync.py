@@ -0,0 +1,378 @@
+"""
+Delta sync of the SQLite DB through git.
+
+Instead of committing data/market_data.db after every run, the workflows commit
+compact, append-only changelog files:
+
+    data/sync/base-<stamp>.jsonl.gz          full snapshot (periodically rewritten)
+    data/sync/segments/<stamp>.jsonl.gz      rows changed by one run (upserts + deletes)
+
+Each line of a file is one change record:
+    {"table": ..., "op": "upsert" | "delete", "columns": [...], "rows": [[...], ...]}
+
+restore  rebuilds the DB from base + segments, or only applies the new segments
+         when the local DB is already at the current base (sync_log table).
+export   diffs the DB against the state restored at startup (row hashes) and
+         writes the changed rows as a new segment. Compacts when segments pile up.
+
+Run: python -m app.db_sync restore | export | compact | status
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from datetime import datetime, timezone
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from sqlalchemy import select
+from app.database import Base, SyncLog, DB_FILE, create_db_engine
+
+SYNC_DIR = os.getenv("DB_SYNC_DIR", "data/sync")
+
+# Synced tables and their natural keys (rows are matched on these, not on surrogate ids)
+SYNC_TABLES = {
+    'stocks': ('ticker',),
+    'daily_prices': ('ticker', 'date'),
+    'trades': ('id',),
+    'signals': ('ticker', 'date'),
+    'fundamentals_cache': ('ticker',),
+    'sector_stats': ('sector',),
+    'rs_scores': ('date', 'window', 'ticker'),
+    'resampled_prices': ('ticker', 'timeframe', 'period_start'),
+    'corporate_actions': ('ticker', 'ex_date', 'kind'),
+    'adjustment_factors': ('ticker', 'ex_date'),
+    'price_gaps': ('ticker', 'start_date'),
+    'trade_stats': ('dimension', 'key'),
+}
+
+# Surrogate keys that are regenerated on restore
+SKIP_COLUMNS = {
+    'daily_prices': ('id',),
+}
+
+# Compact (rewrite the base, drop segments) when either limit is reached
+COMPACT_SEGMENTS = int(os.getenv("DB_SYNC_COMPACT_SEGMENTS", "100"))
+COMPACT_RATIO = float(os.getenv("DB_SYNC_COMPACT_RATIO", "0.5")) # Segment bytes / base bytes
+
+ROWS_PER_RECORD = 5000
+
+# Bumped when _row_hashes changes: older .synchash files are replayed instead of trusted
+HASH_VERSION = 2
+
+def _stamp():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _base_file(sync_dir):
+    files = sorted(glob.glob(os.path.join(sync_dir, "base-*.jsonl.gz")))
+    return files[-1] if files else None
+
+def _segment_files(sync_dir):
+    return sorted(glob.glob(os.path.join(sync_dir, "segments", "*.jsonl.gz")))
+
+def _hash_file(db_file):
+    # Local only, never committed: row hashes of the last restored / exported state
+    return f"{db_file}.synchash"
+
+def _json_default(value):
+    if hasattr(value, 'item'):
+        return value.item() # numpy scalars
+    raise TypeError(f"Not JSON serializable: {type(value)}")
+
+def _read_table(conn, table):
+    """Raw SQLite values (dates stay ISO strings) for a synced table, None if it doesn't exist."""
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    if not exists:
+        return None
+    df = pd.read_sql_query(f'SELECT * FROM "{table}"', conn)
+    df = df.drop(columns=[c for c in SKIP_COLUMNS.get(table, ()) if c in df.columns])
+    # Legacy duplicate bars (same ticker / date) collapse to the last one written
+    return df.drop_duplicates(subset=list(SYNC_TABLES[table]), keep='last').reset_index(drop=True)
+
+def _canonical(df):
+    """
+    Same values, same column types whatever dtype pandas inferred: numeric columns (int64,
+    or float64 once a NULL appears) and all-NULL columns become float64.
+    """
+    out = {}
+    for c in df.columns:
+        col = df[c]
+        if is_numeric_dtype(col) or col.isna().all():
+            col = col.astype('float64')
+        out[c] = col
+    return pd.DataFrame(out, index=df.index)
+
+def _row_hashes(df, table):
+    """uint64 hash per row of the values, indexed by the table key."""
+    df = df[sorted(df.columns)]
+    hashes = pd.util.hash_pandas_object(_canonical(df), index=False)
+    hashes.index = pd.MultiIndex.from_frame(df[list(SYNC_TABLES[table])])
+    return hashes
+
+def _records(table, op, df):
+    for i in range(0, len(df), ROWS_PER_RECORD):
+        chunk = df.iloc[i:i + ROWS_PER_RECORD]
+        yield {
+            'table': table,
+            'op': op,
+            'columns': list(chunk.columns),
+            'rows': chunk.astype(object).where(chunk.notna(), None).values.tolist(),
+        }
+
+def _write(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    count = 0
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=_json_default, separators=(',', ':')) + "\n")
+            count += len(record['rows'])
+    os.replace(tmp, path)
+    return count
+
+def _read(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _apply(conn, path, fresh=False):
+    """Applies one base / segment file. Upserts replace rows by key, so re-applying is harmless."""
+    rows = 0
+    for record in _read(path):
+        table, columns = record['table'], record['columns']
+        keys = SYNC_TABLES.get(table)
+        if keys is None or not record['rows']:
+            continue
+        if not fresh:
+            key_idx = [columns.index(k) for k in keys]
+            where = " AND ".join(f'"{k}" = ?' for k in keys)
+            conn.exec_driver_sql(f'DELETE FROM "{table}" WHERE {where}',
+                                 [tuple(r[i] for i in key_idx) for r in record['rows']])
+        if record['op'] == 'upsert':
+            cols = ", ".join(f'"{c}"' for c in columns)
+            marks = ", ".join("?" for _ in columns)
+            conn.exec_driver_sql(f'INSERT INTO "{table}" ({cols}) VALUES ({marks})',
+                                 [tuple(r) for r in record['rows']])
+        rows += len(record['rows'])
+    return rows
+
+def _applied(conn):
+    return dict(conn.execute(select(SyncLog.name, SyncLog.kind)).all())
+
+def _log(conn, path, kind):
+    conn.execute(SyncLog.__table__.insert(), [{
+        'name': os.path.basename(path), 'kind': kind, 'applied_at': _utcnow()
+    }])
+
+def _snapshot_hashes(conn):
+    state = {}
+    for table in SYNC_TABLES:
+        df = _read_table(conn, table)
+        if df is not None:
+            state[table] = _row_hashes(df, table)
+    return state
+
+def _save_state(db_file, conn):
+    state = {'version': HASH_VERSION, 'applied': _applied(conn), 'tables': _snapshot_hashes(conn)}
+    with open(_hash_file(db_file), "wb") as f:
+        pickle.dump(state, f)
+
+def _load_state(db_file, sync_dir, conn):
+    """Hashes of the synced state. Replays base + segments into a temp DB if the local file is stale."""
+    path = _hash_file(db_file)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get('version') == HASH_VERSION and state['applied'] == _applied(conn):
+            return state['tables']
+
+    print("Sync state missing or stale, replaying snapshot + segments...")
+    with tempfile.TemporaryDirectory() as tmp:
+        replay = os.path.join(tmp, "replay.db")
+        restore(db_file=replay, sync_dir=sync_dir, quiet=True)
+        engine = create_db_engine(replay)
+        with engine.connect() as replay_conn:
+            tables = _snapshot_hashes(replay_conn)
+        engine.dispose()
+    return tables
+
+def restore(db_file=DB_FILE, sync_dir=SYNC_DIR, quiet=False):
+    """Brings db_file up to base + segments. Returns the number of rows applied."""
+    base = _base_file(sync_dir)
+    if base is None:
+        if not quiet:
+            print(f"No snapshot in {sync_dir}, keeping {db_file} as is.")
+        return 0
+
+    existed = os.path.exists(db_file)
+    engine = create_db_engine(db_file)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        applied = _applied(conn)
+
+    base_name = os.path.basename(base)
+    rows = 0
+    if applied.get(base_name) != 'base':
+        # New base (first run, or compacted elsewhere): rebuild from scratch
+        engine.dispose()
+        if existed:
+            if not quiet:
+                print(f"Rebuilding {db_file} from {base_name} (previous file kept as {db_file}.bak)")
+            shutil.move(db_file, f"{db_file}.bak")
+        for path in (db_file, db_file + "-wal", db_file + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        engine = create_db_engine(db_file)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            rows += _apply(conn, base, fresh=True)
+            _log(conn, base, 'base')
+        applied = {base_name: 'base'}
+
+    new_segments = [s for s in _segment_files(sync_dir) if os.path.basename(s) not in applied]
+    with engine.begin() as conn:
+        for segment in new_segments:
+            rows += _apply(conn, segment)
+            _log(conn, segment, 'segment')
+
+    with engine.connect() as conn:
+        if not quiet:
+            _save_state(db_file, conn)
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+
+    if not quiet:
+        print(f"Restored {db_file}: {base_name} + {len(new_segments)} new segments ({rows} rows applied).")
+    return rows
+
+def compact(db_file=DB_FILE, sync_dir=SYNC_DIR):
+    """Rewrites the base snapshot from db_file and drops all segments."""
+    engine = create_db_engine(db_file)
+    Base.metadata.create_all(bind=engine)
+    base = os.path.join(sync_dir, f"base-{_stamp()}.jsonl.gz")
+
+    with engine.begin() as conn:
+        def records():
+            for table in SYNC_TABLES:
+                df = _read_table(conn, table)
+                if df is not None and not df.empty:
+                    yield from _records(table, 'upsert', df)
+
+        rows = _write(base, records())
+        old = [f for f in glob.glob(os.path.join(sync_dir, "base-*.jsonl.gz")) if f != base]
+        for path in old + _segment_files(sync_dir):
+            os.remove(path)
+        conn.execute(SyncLog.__table__.delete())
+        _log(conn, base, 'base')
+
+    with engine.connect() as conn:
+        _save_state(db_file, conn)
+    engine.dispose()
+    print(f"Compacted {rows} rows into {os.path.basename(base)} ({os.path.getsize(base) / 1024:.0f} KiB).")
+    return base
+
+def _should_compact(sync_dir):
+    base = _base_file(sync_dir)
+    segments = _segment_files(sync_dir)
+    if not segments:
+        return False
+    seg_bytes = sum(os.path.getsize(s) for s in segments)
+    return len(segments) >= COMPACT_SEGMENTS or seg_bytes >= os.path.getsize(base) * COMPACT_RATIO
+
+def export(db_file=DB_FILE, sync_dir=SYNC_DIR, label=None):
+    """
+    Writes the rows changed since the last restore / export as a new segment.
+    Returns the segment path (None if nothing changed).
+    """
+    if _base_file(sync_dir) is None:
+        # First export: the whole DB becomes the base
+        return compact(db_file, sync_dir)
+
+    engine = create_db_engine(db_file)
+    Base.metadata.create_all(bind=engine)
+    name = f"{_stamp()}-{label}.jsonl.gz" if label else f"{_stamp()}.jsonl.gz"
+    segment = os.path.join(sync_dir, "segments", name)
+    summary = {}
+
+    with engine.begin() as conn:
+        synced = _load_state(db_file, sync_dir, conn)
+
+        def records():
+            for table, keys in SYNC_TABLES.items():
+                df = _read_table(conn, table)
+                if df is None:
+                    continue
+                current = _row_hashes(df, table)
+                old = synced.get(table, pd.Series(dtype='uint64'))
+
+                known = current.index.isin(old.index)
+                changed = ~known
+                changed[known] = current[known].values != old.reindex(current.index[known]).values
+                deleted = old.index.difference(current.index)
+
+                if changed.any():
+                    yield from _records(table, 'upsert', df[changed])
+                if len(deleted):
+                    yield from _records(table, 'delete', deleted.to_frame(index=False))
+                if changed.any() or len(deleted):
+                    summary[table] = (int(changed.sum()), len(deleted))
+
+        rows = _write(segment, records())
+        if rows:
+            _log(conn, segment, 'segment')
+
+    if not rows:
+        os.remove(segment)
+        engine.dispose()
+        print("No changes to export.")
+        return None
+
+    with engine.connect() as conn:
+        _save_state(db_file, conn)
+    engine.dispose()
+
+    changes = ", ".join(f"{t} +{u}/-{d}" for t, (u, d) in summary.items())
+    print(f"Exported {rows} changed rows to {name} ({os.path.getsize(segment) / 1024:.1f} KiB): {changes}")
+
+    if _should_compact(sync_dir):
+        compact(db_file, sync_dir)
+    return segment
+
+def status(sync_dir=SYNC_DIR):
+    base = _base_file(sync_dir)
+    segments = _segment_files(sync_dir)
+    if base is None:
+        print(f"No snapshot in {sync_dir}.")
+        return
+    seg_bytes = sum(os.path.getsize(s) for s in segments)
+    print(f"Base: {os.path.basename(base)} ({os.path.getsize(base) / 1024:.0f} KiB)")
+    print(f"Segments: {len(segments)} ({seg_bytes / 1024:.0f} KiB), compaction due: {_should_compact(sync_dir)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta sync of the SQLite DB through git")
+    parser.add_argument("command", choices=["restore", "export", "compact", "status"])
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--sync-dir", default=SYNC_DIR)
+    parser.add_argument("--label", default=None, help="Suffix for the segment name (e.g. the run mode)")
+    args = parser.parse_args()
+
+    if args.command == "restore":
+        restore(args.db, args.sync_dir)
+    elif args.command == "export":
+        export(args.db, args.sync_dir, label=args.label)
+    elif args.command == "compact":
+        compact(args.db, args.sync_dir)
+    else:
+        status(args.sync_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.database import Stock, FundamentalSnapshot
+
+# Tickers fetched more recently than this are skipped
+DEFAULT_MAX_AGE_HOURS = float(os.getenv("FUNDAMENTALS_MAX_AGE_HOURS", "24"))
+
+# Shared across workers. 2 req/s matches the old 0.5s sleep between calls.
+DEFAULT_RATE = float(os.getenv("FUNDAMENTALS_RATE", "2.0"))
+DEFAULT_WORKERS = 4
+
+class RateLimiter:
+    """
+    Thread-safe rate limiter: at most `rate` calls per second across all threads.
+    Each caller reserves the next free slot under the lock, then sleeps outside it.
+    """
+    def __init__(self, rate=DEFAULT_RATE):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+def _nse_source(ticker):
+    from app.sources import get_source
+    return get_source().quote(ticker)
+
+def parse_fundamentals(data):
+    """Extracts Stock fields from an nse_eq payload. Only fields present in the payload are returned."""
+    fields = {}
+    meta = data.get('metadata') if isinstance(data, dict) else None
+    if not meta:
+        return fields
+
+    current_pe = meta.get('pdSymbolPe')
+    if current_pe is not None and current_pe != '-':
+        try:
+            fields['current_pe'] = float(current_pe)
+        except (TypeError, ValueError):
+            pass
+
+    industry = meta.get('industry')
+    if industry:
+        fields['industry'] = industry
+        # pdSectorInd is often an index name, industry is the better sector proxy
+        fields['sector'] = industry
+
+    # PEG and Earnings Growth not readily available in simple nse_eq
+    return fields
+
+def _fetch_all(tickers, source, limiter, workers):
+    """Fetches payloads concurrently. Returns ({ticker: payload}, {ticker: error})."""
+    payloads, errors = {}, {}
+
+    def fetch(ticker):
+        limiter.wait()
+        return source(ticker)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch, t): t for t in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                payloads[ticker] = future.result()
+            except Exception as e:
+                errors[ticker] = e
+    return payloads, errors
+
+def refresh_fundamentals(db: Session, tickers: list, max_age_hours=DEFAULT_MAX_AGE_HOURS,
+                         workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, source=None, force=False):
+    """
+    Concurrent fundamentals refresh.
+
+    - Tickers whose cached payload is younger than `max_age_hours` are skipped (unless force=True).
+    - Network calls run in a thread pool behind one shared RateLimiter.
+    - All DB work happens on the calling thread: only changed Stock fields are written,
+      together with the raw payloads, in a single commit.
+    - Payloads without metadata (empty / throttled responses) count as failed and are not
+      cached, so the next run fetches them again.
+
+    `source` is a callable ticker -> nse_eq style payload (defaults to the app.sources quote).
+    Returns a summary dict.
+    """
+    source = source or _nse_source
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=max_age_hours)
+
+    tickers = list(dict.fromkeys(tickers))
+    cached = {
+        c.ticker: c for c in db.query(FundamentalSnapshot).filter(FundamentalSnapshot.ticker.in_(tickers)).all()
+    }
+
+    if force:
+        stale = tickers
+    else:
+        stale = [t for t in tickers if t not in cached or cached[t].fetched_at is None or cached[t].fetched_at < cutoff]
+
+    summary = {'requested': len(tickers), 'skipped': len(tickers) - len(stale), 'fetched': 0, 'changed': 0, 'failed': 0}
+    print(f"Updating fundamentals for {len(stale)} stocks (NSE), {summary['skipped']} fresh in cache...")
+
+    if not stale:
+        return summary
+
+    payloads, errors = _fetch_all(stale, source, RateLimiter(rate), workers)
+    for ticker, data in list(payloads.items()):
+        if not (isinstance(data, dict) and data.get('metadata')):
+            errors[ticker] = ValueError("payload has no metadata")
+            del payloads[ticker]
+    for ticker, e in errors.items():
+        print(f"Failed fundamentals for {ticker}: {e}")
+    summary['fetched'] = len(payloads)
+    summary['failed'] = len(errors)
+
+    stocks = {s.ticker: s for s in db.query(Stock).filter(Stock.ticker.in_(list(payloads))).all()}
+
+    try:
+        for ticker, data in payloads.items():
+            stock = stocks.get(ticker)
+            if stock is None:
+                continue
+
+            changes = {k: v for k, v in parse_fundamentals(data).items() if getattr(stock, k) != v}
+            for k, v in changes.items():
+                setattr(stock, k, v)
+            if changes:
+                summary['changed'] += 1
+                print(f"Updated {ticker}: {changes}")
+
+            snapshot = cached.get(ticker)
+            if snapshot is None:
+                snapshot = FundamentalSnapshot(ticker=ticker)
+                db.add(snapshot)
+            snapshot.payload = json.dumps(data, default=str)
+            snapshot.fetched_at = now
+
+        db.commit()
+    except Exception as e:
+        print(f"Failed to save fundamentals: {e}")
+        db.rollback()
+        raise
+
+    if summary['changed']:
+        # Keep the materialized sector medians in sync with the new fundamentals
+        from app.screener import refresh_sector_stats
+        refresh_sector_stats(db)
+
+    print(f"Fundamentals: fetched {summary['fetched']}, changed {summary['changed']}, "
+          f"skipped {summary['skipped']}, failed {summary['failed']}")
+    return summary
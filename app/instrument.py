@@ -0,0 +1,169 @@
+"""
+Lightweight run instrumentation.
+
+    from app import instrument
+
+    with instrument.run("daily_run.premarket"):     # whole run, prints the JSON summary at the end
+        with instrument.stage("update_signals"):    # wall time + call count per stage
+            ...
+        instrument.count("rows_read", len(df))      # free-form counters
+        instrument.network_call("yfinance")         # network_calls + network_calls.yfinance
+
+    @instrument.timed("analyze_ticker")             # decorator form of stage()
+
+Stages with the same name accumulate. Everything is thread-safe and cheap enough to
+leave on; worker processes keep their own (discarded) numbers.
+
+Environment:
+- RUN_STATS_FILE: also append each summary as one JSON line to this file
+- RUN_PROFILE=cprofile|pyinstrument: profile the run, dump to PROFILE_DIR (default "profiles")
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+RUN_STATS_FILE = os.getenv("RUN_STATS_FILE")
+RUN_PROFILE = os.getenv("RUN_PROFILE", "").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+_lock = threading.Lock()
+_stages = {}
+_counters = defaultdict(int)
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+def _record(name, seconds):
+    with _lock:
+        entry = _stages.get(name)
+        if entry is None:
+            entry = _stages[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+
+@contextmanager
+def stage(name):
+    """Times the block under `name` (accumulates across calls)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+def timed(name=None):
+    """Decorator version of stage(); defaults to the function name."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+def network_call(source, n=1):
+    """Counts an outbound request (NSE, yfinance, Telegram ...)."""
+    with _lock:
+        _counters['network_calls'] += n
+        _counters[f'network_calls.{source}'] += n
+
+def summary(name=None, wall_seconds=None):
+    with _lock:
+        stages = {
+            k: {'calls': v['calls'], 'seconds': round(v['seconds'], 4), 'max_seconds': round(v['max_seconds'], 4)}
+            for k, v in sorted(_stages.items(), key=lambda kv: kv[1]['seconds'], reverse=True)
+        }
+        counters = dict(sorted(_counters.items()))
+    return {
+        'run': name,
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'wall_seconds': round(wall_seconds, 3) if wall_seconds is not None else None,
+        'stages': stages,
+        'counters': counters,
+    }
+
+def emit_summary(name=None, wall_seconds=None):
+    """Prints the summary as one JSON line (and appends it to RUN_STATS_FILE if set)."""
+    data = summary(name, wall_seconds)
+    line = json.dumps(data, default=str)
+    print(f"RUN SUMMARY {line}")
+    if RUN_STATS_FILE:
+        directory = os.path.dirname(RUN_STATS_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(RUN_STATS_FILE, "a") as f:
+            f.write(line + "\n")
+    return data
+
+class _Profiler:
+    """Opt-in cProfile / pyinstrument wrapper (RUN_PROFILE)."""
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.profiler = None
+
+    def start(self):
+        if self.kind == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                self.profiler = Profiler()
+            except ImportError:
+                print("pyinstrument not installed, falling back to cProfile.")
+                self.kind = 'cprofile'
+        if self.kind == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profiler is not None:
+            self.profiler.start()
+
+    def stop(self):
+        if self.profiler is None:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        base = os.path.join(PROFILE_DIR, f"{self.name}-{stamp}")
+        if self.kind == 'cprofile':
+            self.profiler.disable()
+            path = f"{base}.prof"
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.stop()
+            path = f"{base}.html"
+            with open(path, "w") as f:
+                f.write(self.profiler.output_html())
+        print(f"Profile written to {path}")
+        return path
+
+@contextmanager
+def run(name, profile=None):
+    """
+    Instruments a whole run: resets counters, optionally profiles
+    (profile='cprofile' / 'pyinstrument', default RUN_PROFILE) and emits the summary on exit.
+    """
+    reset()
+    kind = (profile if profile is not None else RUN_PROFILE) or None
+    profiler = _Profiler(name, kind) if kind else None
+    if profiler:
+        profiler.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        if profiler:
+            profiler.stop()
+        emit_summary(name, wall)
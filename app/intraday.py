@@ -0,0 +1,280 @@
+"""
+Intraday bars from the polling loop.
+
+Each quote (last price + day high / low) is folded into per-ticker 1 and 5 minute
+OHLC bars held in a fixed-size NumPy ring buffer (BarRing). flush() appends the bars
+touched since the previous flush to the intraday store:
+
+    data/intraday/<YYYY-MM-DD>/tickers.txt            ticker ids (line number), append-only
+    data/intraday/<YYYY-MM-DD>/<1m|5m>/<HHMMSSffffff>.bin  one segment per flush, BAR_DTYPE records
+
+A bar still open at flush time is written again by a later flush; readers keep the last
+record per (ticker, bar), so segments never need rewriting. compact() merges a day's
+segments into one file.
+
+Only NumPy is imported, the intraday monitor stays light.
+Run: python -m app.intraday report [--date YYYY-MM-DD] [--tickers 200]
+"""
+import argparse
+import glob
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+INTRADAY_DIR = os.getenv("INTRADAY_DIR", "data/intraday")
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Bar sizes kept, in seconds
+TIMEFRAMES = {'1m': 60, '5m': 300}
+
+# 32 bytes per bar. ts = bar start (epoch seconds). day_high / day_low are the quote's
+# session extremes, used to recover highs / lows traded between two polls.
+BAR_DTYPE = np.dtype([
+    ('ticker', '<u2'), ('ts', '<u4'),
+    ('open', '<f4'), ('high', '<f4'), ('low', '<f4'), ('close', '<f4'),
+    ('day_high', '<f4'), ('day_low', '<f4'),
+    ('quotes', '<u2'),
+])
+
+RING_CAPACITY = 4096
+
+def trading_day(ts):
+    return datetime.fromtimestamp(ts, IST).date()
+
+class BarRing:
+    """
+    Fixed-size ring of bars for one timeframe.
+    Slots touched since the last drain are marked dirty; drain() returns and clears them.
+    """
+    def __init__(self, seconds, capacity=RING_CAPACITY):
+        self.seconds = seconds
+        self.bars = np.zeros(capacity, dtype=BAR_DTYPE)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.capacity = capacity
+        self.next = 0
+        self.current = {} # ticker id -> slot of its open bar
+
+    @property
+    def full(self):
+        # The next slot still holds an unflushed bar
+        return bool(self.dirty[self.next])
+
+    def fold(self, ticker_id, ts, price, high, low, day_high, day_low):
+        start = ts - ts % self.seconds
+        slot = self.current.get(ticker_id)
+        if slot is not None and self.bars['ts'][slot] == start and self.bars['ticker'][slot] == ticker_id:
+            bar = self.bars[slot]
+            bar['high'] = max(bar['high'], high)
+            bar['low'] = min(bar['low'], low)
+            bar['close'] = price
+            bar['day_high'] = day_high
+            bar['day_low'] = day_low
+            bar['quotes'] += 1
+        else:
+            slot = self.next
+            self.bars[slot] = (ticker_id, start, price, high, low, price, day_high, day_low, 1)
+            self.current[ticker_id] = slot
+            self.next = (self.next + 1) % self.capacity
+        self.dirty[slot] = True
+
+    def load(self, bars):
+        """Resumes open bars written by an earlier run (latest bar per ticker); they are not dirty."""
+        for bar in bars[-self.capacity:]:
+            self.bars[self.next] = bar
+            self.current[int(bar['ticker'])] = self.next
+            self.next = (self.next + 1) % self.capacity
+
+    def drain(self):
+        """Dirty bars in ring order (oldest first), then clears the dirty marks."""
+        order = np.roll(np.arange(self.capacity), -self.next)
+        slots = order[self.dirty[order]]
+        out = self.bars[slots].copy()
+        self.dirty[:] = False
+        return out
+
+class IntradayStore:
+    """Append-only, date-partitioned bar segments."""
+    def __init__(self, root=INTRADAY_DIR):
+        self.root = root
+        self._ids = {}
+
+    def _day_dir(self, day):
+        return os.path.join(self.root, str(day))
+
+    def ticker_ids(self, day):
+        """{ticker: id} for a day (ids are line numbers in tickers.txt)."""
+        if day not in self._ids:
+            path = os.path.join(self._day_dir(day), "tickers.txt")
+            ids = {}
+            if os.path.exists(path):
+                with open(path) as f:
+                    ids = {line.strip(): i for i, line in enumerate(f) if line.strip()}
+            self._ids[day] = ids
+        return self._ids[day]
+
+    def ticker_id(self, day, ticker):
+        ids = self.ticker_ids(day)
+        if ticker not in ids:
+            os.makedirs(self._day_dir(day), exist_ok=True)
+            with open(os.path.join(self._day_dir(day), "tickers.txt"), "a") as f:
+                f.write(ticker + "\n")
+            ids[ticker] = len(ids)
+        return ids[ticker]
+
+    def append(self, day, timeframe, bars):
+        if len(bars) == 0:
+            return None
+        directory = os.path.join(self._day_dir(day), timeframe)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(IST).strftime("%H%M%S%f")
+        path = os.path.join(directory, f"{stamp}.bin")
+        tmp = f"{path}.tmp"
+        bars.tofile(tmp)
+        os.replace(tmp, path)
+        return path
+
+    def _segments(self, day, timeframe):
+        return sorted(glob.glob(os.path.join(self._day_dir(day), timeframe, "*.bin")))
+
+    def read_day(self, day, timeframe='1m'):
+        """All bars of a day, one record per (ticker, bar) (last write wins), sorted by ticker / time."""
+        parts = [np.fromfile(p, dtype=BAR_DTYPE) for p in self._segments(day, timeframe)]
+        if not parts:
+            return np.zeros(0, dtype=BAR_DTYPE)
+        bars = np.concatenate(parts)
+        # Keep the last record of each (ticker, ts): reverse, unique keeps first occurrence
+        key = bars['ticker'].astype(np.uint64) << np.uint64(32) | bars['ts'].astype(np.uint64)
+        _, idx = np.unique(key[::-1], return_index=True)
+        return bars[::-1][idx]
+
+    def read(self, ticker, day, timeframe='1m'):
+        """Bars of one ticker on one day (BAR_DTYPE array, empty if none)."""
+        ticker_id = self.ticker_ids(day).get(ticker)
+        bars = self.read_day(day, timeframe)
+        if ticker_id is None:
+            return bars[:0]
+        return bars[bars['ticker'] == ticker_id]
+
+    def to_frame(self, bars):
+        import pandas as pd
+        df = pd.DataFrame({k: bars[k] for k in ('open', 'high', 'low', 'close', 'day_high', 'day_low', 'quotes')})
+        df.index = pd.to_datetime(bars['ts'], unit='s', utc=True).tz_convert('Asia/Kolkata')
+        df.columns = [c.capitalize() if c in ('open', 'high', 'low', 'close') else c for c in df.columns]
+        return df
+
+    def compact(self, day):
+        """Merges a day's segments into a single deduplicated segment per timeframe."""
+        for tf in TIMEFRAMES:
+            segments = self._segments(day, tf)
+            if len(segments) <= 1:
+                continue
+            bars = self.read_day(day, tf)
+            path = os.path.join(self._day_dir(day), tf, "000000000000.bin")
+            tmp = f"{path}.tmp"
+            bars.tofile(tmp)
+            # Merged file in place first, then old segments oldest first: after a crash in
+            # between, the segments left are the newest ones and still win in read_day
+            os.replace(tmp, path)
+            for s in segments:
+                if s != path:
+                    os.remove(s)
+
+    def storage_report(self, day, scale_to=None):
+        """Bytes / bars / segments per timeframe for a day, optionally scaled to `scale_to` tickers."""
+        n_tickers = len(self.ticker_ids(day))
+        report = {'day': str(day), 'tickers': n_tickers, 'timeframes': {}}
+        total = 0
+        for tf in TIMEFRAMES:
+            segments = self._segments(day, tf)
+            size = sum(os.path.getsize(s) for s in segments)
+            total += size
+            report['timeframes'][tf] = {
+                'segments': len(segments),
+                'bytes': size,
+                'bars': len(self.read_day(day, tf)),
+            }
+        report['bytes'] = total
+        if scale_to and n_tickers:
+            report[f'bytes_per_{scale_to}_tickers'] = int(total / n_tickers * scale_to)
+        return report
+
+class IntradayRecorder:
+    """Folds polled quotes into 1m / 5m rings and flushes them to the store in batches."""
+    def __init__(self, store=None, timeframes=TIMEFRAMES, capacity=RING_CAPACITY):
+        self.store = store or IntradayStore()
+        self.rings = {tf: BarRing(seconds, capacity) for tf, seconds in timeframes.items()}
+        self._day = None
+        self._last_day_range = {} # ticker id -> (day_high, day_low) seen last
+
+    def _seed(self, day):
+        """
+        Picks up where earlier runs today stopped: each ticker's latest bar goes back into
+        the rings (a bar spanning two cron runs keeps its open / high / low), and its day
+        high / low is the previous poll's, to detect moves between polls.
+        """
+        for tf, ring in self.rings.items():
+            bars = self.store.read_day(day, tf)
+            if not len(bars):
+                continue
+            # read_day sorts by (ticker, ts): the last row of each ticker is its latest bar
+            last = bars[np.r_[bars['ticker'][1:] != bars['ticker'][:-1], True]]
+            ring.load(last)
+            if tf == '1m' or not self._last_day_range:
+                self._last_day_range = {int(b['ticker']): (float(b['day_high']), float(b['day_low'])) for b in last}
+
+    def add_quote(self, ticker, price, day_high, day_low, ts=None):
+        ts = int(ts if ts is not None else time.time())
+        day = trading_day(ts)
+        if day != self._day:
+            if self._day is not None:
+                self.flush()
+            self._day = day
+            self._last_day_range = {}
+            self._seed(day)
+
+        tid = self.store.ticker_id(day, ticker)
+        # Compared at stored precision, so a range seeded from the store matches the live one
+        day_high, day_low = float(np.float32(day_high)), float(np.float32(day_low))
+        # Anything traded since the previous poll: a new session high / low was made in between
+        high, low = price, price
+        prev = self._last_day_range.get(tid)
+        if prev is not None:
+            if day_high > prev[0]:
+                high = day_high
+            if day_low < prev[1]:
+                low = day_low
+        self._last_day_range[tid] = (day_high, day_low)
+
+        for ring in self.rings.values():
+            if ring.full:
+                self.flush()
+            ring.fold(tid, ts, price, high, low, day_high, day_low)
+
+    def flush(self):
+        """Appends bars touched since the last flush. Returns the number of bars written."""
+        if self._day is None:
+            return 0
+        written = 0
+        for tf, ring in self.rings.items():
+            bars = ring.drain()
+            self.store.append(self._day, tf, bars)
+            written += len(bars)
+        return written
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["report", "compact"])
+    parser.add_argument("--date", default=str(datetime.now(IST).date()))
+    parser.add_argument("--tickers", type=int, default=200, help="Scale the storage report to this many tickers")
+    args = parser.parse_args()
+
+    store = IntradayStore()
+    if args.command == "compact":
+        store.compact(args.date)
+    report = store.storage_report(args.date, scale_to=args.tickers)
+    print(report)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
-import yfinance as yf
 import pandas as pd
 import pandas_ta as ta
+from app import instrument
+from app.sources import get_source
 
 class MarketAnalyzer:
-    def __init__(self):
+    def __init__(self, period="6mo"):
         self.nifty_ticker = "^NSEI"
         self.nifty_data = None
+        # yfinance lookback. 6mo is enough for EMA 50; RS ranking over 120 days needs more.
+        self.period = period
         
     def fetch_nifty_data(self):
         """Fetches Nifty 50 data if not already cached."""
@@ -13,8 +16,8 @@ class MarketAnalyzer:
             return
             
         try:
-            # Fetch last 6 months to ensure enough data for EMA 50
-            df = yf.download(self.nifty_ticker, period="6mo", progress=False)
+            # Fetch last 6 months (default) to ensure enough data for EMA 50
+            df = get_source().index_history(self.nifty_ticker, period=self.period)
             
             # Handle MultiIndex if present
             if isinstance(df.columns, pd.MultiIndex):
@@ -46,6 +49,17 @@ class MarketAnalyzer:
         else:
             return "DOWNTREND"
             
+    def get_nifty_close(self):
+        """Returns Nifty closes as a Series indexed by (tz-naive) session date."""
+        self.fetch_nifty_data()
+        
+        if self.nifty_data is None or self.nifty_data.empty:
+            return pd.Series(dtype=float)
+            
+        close = self.nifty_data['Close'].copy()
+        close.index = pd.to_datetime(close.index.date)
+        return close[~close.index.duplicated(keep='last')]
+            
     def get_relative_strength(self, ticker_symbol, db_session, window=5):
         """
         Checks if the ticker is performing better than Nifty 50 over a specific window (default 5 days).
@@ -61,6 +75,7 @@ class MarketAnalyzer:
             prices = db_session.query(DailyPrice).filter(
                 DailyPrice.ticker == ticker_symbol
             ).order_by(DailyPrice.date.desc()).limit(window + 1).all()
+            instrument.count("rows_read", len(prices))
             
             if len(prices) < window + 1:
                 # Not enough data (e.g. new listing or data gap)
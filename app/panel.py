@@ -0,0 +1,224 @@
+"""
+Compact in-memory OHLCV panel for whole-universe loops (backtests, scanners).
+
+pd.read_sql frames carry an id column, a Python str per row for the ticker, a
+datetime.date object per row and float64 everywhere (~170 bytes / bar). The panel keeps
+one flat array per field, ticker-major:
+
+    open / high / low / close / ema_200   float32
+    volume                                int32 (int64 if a volume does not fit)
+    date_idx                              int32 position in the shared `dates` axis
+    offsets                               bars of ticker i are [offsets[i], offsets[i + 1])
+
+Tickers are int-coded by their position in `tickers`, so a bar costs ~28 bytes.
+frame(ticker) / arrays(ticker) hand out views of these arrays (no copy), in the same
+Title Case layout as app.prices.load_price_frame, ready for analyze_ticker and the
+strategy signal functions. Frames share memory with the panel, so treat them as
+read-only (pandas copy-on-write copies a column before any in-place write).
+
+    panel = OHLCVPanel.from_db(db)
+    for ticker, df in panel.iter_frames(min_bars=50):
+        ...
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, cast, func, String
+from sqlalchemy.orm import Session
+from app.database import DailyPrice, AdjustmentFactor
+from app.corporate_actions import get_factors, factor_series, adjusted_ema
+from app import instrument
+
+PRICE_FIELDS = ['open', 'high', 'low', 'close']
+
+# Panel field -> frame column (as app.prices.PRICE_COLUMNS)
+FRAME_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume', 'ema_200': 'EMA_200'}
+
+# Rows per fetch: bigger chunks leave more freed row objects fragmenting the heap
+FETCH_CHUNK = 20_000
+
+def _volume_dtype(volume):
+    info = np.iinfo(np.int32)
+    if len(volume) and (volume.max() > info.max or volume.min() < info.min):
+        return np.int64
+    return np.int32
+
+class OHLCVPanel:
+    def __init__(self, tickers, dates, offsets, date_idx, open, high, low, close, volume, ema_200=None):
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.date_idx = np.asarray(date_idx, dtype=np.int32)
+        self.columns = {
+            'open': np.asarray(open, dtype=np.float32),
+            'high': np.asarray(high, dtype=np.float32),
+            'low': np.asarray(low, dtype=np.float32),
+            'close': np.asarray(close, dtype=np.float32),
+        }
+        volume = np.asarray(volume)
+        self.columns['volume'] = volume.astype(_volume_dtype(volume), copy=False)
+        if ema_200 is not None:
+            self.columns['ema_200'] = np.asarray(ema_200, dtype=np.float32)
+        self._codes = {t: i for i, t in enumerate(self.tickers)}
+        # pandas index resolution for the shared axis (datetime64[D] is not a valid index unit)
+        self._index_dates = self.dates.astype('datetime64[s]')
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._codes
+
+    @property
+    def n_bars(self):
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self):
+        arrays = [self.dates, self.offsets, self.date_idx, self._index_dates, *self.columns.values()]
+        return sum(a.nbytes for a in arrays)
+
+    def code(self, ticker):
+        """Integer id of a ticker (position in `tickers`)."""
+        return self._codes[ticker]
+
+    def ticker_codes(self):
+        """Ticker id per bar (int32), built on demand."""
+        return np.repeat(np.arange(len(self.tickers), dtype=np.int32), np.diff(self.offsets))
+
+    def _bounds(self, ticker):
+        i = self._codes[ticker]
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def _index(self, a, b):
+        idx = self.date_idx[a:b]
+        if b > a and idx[-1] - idx[0] == b - a - 1:
+            # No holes in the shared axis: the index is a view too
+            values = self._index_dates[idx[0]:idx[-1] + 1]
+        else:
+            values = self._index_dates[idx]
+        return pd.DatetimeIndex(values, name='date', copy=False)
+
+    def arrays(self, ticker):
+        """(dates, {field: array}) views of one ticker's bars."""
+        a, b = self._bounds(ticker)
+        return self.dates[self.date_idx[a:b]], {k: v[a:b] for k, v in self.columns.items()}
+
+    def frame(self, ticker):
+        """Date-indexed Title Case frame whose columns are views into the panel."""
+        a, b = self._bounds(ticker)
+        return pd.DataFrame({FRAME_COLUMNS[k]: v[a:b] for k, v in self.columns.items()},
+                            index=self._index(a, b), copy=False)
+
+    def iter_frames(self, tickers=None, min_bars=1):
+        """(ticker, frame) for each ticker (default all) with at least min_bars bars."""
+        for ticker in (self.tickers if tickers is None else tickers):
+            if ticker not in self._codes:
+                continue
+            a, b = self._bounds(ticker)
+            if b - a >= min_bars:
+                yield ticker, self.frame(ticker)
+
+    @classmethod
+    def from_arrays(cls, tickers, dates, open, high, low, close, volume, ema_200=None):
+        """
+        Dense (n_tickers, n_bars) arrays on one date axis, e.g. benchmarks.synthetic.make_panel.
+        Bars with a NaN close are dropped.
+        """
+        close = np.asarray(close, dtype=np.float32)
+        present = ~np.isnan(close)
+        counts = present.sum(axis=1)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        date_idx = np.broadcast_to(np.arange(close.shape[1], dtype=np.int32), close.shape)[present]
+        take = lambda values: None if values is None else np.asarray(values)[present]
+        return cls(tickers, dates, offsets, date_idx, take(open), take(high), take(low), close[present],
+                   take(volume), take(ema_200))
+
+    @classmethod
+    @instrument.timed("load_panel")
+    def from_db(cls, db: Session, tickers=None, start_date=None, end_date=None, adjusted=True, chunk=FETCH_CHUNK):
+        """
+        Whole-universe (or `tickers`) daily_prices in one ordered scan, written chunk by chunk
+        into preallocated compact arrays. Duplicate (ticker, date) rows keep the last one, as
+        prepare_price_frame does. Prices are split / bonus adjusted unless adjusted=False.
+        """
+        # Dates as ISO text: no per-row date objects, parsed in one go by numpy
+        query = select(DailyPrice.ticker, cast(DailyPrice.date, String), DailyPrice.open, DailyPrice.high, DailyPrice.low,
+                       DailyPrice.close, DailyPrice.volume, DailyPrice.ema_200)
+        if tickers is not None:
+            query = query.where(DailyPrice.ticker.in_(list(tickers)))
+        if start_date is not None:
+            query = query.where(DailyPrice.date >= start_date)
+        if end_date is not None:
+            query = query.where(DailyPrice.date <= end_date)
+        query = query.order_by(DailyPrice.ticker.asc(), DailyPrice.date.asc(), DailyPrice.id.asc())
+
+        conn = db.connection()
+        # Same transaction (snapshot) as the scan, so the arrays can be sized up front
+        total = conn.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+        data = {k: np.empty(total, dtype=np.float32) for k in PRICE_FIELDS + ['ema_200']}
+        data['volume'] = np.empty(total, dtype=np.int64)
+        day = np.empty(total, dtype=np.int64)
+
+        names, starts = [], []
+        seen = 0
+        result = conn.execute(query)
+        while seen < total:
+            rows = result.fetchmany(min(chunk, total - seen))
+            if not rows:
+                break
+            n = len(rows)
+            cols = list(zip(*rows))
+            ticker_col = np.array(cols[0], dtype=object)
+            # Rows are ordered by ticker: a new ticker starts wherever the name changes
+            new = np.flatnonzero(ticker_col[1:] != ticker_col[:-1]) + 1
+            if not names or names[-1] != ticker_col[0]:
+                new = np.concatenate([[0], new])
+            names.extend(ticker_col[new].tolist())
+            starts.extend((seen + new).tolist())
+            day[seen:seen + n] = np.array(cols[1], dtype='datetime64[D]').view(np.int64)
+            for k, values in zip(PRICE_FIELDS + ['ema_200'], (cols[2], cols[3], cols[4], cols[5], cols[7])):
+                data[k][seen:seen + n] = np.array(values, dtype=float)
+            data['volume'][seen:seen + n] = [v or 0 for v in cols[6]]
+            seen += n
+        result.close()
+        instrument.count("rows_read", seen)
+        if seen < total:
+            day = day[:seen]
+            data = {k: v[:seen] for k, v in data.items()}
+        offsets = np.array(starts + [seen], dtype=np.int64)
+
+        # Duplicate bars sit next to each other: keep the last of each run
+        keep = np.ones(seen, dtype=bool)
+        if seen:
+            keep[:-1] = day[:-1] != day[1:]
+            keep[offsets[1:-1] - 1] = True
+        if not keep.all():
+            offsets = np.concatenate([[0], np.cumsum(np.add.reduceat(keep, offsets[:-1]))])
+            day = day[keep]
+            data = {k: v[keep] for k, v in data.items()}
+
+        axis, date_idx = np.unique(day, return_inverse=True)
+        panel = cls(names, axis.astype('datetime64[D]'), offsets, date_idx, ema_200=data.pop('ema_200'), **data)
+        if adjusted:
+            panel._adjust(db)
+        return panel
+
+    def _adjust(self, db: Session):
+        """Applies corporate-action factors in place (tickers with actions only)."""
+        if not len(self.tickers):
+            return
+        adjusted = [t for (t,) in db.query(AdjustmentFactor.ticker).filter(
+            AdjustmentFactor.ticker.in_(self.tickers.tolist())).distinct()]
+        volume = self.columns['volume']
+        for ticker in adjusted:
+            a, b = self._bounds(ticker)
+            f = factor_series(self.dates[self.date_idx[a:b]], get_factors(db, ticker))
+            for k in PRICE_FIELDS:
+                self.columns[k][a:b] *= f.astype(np.float32)
+            if 'ema_200' in self.columns:
+                ema = self.columns['ema_200']
+                ema[a:b] = adjusted_ema(ema[a:b], self.columns['close'][a:b], f)
+            adjusted_volume = np.round(volume[a:b] / f)
+            if adjusted_volume.max(initial=0) > np.iinfo(volume.dtype).max:
+                volume = self.columns['volume'] = volume.astype(np.int64)
+            volume[a:b] = adjusted_volume
@@ -0,0 +1,43 @@
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.database import DailyPrice
+from app.corporate_actions import adjust_frame
+from app import instrument
+
+# DB column -> analysis column (Title Case, as used by smc_agent and backtesting)
+PRICE_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume', 'ema_200': 'EMA_200'}
+
+def prepare_price_frame(df):
+    """Raw daily_prices rows -> date-indexed frame with Title Case OHLCV columns."""
+    df['date'] = pd.to_datetime(df['date'])
+    # Handle duplicates to prevent reindexing errors
+    df = df.drop_duplicates(subset=['date'], keep='last')
+    df = df.set_index('date')
+    return df.rename(columns=PRICE_COLUMNS)
+
+def load_price_frame(db: Session, ticker, start_date=None, end_date=None, adjusted=True):
+    """
+    Loads one ticker's bars (optionally a date range) ready for analyze_ticker.
+    Prices are split / bonus adjusted unless adjusted=False (see app.corporate_actions).
+    """
+    query = db.query(DailyPrice).filter(DailyPrice.ticker == ticker)
+    if start_date is not None:
+        query = query.filter(DailyPrice.date >= start_date)
+    if end_date is not None:
+        query = query.filter(DailyPrice.date <= end_date)
+    query = query.order_by(DailyPrice.date.asc())
+
+    df = pd.read_sql(query.statement, db.bind)
+    instrument.count("rows_read", len(df))
+    if df.empty:
+        return df
+    df = prepare_price_frame(df)
+    return adjust_frame(db, ticker, df) if adjusted else df
+
+def load_recent_price_frame(db: Session, ticker, bars):
+    """Loads the last `bars` bars of one ticker."""
+    dates = [d for (d,) in db.query(DailyPrice.date).filter(DailyPrice.ticker == ticker)
+             .order_by(DailyPrice.date.desc()).limit(bars).all()]
+    if not dates:
+        return pd.DataFrame()
+    return load_price_frame(db, ticker, start_date=dates[-1])
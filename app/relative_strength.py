@@ -0,0 +1,206 @@
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import DailyPrice, Stock, RelativeStrength
+from app.corporate_actions import adjust_panel
+from app import instrument
+
+# Lookback windows (trading days) kept in the rs_scores table
+RS_WINDOWS = (5, 20, 60, 120)
+
+# How many sessions to compute when the table is empty (first run)
+INITIAL_BACKFILL = 250
+
+def load_close_panel(db: Session, start_date=None):
+    """
+    Loads split / bonus adjusted closes from daily_prices as a (date x ticker) panel.
+    Index is a DatetimeIndex, one column per ticker.
+    """
+    query = db.query(DailyPrice.date, DailyPrice.ticker, DailyPrice.close)
+    if start_date is not None:
+        query = query.filter(DailyPrice.date >= start_date)
+
+    df = pd.read_sql(query.statement, db.bind)
+    if df.empty:
+        return pd.DataFrame()
+
+    df['date'] = pd.to_datetime(df['date'])
+    # Duplicate (ticker, date) rows exist in older DBs, keep the last one
+    panel = df.pivot_table(index='date', columns='ticker', values='close', aggfunc='last')
+    return adjust_panel(db, panel.sort_index())
+
+def compute_rs_scores(panel, nifty_close, windows=RS_WINDOWS, sectors=None, dates=None):
+    """
+    Rolling-window relative strength on a close panel.
+
+    For every window w: pct_change = Close[t] / Close[t-w] - 1 (per ticker),
+    rs_score = pct_change - Nifty pct_change over the same sessions.
+    Ranks are computed per date across the universe (1 = strongest) and within sector.
+
+    Returns a long DataFrame: date, window, ticker, pct_change, rs_score, rank, pct_rank, sector_rank.
+    If `dates` is given only those dates are returned (used for incremental updates).
+    """
+    cols = ['date', 'window', 'ticker', 'pct_change', 'rs_score', 'rank', 'pct_rank', 'sector_rank']
+    if panel.empty or nifty_close is None or nifty_close.empty:
+        return pd.DataFrame(columns=cols)
+
+    # Align Nifty to the stock sessions. Carry the last close over sessions yfinance is missing.
+    nifty = nifty_close.reindex(panel.index.union(nifty_close.index)).ffill().reindex(panel.index)
+
+    # Carry prices over single missing rows (data gaps), but never report a score
+    # for a date on which the ticker itself has no bar.
+    filled = panel.ffill()
+
+    if dates is not None:
+        keep = panel.index.isin(pd.to_datetime(pd.Index(dates)))
+    else:
+        keep = slice(None)
+
+    frames = []
+    for w in windows:
+        t_pct = (filled / filled.shift(w) - 1).where(panel.notna())
+        n_pct = nifty / nifty.shift(w) - 1
+        rs = t_pct.sub(n_pct, axis=0)
+
+        t_pct = t_pct[keep]
+        rs = rs[keep]
+
+        long = rs.rename_axis(index='date', columns='ticker').reset_index().melt(
+            id_vars='date', var_name='ticker', value_name='rs_score')
+        pct_long = t_pct.rename_axis(index='date', columns='ticker').reset_index().melt(
+            id_vars='date', var_name='ticker', value_name='pct_change')
+        long['pct_change'] = pct_long['pct_change'].values
+        long = long.dropna(subset=['rs_score'])
+        long['window'] = w
+        frames.append(long)
+
+    if not frames:
+        return pd.DataFrame(columns=cols)
+
+    out = pd.concat(frames, ignore_index=True)
+    if out.empty:
+        return pd.DataFrame(columns=cols)
+
+    by_date = out.groupby(['date', 'window'])['rs_score']
+    out['rank'] = by_date.rank(ascending=False, method='min').astype(int)
+    out['pct_rank'] = by_date.rank(pct=True)
+
+    if sectors is not None:
+        out['sector'] = out['ticker'].map(sectors).fillna('Unknown')
+        out['sector_rank'] = out.groupby(['date', 'window', 'sector'])['rs_score'].rank(
+            ascending=False, method='min').astype(int)
+    else:
+        out['sector_rank'] = None
+
+    return out[cols]
+
+def update_rs_table(db: Session, windows=RS_WINDOWS, market=None):
+    """
+    Incrementally updates rs_scores for sessions not scored yet.
+    The last scored session is always recomputed since EOD refetches it (partial bars).
+    Only max(windows) sessions of warm-up closes are loaded, not the full history.
+    """
+    print("Updating Relative Strength table...")
+
+    last_scored = db.query(func.max(RelativeStrength.date)).scalar()
+
+    sessions = [d for (d,) in db.query(DailyPrice.date).distinct().order_by(DailyPrice.date.asc())]
+    if not sessions:
+        print("No price data. Skipping RS update.")
+        return 0
+
+    if last_scored is None:
+        new_dates = sessions[-INITIAL_BACKFILL:]
+    else:
+        new_dates = [d for d in sessions if d >= last_scored]
+
+    if not new_dates:
+        print("RS table up to date.")
+        return 0
+
+    # Warm-up: enough sessions before the first new date for the longest window
+    first_idx = sessions.index(new_dates[0])
+    start_idx = max(0, first_idx - max(windows) - 5)
+    panel = load_close_panel(db, sessions[start_idx])
+
+    if market is None:
+        from app.market_utils import MarketAnalyzer
+        # 120 session window + backfill needs more than the default 6 months
+        market = MarketAnalyzer(period="2y")
+    nifty_close = market.get_nifty_close()
+
+    if nifty_close.empty:
+        print("Nifty data unavailable. Skipping RS update.")
+        return 0
+
+    sectors = dict(db.query(Stock.ticker, Stock.sector).all())
+    scores = compute_rs_scores(panel, nifty_close, windows=windows, sectors=sectors, dates=new_dates)
+
+    if scores.empty:
+        print("No RS scores computed.")
+        return 0
+
+    scores['date'] = scores['date'].dt.date
+    scored_dates = scores['date'].unique().tolist()
+
+    # Replace the affected dates in one transaction
+    db.query(RelativeStrength).filter(
+        RelativeStrength.date.in_(scored_dates),
+        RelativeStrength.window.in_(list(windows))
+    ).delete(synchronize_session=False)
+
+    records = scores.astype(object).where(scores.notna(), None).to_dict('records')
+    db.execute(RelativeStrength.__table__.insert(), records)
+    db.commit()
+    instrument.count("rows_written", len(records))
+
+    print(f"RS table updated: {len(scored_dates)} sessions, {len(records)} rows.")
+    return len(records)
+
+def _latest_rs_date(db: Session, window):
+    return db.query(func.max(RelativeStrength.date)).filter(RelativeStrength.window == window).scalar()
+
+def get_rs_ranking(db: Session, window=20, as_of=None, sector=None, top=None, min_pct_rank=None):
+    """
+    Reads RS ranks for one window from rs_scores (indexed lookup, no recomputation).
+    Defaults to the latest scored date. Sorted strongest first.
+    """
+    if as_of is None:
+        as_of = _latest_rs_date(db, window)
+        if as_of is None:
+            return pd.DataFrame()
+
+    query = db.query(RelativeStrength, Stock.sector).join(
+        Stock, Stock.ticker == RelativeStrength.ticker, isouter=True
+    ).filter(
+        RelativeStrength.date == as_of,
+        RelativeStrength.window == window
+    )
+    if sector is not None:
+        query = query.filter(Stock.sector == sector)
+    if min_pct_rank is not None:
+        query = query.filter(RelativeStrength.pct_rank >= min_pct_rank)
+
+    query = query.order_by(RelativeStrength.rank.asc())
+    if top is not None:
+        query = query.limit(top)
+
+    return pd.read_sql(query.statement, db.bind)
+
+def get_rs_snapshot(db: Session, window=5, as_of=None):
+    """
+    Returns {ticker: rs_score} for one window on `as_of`, by default the latest daily_prices
+    session. Empty when that session is not scored (the EOD RS update failed), so callers
+    fall back to a live check instead of filtering on stale scores.
+    rs_score > 0 means the ticker outperformed Nifty (same test as MarketAnalyzer.get_relative_strength).
+    """
+    if as_of is None:
+        as_of = db.query(func.max(DailyPrice.date)).scalar()
+        if as_of is None:
+            return {}
+
+    rows = db.query(RelativeStrength.ticker, RelativeStrength.rs_score).filter(
+        RelativeStrength.date == as_of,
+        RelativeStrength.window == window
+    ).all()
+    return {t: s for t, s in rows}
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import DailyPrice, ResampledPrice
+from app.smc_agent import analyze_ticker
+from app.corporate_actions import adjust_rows
+from app import instrument
+
+# timeframe -> pandas period (period start is the stored key)
+TIMEFRAMES = {'W': 'W-SUN', 'M': 'M'}
+
+OHLCV_AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+def period_start(dates, timeframe):
+    """Start date (Monday / 1st of month) of the period each date falls in."""
+    return pd.to_datetime(dates).dt.to_period(TIMEFRAMES[timeframe]).dt.start_time.dt.date
+
+def aggregate_periods(bars, timeframe):
+    """
+    Daily rows (ticker, date, open, high, low, close, volume; sorted by date) ->
+    one row per (ticker, period) in resampled_prices layout.
+    """
+    bars = bars.assign(period_start=period_start(bars['date'], timeframe))
+    grouped = bars.groupby(['ticker', 'period_start'], sort=True)
+    out = grouped.agg(OHLCV_AGG)
+    out['period_end'] = grouped['date'].max()
+    out['bars'] = grouped['date'].size()
+    out = out.reset_index()
+    out['timeframe'] = timeframe
+    out['volume'] = out['volume'].round().astype('int64')
+    return out
+
+def _load_daily(db: Session, tickers, start_date=None):
+    query = db.query(DailyPrice.ticker, DailyPrice.date, DailyPrice.open, DailyPrice.high,
+                     DailyPrice.low, DailyPrice.close, DailyPrice.volume).filter(DailyPrice.ticker.in_(tickers))
+    if start_date is not None:
+        query = query.filter(DailyPrice.date >= start_date)
+    df = pd.read_sql(query.statement, db.bind)
+    instrument.count("rows_read", len(df))
+    if df.empty:
+        return df
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    df = df.sort_values(['ticker', 'date']).drop_duplicates(subset=['ticker', 'date'], keep='last')
+    # Split / bonus adjusted, like the daily frames the zones are joined onto
+    return adjust_rows(db, df)
+
+def update_resampled(db: Session, tickers=None, timeframes=('W', 'M')):
+    """
+    Incrementally maintains resampled_prices.
+
+    Only the still-open period of each ticker (and anything after it) is rebuilt, from the
+    few daily bars since that period started. The open period is re-aggregated rather than
+    patched with deltas because the EOD fetch rewrites the last daily bar.
+    Tickers with no resampled rows yet are built from full history.
+    """
+    print("Updating weekly / monthly bars...")
+    if tickers is None:
+        tickers = [t for (t,) in db.query(DailyPrice.ticker).distinct()]
+    if not tickers:
+        return 0
+
+    # Open period per (ticker, timeframe)
+    latest = db.query(ResampledPrice.ticker, ResampledPrice.timeframe, func.max(ResampledPrice.period_start)).filter(
+        ResampledPrice.ticker.in_(tickers), ResampledPrice.timeframe.in_(list(timeframes))
+    ).group_by(ResampledPrice.ticker, ResampledPrice.timeframe).all()
+    starts = {(t, tf): d for t, tf, d in latest}
+
+    # Daily bars needed per ticker: from the earliest open period across timeframes
+    load_from = {}
+    for t in tickers:
+        ds = [starts.get((t, tf)) for tf in timeframes]
+        load_from[t] = None if any(d is None for d in ds) else min(ds)
+
+    new = [t for t, d in load_from.items() if d is None]
+    known = [t for t, d in load_from.items() if d is not None]
+
+    frames = []
+    if new:
+        frames.append(_load_daily(db, new))
+    if known:
+        frames.append(_load_daily(db, known, start_date=min(load_from[t] for t in known)))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        print("No daily bars to resample.")
+        return 0
+    daily = pd.concat(frames, ignore_index=True)
+
+    written = 0
+    for tf in timeframes:
+        # Rebuild from each ticker's own open period (None = everything)
+        tf_start = daily['ticker'].map(lambda t: starts.get((t, tf)))
+        rows = daily[tf_start.isna() | (daily['date'] >= tf_start.fillna(daily['date']))]
+        if rows.empty:
+            continue
+        periods = aggregate_periods(rows, tf)
+
+        # Replace the rebuilt periods: group tickers by their first rebuilt period
+        first = periods.groupby('ticker')['period_start'].min()
+        for start, group in first.groupby(first):
+            db.query(ResampledPrice).filter(
+                ResampledPrice.ticker.in_(group.index.tolist()),
+                ResampledPrice.timeframe == tf,
+                ResampledPrice.period_start >= start
+            ).delete(synchronize_session=False)
+
+        records = periods.astype(object).where(periods.notna(), None).to_dict('records')
+        db.execute(ResampledPrice.__table__.insert(), records)
+        written += len(records)
+
+    db.commit()
+    instrument.count("rows_written", written)
+    print(f"Resampled bars updated for {len(tickers)} tickers ({written} rows).")
+    return written
+
+def load_resampled(db: Session, ticker, timeframe='W', start_date=None, end_date=None):
+    """Resampled bars of one ticker, indexed by period_start, Title Case OHLCV plus period_end."""
+    query = db.query(ResampledPrice).filter(ResampledPrice.ticker == ticker, ResampledPrice.timeframe == timeframe)
+    if start_date is not None:
+        query = query.filter(ResampledPrice.period_start >= start_date)
+    if end_date is not None:
+        query = query.filter(ResampledPrice.period_start <= end_date)
+    df = pd.read_sql(query.order_by(ResampledPrice.period_start.asc()).statement, db.bind)
+    if df.empty:
+        return df
+    df['period_start'] = pd.to_datetime(df['period_start'])
+    df['period_end'] = pd.to_datetime(df['period_end'])
+    df = df.set_index('period_start')
+    return df.rename(columns={c: c.capitalize() for c in OHLCV_AGG})
+
+def resample_frame(df, timeframe='W'):
+    """Same bars as the store, computed from a daily frame (date index, Title Case columns)."""
+    daily = pd.DataFrame({
+        'ticker': '', 'date': df.index.date,
+        **{c: df[c.capitalize()].values for c in OHLCV_AGG},
+    })
+    out = aggregate_periods(daily, timeframe)
+    out['period_start'] = pd.to_datetime(out['period_start'])
+    out['period_end'] = pd.to_datetime(out['period_end'])
+    out = out.set_index('period_start').drop(columns=['ticker', 'timeframe'])
+    return out.rename(columns={c: c.capitalize() for c in OHLCV_AGG})
+
+def htf_zones(htf, timeframe='W'):
+    """
+    Bullish OB / FVG zones found on higher-timeframe bars.
+
+    A zone is only known once the bar that confirms it has closed: an OB is marked on
+    candle i-2 when candle i completes the FVG. `available_from` is that confirming
+    bar's period_end, so joining on it never leaks future data into daily bars.
+    """
+    _, s = analyze_ticker(f"HTF_{timeframe}", htf[['Open', 'High', 'Low', 'Close', 'Volume']].copy())
+    s['period_end'] = htf['period_end'].values
+
+    # OB flag sits on the OB candle (bar i-2); it is known at the close of bar i
+    ob_candle = s['bullish_ob'].astype(bool)
+    ob = pd.DataFrame({
+        'available_from': s['period_end'].shift(-2)[ob_candle].values,
+        f'{timeframe}_ob_top': s['High'][ob_candle].values,
+        f'{timeframe}_ob_bottom': s['Low'][ob_candle].values,
+    })
+    fvg = pd.DataFrame({
+        'available_from': s['period_end'][s['bullish_fvg']].values,
+        f'{timeframe}_fvg_top': s['fvg_top'][s['bullish_fvg']].values,
+        f'{timeframe}_fvg_bottom': s['fvg_bottom'][s['bullish_fvg']].values,
+    })
+    return ob.sort_values('available_from'), fvg.sort_values('available_from')
+
+def analyze_ticker_mtf(ticker, df, db: Session = None, timeframes=('W',), htf=None):
+    """
+    analyze_ticker plus higher-timeframe confluence.
+
+    For each timeframe the latest confirmed HTF bullish OB and FVG zones are joined onto
+    the daily bars with an as-of merge (backward, on the zone's confirmation date), then:
+        in_{tf}_ob             daily bar trades into the HTF bullish OB
+        bullish_fvg_in_{tf}_ob daily bullish FVG overlapping the HTF bullish OB
+
+    HTF bars come from `htf` ({timeframe: frame}), else the resampled store (db),
+    else are resampled from df itself.
+    """
+    results, s_df = analyze_ticker(ticker, df)
+    if results is None:
+        return results, s_df
+
+    s_df = s_df.sort_index()
+    dates = s_df.index
+    for tf in timeframes:
+        bars = (htf or {}).get(tf)
+        if bars is None and db is not None:
+            bars = load_resampled(db, ticker, tf, end_date=dates[-1].date())
+        if bars is None or bars.empty:
+            bars = resample_frame(s_df, tf)
+
+        ob, fvg = htf_zones(bars, tf)
+        left = pd.DataFrame({'date': dates})
+        for zones in (ob, fvg):
+            left = pd.merge_asof(left, zones, left_on='date', right_on='available_from',
+                                 direction='backward').drop(columns='available_from')
+
+        top, bottom = left[f'{tf}_ob_top'].values, left[f'{tf}_ob_bottom'].values
+        for col in left.columns.drop('date'):
+            s_df[col] = left[col].values
+        with np.errstate(invalid='ignore'):
+            s_df[f'in_{tf}_ob'] = (s_df['Low'].values <= top) & (s_df['High'].values >= bottom)
+            s_df[f'bullish_fvg_in_{tf}_ob'] = s_df['bullish_fvg'].values & \
+                (s_df['fvg_bottom'].values <= top) & (s_df['fvg_top'].values >= bottom)
+
+        hits = s_df[f'bullish_fvg_in_{tf}_ob']
+        results[f'last_fvg_in_{tf}_ob'] = s_df.index[hits][-1] if hits.any() else None
+
+    return results, s_df
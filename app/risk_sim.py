@@ -0,0 +1,184 @@
+"""
+Monte Carlo risk of ruin over trade outcomes.
+
+R-multiples (PnL / planned risk) are bootstrapped from the closed trades (or a backtest
+trade log) into equity paths of --trades trades each. Risking a fraction f of equity per
+trade, a trade with outcome R multiplies equity by (1 + f * R), so a whole path is one
+cumsum of log1p(f * R) over a (paths x trades) array. Paths are simulated in chunks of
+at most CHUNK_BYTES per array, each chunk with its own seed, optionally across processes;
+results do not depend on the number of workers.
+
+For every risk setting it reports the final equity distribution, the max drawdown
+distribution, the risk of ruin (equity falling to 1 - --ruin of the start at any point)
+and equity confidence bands over the path.
+
+Run:
+    python -m app.risk_sim [--risk 0.5 1 2] [--paths 100000] [--trades 250] [--ruin 0.5]
+    python -m app.risk_sim --trades-csv bt_trades.csv   # e.g. stats['_trades'].to_csv(...)
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+DEFAULT_RISKS = (0.005, 0.01, 0.02) # Fraction of equity risked per trade
+DEFAULT_PATHS = 100_000
+DEFAULT_TRADES = 250 # About a year of trades
+RUIN = 0.5 # Losing half of the starting equity counts as ruin
+
+# Upper bound on one (paths x trades) float64 array per chunk
+CHUNK_BYTES = 32 * 1024 * 1024
+
+# Points along the path where equity bands are taken
+BAND_POINTS = 25
+BAND_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def r_multiples_from_log(trades):
+    """
+    R-multiples of a trade log: an r_multiple column (app.trade_stats), a backtesting
+    `_trades` frame with SL ((exit - entry) / (entry - SL)), or else ReturnPct in units
+    of the average losing trade (1R = average loss).
+    """
+    if 'r_multiple' in trades.columns:
+        r = trades['r_multiple']
+    elif {'SL', 'EntryPrice', 'ExitPrice'} <= set(trades.columns) and trades['SL'].notna().all():
+        risk = (trades['EntryPrice'] - trades['SL']).abs()
+        direction = np.sign(trades['Size']) if 'Size' in trades.columns else 1
+        r = direction * (trades['ExitPrice'] - trades['EntryPrice']) / risk.where(risk > 0)
+    elif 'ReturnPct' in trades.columns:
+        losses = trades['ReturnPct'][trades['ReturnPct'] < 0]
+        if losses.empty:
+            raise ValueError("No losing trades: cannot scale ReturnPct to R-multiples")
+        r = trades['ReturnPct'] / abs(losses.mean())
+    else:
+        raise ValueError("Trade log needs r_multiple, SL / EntryPrice / ExitPrice or ReturnPct")
+    return r.replace([np.inf, -np.inf], np.nan).dropna().to_numpy(dtype=float)
+
+def load_r_multiples(db):
+    """R-multiples of the closed trades in the DB."""
+    from app.trade_stats import load_closed_trades
+    return r_multiples_from_log(load_closed_trades(db))
+
+def _band_steps(n_trades):
+    return np.unique(np.linspace(0, n_trades - 1, min(BAND_POINTS, n_trades)).round().astype(int))
+
+def _simulate_chunk(job):
+    """One chunk of paths: {risk: (final equity, max drawdown, ruined, equity at band steps)}."""
+    r, risks, n_paths, n_trades, ruin, seed = job
+    rng = np.random.default_rng(seed)
+    sample = r[rng.integers(0, len(r), size=(n_paths, n_trades))]
+    log_eq = np.empty_like(sample)
+    peak = np.empty_like(sample)
+    steps = _band_steps(n_trades)
+    ruin_level = np.log1p(-ruin)
+
+    out = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for f in risks:
+            # log equity after each trade; a loss of the whole stake gives -inf (equity 0)
+            np.multiply(sample, f, out=log_eq)
+            np.maximum(log_eq, -1.0, out=log_eq)
+            np.log1p(log_eq, out=log_eq)
+            np.cumsum(log_eq, axis=1, out=log_eq)
+            # Running peak includes the starting equity (log 0)
+            np.maximum(log_eq, 0.0, out=peak)
+            np.maximum.accumulate(peak, axis=1, out=peak)
+            np.subtract(log_eq, peak, out=peak)
+            out[f] = (
+                np.exp(log_eq[:, -1]),
+                -np.expm1(peak.min(axis=1)),
+                log_eq.min(axis=1) <= ruin_level,
+                np.exp(log_eq[:, steps]).astype(np.float32),
+            )
+    return out
+
+def simulate(r, risks=DEFAULT_RISKS, n_paths=DEFAULT_PATHS, n_trades=DEFAULT_TRADES, ruin=RUIN,
+             workers=None, seed=42, chunk_paths=None):
+    """
+    Bootstraps n_paths equity paths per risk setting (the same sampled trades for every
+    setting). Returns {risk: {'final', 'max_drawdown', 'ruined', 'bands'}} where bands is a
+    frame of equity quantiles (columns) per trade number (index).
+    """
+    r = np.asarray(r, dtype=float)
+    if len(r) == 0:
+        raise ValueError("No R-multiples to sample from")
+    chunk_paths = chunk_paths or max(1, CHUNK_BYTES // (8 * n_trades))
+    sizes = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(r, tuple(risks), size, n_trades, ruin, s) for size, s in zip(sizes, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        chunks = [_simulate_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunks = list(pool.map(_simulate_chunk, jobs))
+
+    steps = _band_steps(n_trades) + 1
+    results = {}
+    for f in risks:
+        final, drawdown, ruined, at_steps = (np.concatenate(parts) for parts in zip(*(c[f] for c in chunks)))
+        bands = pd.DataFrame(np.quantile(at_steps, BAND_QUANTILES, axis=0).T, index=pd.Index(steps, name='trade'),
+                             columns=[f"p{int(q * 100)}" for q in BAND_QUANTILES])
+        results[f] = {'final': final, 'max_drawdown': drawdown, 'ruined': ruined, 'bands': bands}
+    return results
+
+def summarize(results):
+    """One row per risk setting: final equity quantiles, drawdown distribution and risk of ruin."""
+    rows = []
+    for f, res in results.items():
+        final, dd = res['final'], res['max_drawdown']
+        rows.append({
+            'risk_pct': f * 100,
+            'final_p5': np.quantile(final, 0.05),
+            'final_median': np.median(final),
+            'final_p95': np.quantile(final, 0.95),
+            'loss_prob_pct': (final < 1).mean() * 100,
+            'max_dd_median_pct': np.median(dd) * 100,
+            'max_dd_p95_pct': np.quantile(dd, 0.95) * 100,
+            'dd_over_20_pct': (dd > 0.2).mean() * 100,
+            'risk_of_ruin_pct': res['ruined'].mean() * 100,
+        })
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--risk", type=float, nargs="+", default=[f * 100 for f in DEFAULT_RISKS],
+                        help="Percent of equity risked per trade")
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    parser.add_argument("--trades", type=int, default=DEFAULT_TRADES, help="Trades per path")
+    parser.add_argument("--ruin", type=float, default=RUIN, help="Drawdown from the start that counts as ruin")
+    parser.add_argument("--trades-csv", help="Backtest trade log instead of the trades table")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.trades_csv:
+        r = r_multiples_from_log(pd.read_csv(args.trades_csv))
+    else:
+        from app.database import get_db
+        db = next(get_db())
+        try:
+            r = load_r_multiples(db)
+        finally:
+            db.close()
+    if len(r) == 0:
+        print("No closed trades with a stop to sample from.")
+        return
+    print(f"Sampling {len(r)} trades: win rate {(r > 0).mean() * 100:.1f}%, expectancy {r.mean():+.2f}R")
+
+    start = time.perf_counter()
+    results = simulate(r, [p / 100 for p in args.risk], args.paths, args.trades, args.ruin,
+                       workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{args.paths} paths x {args.trades} trades, ruin = -{args.ruin * 100:.0f}% ({elapsed:.2f} s)")
+    print(summarize(results).round(2).to_string(index=False))
+    for f, res in results.items():
+        print(f"\nEquity bands at {f * 100:g}% risk (x starting equity)")
+        print(res['bands'].iloc[::max(1, len(res['bands']) // 5)].round(3).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Declarative screens.
+
+A screen is a list of predicates, all of which must hold (AND):
+
+    [column, op, value]
+
+- column: any column of the frame being screened (Stock fields, sector_median_pe,
+  calc_peg, rs_score, latest indicator columns like rsi_14 / ema_200 ...)
+- op: <, <=, >, >=, ==, !=, between, in, notnull, isnull
+- value: a literal, [low, high] for between, a list for in, or "$other_column"
+  to compare against another column.
+
+Screens can live in this module (DEFAULT_SCREENS) or in a JSON / YAML file (load_screens).
+NaN / NULL never passes a comparison, same as SQL.
+"""
+import json
+import operator
+import numpy as np
+import pandas as pd
+
+DEFAULT_SCREENS = {
+    # app.screener: undervalued vs sector, reasonable PEG, growing earnings
+    "value_growth": [
+        ["current_pe", ">", 0],
+        ["current_pe", "<", "$sector_median_pe"],
+        ["calc_peg", ">", 0],
+        ["calc_peg", "<", 2.0],
+        ["quarterly_earnings_growth", ">", 0.15],
+    ],
+    # Same, plus outperforming Nifty over the RS window
+    "techno_fundamental": [
+        ["current_pe", ">", 0],
+        ["current_pe", "<", "$sector_median_pe"],
+        ["calc_peg", ">", 0],
+        ["calc_peg", "<", 2.0],
+        ["quarterly_earnings_growth", ">", 0.15],
+        ["rs_score", ">", 0],
+    ],
+    # compare_strategies Group B: drop loss making and extremely overvalued stocks
+    "pe_band": [
+        ["current_pe", "between", [0, 85]],
+    ],
+}
+
+_COMPARE_OPS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+_ALL_OPS = set(_COMPARE_OPS) | {'between', 'in', 'notnull', 'isnull'}
+
+def load_screens(path):
+    """Loads {name: [predicates]} from a .json or .yaml/.yml file."""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required for YAML screen files (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def _is_ref(value):
+    return isinstance(value, str) and value.startswith('$')
+
+class Predicate:
+    """One [column, op, value] condition."""
+    def __init__(self, column, op, value=None):
+        if op not in _ALL_OPS:
+            raise ValueError(f"Unknown operator '{op}' in screen rule for {column}")
+        if op == 'between' and (not isinstance(value, (list, tuple)) or len(value) != 2):
+            raise ValueError(f"'between' needs [low, high] for {column}")
+        self.column = column
+        self.op = op
+        self.value = tuple(value) if isinstance(value, list) else value
+
+    @property
+    def key(self):
+        return (self.column, self.op, self.value)
+
+    @property
+    def label(self):
+        if self.op in ('notnull', 'isnull'):
+            return f"{self.column} {self.op}"
+        return f"{self.column} {self.op} {self.value}"
+
+    def columns(self):
+        cols = {self.column}
+        if _is_ref(self.value):
+            cols.add(self.value[1:])
+        return cols
+
+    def evaluate(self, df):
+        """Vectorized mask (numpy bool array) over df."""
+        series = df[self.column]
+
+        if self.op == 'notnull':
+            mask = series.notna()
+        elif self.op == 'isnull':
+            mask = series.isna()
+        elif self.op == 'in':
+            mask = series.isin(list(self.value))
+        elif self.op == 'between':
+            mask = series.between(*self.value)
+        else:
+            other = df[self.value[1:]] if _is_ref(self.value) else self.value
+            # NaN / None never passes, including for != (SQL semantics)
+            mask = _COMPARE_OPS[self.op](series, other) & series.notna()
+            if _is_ref(self.value):
+                mask &= other.notna()
+
+        return mask.to_numpy(dtype=bool)
+
+    def to_sql(self, model):
+        """SQLAlchemy expression for this predicate, or None if it can't be pushed down to `model`."""
+        column = getattr(model, self.column, None)
+        if column is None or _is_ref(self.value) or not hasattr(column, 'property'):
+            return None
+
+        if self.op == 'notnull':
+            return column.isnot(None)
+        if self.op == 'isnull':
+            return column.is_(None)
+        if self.op == 'in':
+            return column.in_(list(self.value))
+        if self.op == 'between':
+            return column.between(*self.value)
+        return _COMPARE_OPS[self.op](column, self.value)
+
+class Screen:
+    """A named list of predicates (AND)."""
+    def __init__(self, name, rules):
+        self.name = name
+        self.predicates = [Predicate(*r) for r in rules]
+
+    def columns(self):
+        cols = set()
+        for p in self.predicates:
+            cols |= p.columns()
+        return cols
+
+    def sql_filters(self, model):
+        """
+        Splits predicates into SQL WHERE clauses on `model` and residual predicates.
+        Returns (clauses, residual) where residual must be evaluated in pandas.
+        """
+        clauses, residual = [], []
+        for p in self.predicates:
+            clause = p.to_sql(model)
+            if clause is None:
+                residual.append(p)
+            else:
+                clauses.append(clause)
+        return clauses, residual
+
+def compile_screens(screens):
+    """Builds Screen objects from {name: rules}. Accepts names of DEFAULT_SCREENS in place of rules."""
+    if isinstance(screens, (list, tuple)):
+        screens = {name: DEFAULT_SCREENS[name] for name in screens}
+    return [Screen(name, rules) for name, rules in screens.items()]
+
+def evaluate_screens(df, screens):
+    """
+    Evaluates many screens over df in one pass.
+    Every distinct predicate is computed once as a vectorized mask and shared
+    between the screens that use it.
+
+    Returns a bool DataFrame (same index as df), one column per screen.
+    """
+    if not screens or not isinstance(next(iter(screens), None), Screen):
+        screens = compile_screens(screens)
+
+    masks = {}
+    result = {}
+    for screen in screens:
+        combined = np.ones(len(df), dtype=bool)
+        for p in screen.predicates:
+            if p.key not in masks:
+                masks[p.key] = p.evaluate(df)
+            combined &= masks[p.key]
+        result[screen.name] = combined
+    return pd.DataFrame(result, index=df.index)
+
+def explain_failures(df, screen):
+    """Label of the first failing predicate per row (None where the row passes)."""
+    if not isinstance(screen, Screen):
+        screen = Screen("screen", screen)
+
+    reasons = pd.Series([None] * len(df), index=df.index, dtype=object)
+    pending = np.ones(len(df), dtype=bool)
+    for p in screen.predicates:
+        failed = pending & ~p.evaluate(df)
+        reasons[failed] = p.label
+        pending &= ~failed
+    return reasons
@@ -1,106 +1,205 @@
-from app.database import get_db, Stock
+from app.database import get_db, Stock, SectorStats, DailyPrice
+from app.rules import DEFAULT_SCREENS, Screen, compile_screens, evaluate_screens
+import numpy as np
 import pandas as pd
+from datetime import datetime
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-def run_screener():
+# sector_stats row holding the universe-wide median (fallback for sectors without profitable stocks)
+GLOBAL_SECTOR = "__ALL__"
+
+# Latest-bar columns a screen may reference
+INDICATOR_COLUMNS = ['close', 'rsi_14', 'ema_200', 'ema_50', 'ema_20']
+
+WATCHLIST_COLUMNS = ['ticker', 'sector', 'current_pe', 'sector_median_pe', 'calc_peg', 'quarterly_earnings_growth']
+
+def refresh_sector_stats(db: Session):
+    """
+    Rebuilds the sector_stats table (median PE of profitable stocks per sector).
+    Called after fundamentals change and at the end of every EOD run (stocks also arrive
+    through backfill, verify_data --repair and DB sync restores).
+    """
+    df = pd.read_sql(db.query(Stock.sector, Stock.current_pe).statement, db.bind)
+    df['sector'] = df['sector'].fillna('Unknown')
+    profitable = df[df['current_pe'] > 0]
+
+    stats = profitable.groupby('sector')['current_pe'].agg(['median', 'count']).reset_index()
+    stats.columns = ['sector', 'median_pe', 'stock_count']
+
+    global_row = pd.DataFrame([{
+        'sector': GLOBAL_SECTOR,
+        'median_pe': profitable['current_pe'].median() if not profitable.empty else None,
+        'stock_count': len(profitable)
+    }])
+    stats = pd.concat([stats, global_row], ignore_index=True)
+    stats['updated_at'] = datetime.utcnow()
+
+    db.query(SectorStats).delete(synchronize_session=False)
+    records = stats.astype(object).where(stats.notna(), None).to_dict('records')
+    db.execute(SectorStats.__table__.insert(), records)
+    db.commit()
+    print(f"Sector stats refreshed for {len(stats) - 1} sectors.")
+    return stats
+
+def load_screener_frame(db: Session, where=None):
+    """
+    Stocks joined with their materialized sector median PE (global median where missing).
+    `where` is a list of SQLAlchemy clauses on Stock pushed down to the query.
+    """
+    query = db.query(Stock)
+    if where:
+        query = query.filter(*where)
+    df = pd.read_sql(query.statement, db.bind)
+    if df.empty:
+        return df
+
+    stats = pd.read_sql(db.query(SectorStats.sector, SectorStats.median_pe, SectorStats.stock_count).statement, db.bind)
+    # Stale when the profitable universe no longer matches the stored one (stocks added / restored since)
+    profitable = db.query(func.count(Stock.ticker)).filter(Stock.current_pe > 0).scalar()
+    stored = stats.loc[stats['sector'] == GLOBAL_SECTOR, 'stock_count']
+    if stored.empty or stored.iloc[0] != profitable:
+        stats = refresh_sector_stats(db)
+
+    medians = stats.set_index('sector')['median_pe']
+    global_median = medians.get(GLOBAL_SECTOR)
+
+    df['sector'] = df['sector'].fillna('Unknown')
+    df['sector_median_pe'] = df['sector'].map(medians.drop(GLOBAL_SECTOR, errors='ignore')).fillna(global_median)
+
+    # PEG = PE / (Growth Rate * 100). Growth is stored as 0.20 for 20%.
+    df['calc_peg'] = (df['current_pe'] / (df['quarterly_earnings_growth'] * 100)).replace([np.inf, -np.inf], np.nan)
+    return df
+
+def _attach_indicators(db: Session, df, columns):
+    """Adds the latest stored value of each indicator column per ticker."""
+    latest = db.query(DailyPrice.ticker, func.max(DailyPrice.date).label('max_date')).group_by(DailyPrice.ticker).subquery()
+    query = db.query(DailyPrice.ticker, *[getattr(DailyPrice, c) for c in columns]).join(
+        latest, (DailyPrice.ticker == latest.c.ticker) & (DailyPrice.date == latest.c.max_date)
+    )
+    ind = pd.read_sql(query.statement, db.bind).drop_duplicates(subset=['ticker'], keep='last')
+    return df.merge(ind, on='ticker', how='left')
+
+def _rs_scores(db: Session, window, market=None):
+    """
+    {ticker: rs_score} from the precomputed rs_scores table.
+    If the table is empty or behind the latest session, scores that session once from the close panel.
+    """
+    from app.relative_strength import get_rs_snapshot, load_close_panel, compute_rs_scores
+
+    snapshot = get_rs_snapshot(db, window=window)
+    if snapshot:
+        return snapshot
+
+    print("No RS scores for the latest session. Computing them from the price panel...")
+    from app.database import DailyPrice
+    sessions = [d for (d,) in db.query(DailyPrice.date).distinct().order_by(DailyPrice.date.desc()).limit(window + 10)]
+    if not sessions:
+        return {}
+
+    if market is None:
+        from app.market_utils import MarketAnalyzer
+        market = MarketAnalyzer()
+    panel = load_close_panel(db, sessions[-1])
+    scores = compute_rs_scores(panel, market.get_nifty_close(), windows=(window,), dates=[sessions[0]])
+    return dict(zip(scores['ticker'], scores['rs_score']))
+
+def _prepare_frame(db: Session, columns, where=None, rs_window=5, market=None):
+    """Screener frame plus whatever derived columns (RS, indicators) the screens reference."""
+    df = load_screener_frame(db, where=where)
+    if df.empty:
+        return df
+
+    indicators = [c for c in INDICATOR_COLUMNS if c in columns and c not in df.columns]
+    if indicators:
+        df = _attach_indicators(db, df, indicators)
+
+    if 'rs_score' in columns:
+        # Missing RS (new listing / data gap) is NaN and fails any comparison,
+        # same as get_relative_strength returning False
+        df['rs_score'] = df['ticker'].map(_rs_scores(db, rs_window, market=market))
+    return df
+
+def _as_screen(screen):
+    if isinstance(screen, Screen):
+        return screen
+    if isinstance(screen, str):
+        return Screen(screen, DEFAULT_SCREENS[screen])
+    return Screen("custom", screen)
+
+def screen_stocks(db: Session, screen="techno_fundamental", rs_window=5, market=None):
+    """
+    Runs one declarative screen (see app.rules) over the universe.
+    Predicates on plain Stock columns are pushed down to the SQL WHERE clause,
+    the rest (sector median, PEG, RS, indicators) are applied as one vectorized mask.
+
+    The default screen is the techno-fundamental filter:
+    PE < sector median, 0 < PEG < 2.0, growth > 15%, PE > 0, RS vs Nifty > 0.
+
+    Returns the watchlist DataFrame sorted by earnings growth (desc).
+    """
+    screen = _as_screen(screen)
+    clauses, residual = screen.sql_filters(Stock)
+
+    df = _prepare_frame(db, screen.columns(), where=clauses, rs_window=rs_window, market=market)
+    if df.empty:
+        print("No stocks matched the SQL filters.")
+        return df
+
+    print(f"Screening {len(df)} stocks ({len(clauses)} predicates pushed to SQL)...")
+
+    mask = np.ones(len(df), dtype=bool)
+    for p in residual:
+        mask &= p.evaluate(df)
+
+    return df[mask].sort_values(by='quarterly_earnings_growth', ascending=False)
+
+def screen_universe(db: Session, screens=None, rs_window=5, market=None):
+    """
+    Evaluates many screens (default: all DEFAULT_SCREENS) in one pass over the universe.
+    Returns the screener frame with one bool column per screen.
+    """
+    screens = compile_screens(screens or DEFAULT_SCREENS)
+    columns = set()
+    for screen in screens:
+        columns |= screen.columns()
+
+    df = _prepare_frame(db, columns, rs_window=rs_window, market=market)
+    if df.empty:
+        return df
+    return df.join(evaluate_screens(df, screens))
+
+def run_screener(output_csv="watchlist.csv"):
+    """Runs the screener and prints the watchlist. Pass output_csv=None to skip writing the CSV."""
     print("Running Fundamental Screener...")
     db_gen = get_db()
     db = next(db_gen)
-    
+
     try:
-        # Load all stocks into DataFrame
-        query = db.query(Stock).statement
-        df = pd.read_sql(query, db.bind)
-        
-        if df.empty:
-            print("No stocks in database.")
-            return
-
-        print(f"Total Stocks: {len(df)}")
-        
-        # 1. Calculate Sector PE
-        # Clean null sectors
-        df['sector'] = df['sector'].fillna('Unknown')
-        
-        # Group by sector and calculate median PE
-        sector_stats = df[df['current_pe'] > 0].groupby('sector')['current_pe'].median().reset_index()
-        sector_stats.rename(columns={'current_pe': 'sector_median_pe'}, inplace=True)
-        
-        # Merge back
-        df = pd.merge(df, sector_stats, on='sector', how='left')
-        
-        # Fill missing sector PEs with global median or high value to be safe
-        global_median = df[df['current_pe'] > 0]['current_pe'].median()
-        df['sector_median_pe'] = df['sector_median_pe'].fillna(global_median)
-        
-        # 2. Apply Filters
-        
-        # Calculate PEG dynamically if missing
-        # PEG = PE / (Growth Rate * 100)
-        # We have Growth as 0.20 for 20%, so we multiply by 100 -> 20.
-        with pd.option_context('mode.use_inf_as_na', True):
-            df['calc_peg'] = df['current_pe'] / (df['quarterly_earnings_growth'] * 100)
-        
-        # Condition 1: Undervalued relative to Sector (PE < Sector PE)
-        # We can be slightly loose, e.g., PE < 1.2 * Sector PE. Using 1.0 based on request.
-        cond_value = df['current_pe'] < df['sector_median_pe']
-        
-        # Condition 2: PEG < 1.5 (Growth at reasonable price)
-        # Use calculated PEG. Must be positive.
-        cond_peg = (df['calc_peg'] > 0) & (df['calc_peg'] < 2.0) # Relaxed to 2.0 given strictness, or stick to 1.5
-        
-        # Condition 3: Earnings Growth > 15% (0.15)
-        cond_growth = df['quarterly_earnings_growth'] > 0.15
-        
-        # Condition 4: PE > 0
-        cond_profitable = df['current_pe'] > 0
-        
-        watchlist = df[cond_value & cond_peg & cond_growth & cond_profitable].copy() # Copy to avoid SettingWithCopyWarning
-        
-        # Sort by Growth
-        watchlist = watchlist.sort_values(by='quarterly_earnings_growth', ascending=False)
-        
-        # 3. Market & Relative Strength Filter
         from app.market_utils import MarketAnalyzer
         ma = MarketAnalyzer()
-        
+
         print("\nChecking Market Regime...")
         nifty_trend = ma.get_nifty_trend()
         print(f"Nifty Trend: {nifty_trend}")
-        
+
         if nifty_trend == "DOWNTREND":
             print("⚠️ Market is in DOWNTREND. Be cautious. Applying strict RS filters.")
-            # Option: Return empty if strict mode? 
-            # For now, let's just proceed but filter strictly.
-            
-        print("Checking Relative Strength for candidates...")
-        # Apply RS Check
-        # We iterate and keep only those with RS > 0
-        strong_stocks = []
-        for index, row in watchlist.iterrows():
-            ticker = row['ticker']
-            if ma.get_relative_strength(ticker, db):
-                strong_stocks.append(row)
-            else:
-                pass # Discard weak stock
-        
-        if len(strong_stocks) < len(watchlist):
-            print(f"Filtered {len(watchlist) - len(strong_stocks)} stocks due to poor Relative Strength.")
-            
-        watchlist = pd.DataFrame(strong_stocks)
-        
-        print(f"\nScanning {len(df)} stocks...")
+
+        watchlist = screen_stocks(db, market=ma)
+
         print(f"Found {len(watchlist)} matches.")
-        
+
         if not watchlist.empty:
             print("\n=== Watchlist (Top 10) ===")
-            cols = ['ticker', 'sector', 'current_pe', 'sector_median_pe', 'calc_peg', 'quarterly_earnings_growth']
-            print(watchlist[cols].head(10).to_string(index=False))
-            
-            # Save to CSV
-            watchlist[cols].to_csv("watchlist.csv", index=False)
-            print("\nSaved full watchlist to watchlist.csv")
-            
+            print(watchlist[WATCHLIST_COLUMNS].head(10).to_string(index=False))
+
+            if output_csv:
+                watchlist[WATCHLIST_COLUMNS].to_csv(output_csv, index=False)
+                print(f"\nSaved full watchlist to {output_csv}")
+
+        return watchlist
+
     except Exception as e:
         print(f"Error running screener: {e}")
     finally:
@@ -0,0 +1,88 @@
+"""
+Entry / stop arrays of every strategy from one SMC analysis pass.
+
+compute_signal_bundle(df) runs analyze_ticker once and evaluates each registered
+strategy rule on the annotated frame. A rule is a function of that frame that returns
+(entry, stop) arrays aligned with the bars, NaN where there is no setup:
+
+    @register("fvg")
+    def fvg_rule(s_df): ...
+
+The backtesting strategies take a bundle (bt.run(bundle=...)) or build one from their
+data; the signal functions get_*_signals and the signals table (premarket scan) read
+the same arrays.
+"""
+import numpy as np
+import pandas as pd
+from app.smc_agent import analyze_ticker
+from app import instrument
+
+RULES = {}
+
+def register(name):
+    def wrap(rule):
+        RULES[name] = rule
+        return rule
+    return wrap
+
+def _fvg_mask(s_df):
+    return s_df['bullish_fvg'].to_numpy(dtype=bool)
+
+def _shift2(values):
+    return pd.Series(values).shift(2).to_numpy(dtype=float)
+
+@register("smc")
+def smc_rule(s_df):
+    """Bullish FVG at i confirms the OB at i-2: limit at its High, stop at its Low."""
+    mask = _fvg_mask(s_df)
+    entry = np.where(mask, _shift2(s_df['High'].to_numpy()), np.nan)
+    stop = np.where(mask, _shift2(s_df['Low'].to_numpy()), np.nan)
+    return entry, stop
+
+@register("trend_ob")
+def trend_ob_rule(s_df):
+    """The SMC OB setup, only while Close is above EMA 200 (stored, else computed)."""
+    if 'EMA_200' in s_df.columns:
+        ema = s_df['EMA_200'].to_numpy(dtype=float)
+    elif 'ema_200' in s_df.columns:
+        ema = s_df['ema_200'].to_numpy(dtype=float)
+    else:
+        ema = s_df['Close'].ewm(span=200).mean().to_numpy()
+    entry, stop = smc_rule(s_df)
+    up = s_df['Close'].to_numpy(dtype=float) > ema
+    return np.where(up, entry, np.nan), np.where(up, stop, np.nan)
+
+@register("fvg")
+def fvg_rule(s_df):
+    """Pure FVG: limit at the top of the gap (Low of i), stop at the Low of i-2."""
+    mask = _fvg_mask(s_df)
+    lows = s_df['Low'].to_numpy(dtype=float)
+    return np.where(mask, lows, np.nan), np.where(mask, _shift2(lows), np.nan)
+
+class SignalBundle:
+    """analyze_ticker output plus {strategy: (entry, stop)} for one price frame."""
+    def __init__(self, annotated, signals):
+        self.annotated = annotated
+        self.signals = signals
+
+    def __len__(self):
+        return len(self.annotated)
+
+    def __getitem__(self, name):
+        return self.signals[name]
+
+    def __contains__(self, name):
+        return name in self.signals
+
+    def __repr__(self):
+        return f"SignalBundle({len(self)} bars: {', '.join(self.signals)})"
+
+@instrument.timed("signal_bundle")
+def compute_signal_bundle(df, ticker="DUMMY", strategies=None):
+    """One analyze_ticker pass over df, then every registered rule (or `strategies`)."""
+    if 'Close' not in df.columns:
+        df = df.copy(deep=False)
+        df.columns = [c.capitalize() for c in df.columns]
+    _, s_df = analyze_ticker(ticker, df)
+    names = RULES if strategies is None else strategies
+    return SignalBundle(s_df, {name: RULES[name](s_df) for name in names})
@@ -0,0 +1,159 @@
+"""
+Content-addressed memo of strategy signal arrays.
+
+Backtest(...).run() calls the signal function of its strategy every time, so reruns,
+bt.optimize() over the exit parameters and overlapping ticker groups recompute the same
+(entry, stop) arrays. cached_signals(df, name) keys them on a hash of the frame's
+Open / High / Low / Close (and stored EMA 200) arrays, the rule name and a fingerprint
+of the signal code, so an edit to app/smc_agent.py or app/signal_bundle.py invalidates
+older entries.
+
+Two tiers:
+- an in-process LRU of at most SIGNAL_CACHE_MB (default 128) of arrays
+- optionally .npy files under SIGNAL_CACHE_DIR, shared across runs and processes
+
+Lookups are counted in the run summary (signal_cache.hits / .disk_hits / .misses);
+stats() returns the numbers of this process.
+
+Environment:
+- SIGNAL_CACHE_MB: in-process budget, 0 disables the memo
+- SIGNAL_CACHE_DIR: directory of the on-disk tier (off when unset)
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from app import instrument, smc_agent, signal_bundle
+from app.signal_bundle import compute_signal_bundle
+
+CACHE_BYTES = int(float(os.getenv("SIGNAL_CACHE_MB", "128")) * 1024 * 1024)
+CACHE_DIR = os.getenv("SIGNAL_CACHE_DIR") or None
+
+# Columns the rules read; the EMA is only hashed when the frame carries one
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close')
+EMA_COLUMNS = ('EMA_200', 'ema_200')
+
+_lock = threading.Lock()
+_memo = OrderedDict()
+_bytes = 0
+_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+_fingerprint = None
+
+def code_fingerprint():
+    """Hash of the signal code (smc_agent + signal_bundle sources), computed once."""
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.blake2b(digest_size=8)
+        for module in (smc_agent, signal_bundle):
+            with open(module.__file__, "rb") as f:
+                h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+def frame_key(df, name):
+    """Hex digest of the price arrays of df, the rule name and the code fingerprint."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{code_fingerprint()}|{name}|{len(df)}".encode())
+    # Same column names as compute_signal_bundle sees (it capitalizes lowercase frames)
+    names = list(df.columns) if 'Close' in df.columns else [c.capitalize() for c in df.columns]
+    position = {c: i for i, c in enumerate(names)}
+    hashed = [c for c in PRICE_COLUMNS + EMA_COLUMNS if c in position]
+    if not set(PRICE_COLUMNS) <= set(hashed):
+        raise KeyError(f"Price frame needs {', '.join(PRICE_COLUMNS)} columns")
+    for c in hashed:
+        h.update(c.encode())
+        values = np.ascontiguousarray(df.iloc[:, position[c]].to_numpy())
+        h.update(values.dtype.str.encode())
+        h.update(values.view(np.uint8))
+    return h.hexdigest()
+
+def _disk_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.npy")
+
+def _load(key):
+    try:
+        stacked = np.load(_disk_path(key))
+    except (OSError, ValueError):
+        return None
+    return stacked[0], stacked[1]
+
+def _save(key, signals):
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.vstack(signals))
+        os.replace(tmp, path)  # Atomic: concurrent workers never see a partial file
+    except OSError as e:
+        print(f"Signal cache: could not write {path}: {e}")
+
+def _remember(key, signals):
+    global _bytes
+    with _lock:
+        if key in _memo:
+            return
+        _memo[key] = signals
+        _bytes += sum(a.nbytes for a in signals)
+        while _bytes > CACHE_BYTES and _memo:
+            _, evicted = _memo.popitem(last=False)
+            _bytes -= sum(a.nbytes for a in evicted)
+
+def _hit(kind):
+    with _lock:
+        _stats[kind] += 1
+    instrument.count(f"signal_cache.{kind}")
+
+def cached_signals(df, name):
+    """
+    (entry, stop) of rule `name` on df, from the memo when the same prices were seen
+    before. The arrays are shared between callers and read-only.
+    """
+    if CACHE_BYTES <= 0 and CACHE_DIR is None:
+        return compute_signal_bundle(df, strategies=[name])[name]
+    key = frame_key(df, name)
+    with _lock:
+        signals = _memo.get(key)
+        if signals is not None:
+            _memo.move_to_end(key)
+    if signals is not None:
+        _hit('hits')
+        return signals
+
+    signals = _load(key) if CACHE_DIR else None
+    if signals is not None:
+        _hit('disk_hits')
+    else:
+        _hit('misses')
+        signals = compute_signal_bundle(df, strategies=[name])[name]
+        signals = tuple(np.asarray(a, dtype=float) for a in signals)
+        if CACHE_DIR:
+            _save(key, signals)
+    for a in signals:
+        a.setflags(write=False)
+    if CACHE_BYTES > 0:
+        _remember(key, signals)
+    return signals
+
+def stats():
+    """Lookups of this process: hits, disk_hits, misses, entries, bytes and hit_rate (%)."""
+    with _lock:
+        out = dict(_stats, entries=len(_memo), bytes=_bytes)
+    lookups = out['hits'] + out['disk_hits'] + out['misses']
+    out['hit_rate'] = (out['hits'] + out['disk_hits']) / lookups * 100 if lookups else 0.0
+    return out
+
+def describe():
+    s = stats()
+    return (f"Signal cache: {s['hits'] + s['disk_hits']} hits ({s['disk_hits']} from disk), "
+            f"{s['misses']} misses, hit rate {s['hit_rate']:.1f}%")
+
+def clear():
+    """Empties the in-process tier (the disk tier is left alone)."""
+    global _bytes
+    with _lock:
+        _memo.clear()
+        _bytes = 0
+        for k in _stats:
+            _stats[k] = 0
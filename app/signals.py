@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, distinct
+from sqlalchemy.orm import Session
+from app.database import DailyPrice, Signal, RelativeStrength
+from app.prices import load_price_frame
+from app.signal_bundle import compute_signal_bundle
+from app import instrument
+
+SIGNAL_FLAGS = ['swing_high', 'swing_low', 'bullish_fvg', 'bearish_fvg', 'bullish_ob', 'bearish_ob']
+
+# Flags on the newest bars can still change when more bars arrive:
+# swings need 5 bars on the right, OBs are marked on candle i-2. Recompute that tail.
+RECOMPUTE_BARS = 6
+
+# Bars loaded before the first recomputed row so swing / FVG windows see full context
+WARMUP_BARS = 20
+
+def build_signal_rows(ticker, df, bar_offset=0):
+    """
+    Runs the SMC analysis on a price frame (date index, Title Case columns) and
+    returns one signals row per bar as a DataFrame.
+    `bar_offset` is the number of bars stored before df (for history_bars).
+    Entry / stop of the FVG setup come from the same signal bundle the backtests use.
+    """
+    bundle = compute_signal_bundle(df, ticker, strategies=["fvg"])
+    s_df = bundle.annotated
+    _, fvg_stop = bundle["fvg"]
+
+    close = s_df['Close']
+    # All-NULL EMA (fewer than 200 bars stored) loads as object dtype
+    ema = s_df['EMA_200'].astype(float) if 'EMA_200' in s_df.columns else pd.Series(np.nan, index=s_df.index)
+
+    rows = pd.DataFrame({
+        'ticker': ticker,
+        'date': s_df.index.date,
+        'close': close.values,
+        'low': s_df['Low'].values,
+        'ema_200': ema.values,
+        'trend': np.where(ema.isna(), None, np.where(close > ema, 'UP', 'DOWN')),
+        'history_bars': bar_offset + np.arange(1, len(s_df) + 1),
+        'fvg_top': s_df['fvg_top'].values,
+        'fvg_bottom': s_df['fvg_bottom'].values,
+        # Stop for FVG entries: Low of candle i-2
+        'setup_low': fvg_stop,
+    })
+    for flag in SIGNAL_FLAGS:
+        rows[flag] = s_df[flag].astype(bool).values
+    return rows
+
+def _plan_ticker(db: Session, ticker):
+    """Returns (load_from, recompute_from). None means full history."""
+    tail = [d for (d,) in db.query(Signal.date).filter(Signal.ticker == ticker)
+            .order_by(Signal.date.desc()).limit(RECOMPUTE_BARS).all()]
+    if not tail:
+        return None, None
+
+    recompute_from = tail[-1]
+    warmup = [d for (d,) in db.query(DailyPrice.date).filter(
+        DailyPrice.ticker == ticker, DailyPrice.date < recompute_from
+    ).order_by(DailyPrice.date.desc()).limit(WARMUP_BARS).all()]
+    load_from = warmup[-1] if warmup else None
+    return load_from, recompute_from
+
+def update_signals(db: Session, tickers=None):
+    """
+    Incrementally writes the signals table.
+    Only the last RECOMPUTE_BARS signal rows plus new bars of each ticker are recomputed,
+    from a short warm-up window instead of the full history. A ticker whose signals
+    already reach its latest bar is still recomputed: that bar may have been rewritten
+    on the same date (partial-bar refresh, verify_data --fix).
+    Each ticker's delete + insert is committed on its own, so a failure rolls back only
+    that ticker.
+    """
+    print("Updating signals table...")
+
+    last_price = dict(db.query(DailyPrice.ticker, func.max(DailyPrice.date)).group_by(DailyPrice.ticker).all())
+    last_signal = dict(db.query(Signal.ticker, func.max(Signal.date)).group_by(Signal.ticker).all())
+
+    if tickers is not None:
+        wanted = set(tickers)
+        last_price = {t: d for t, d in last_price.items() if t in wanted}
+
+    updated = 0
+    written = 0
+    for ticker, price_date in last_price.items():
+        if last_signal.get(ticker) is not None and last_signal[ticker] > price_date:
+            continue
+
+        try:
+            load_from, recompute_from = _plan_ticker(db, ticker)
+            df = load_price_frame(db, ticker, start_date=load_from)
+            if df.empty:
+                continue
+
+            bar_offset = 0
+            if load_from is not None:
+                bar_offset = db.query(func.count(distinct(DailyPrice.date))).filter(
+                    DailyPrice.ticker == ticker, DailyPrice.date < load_from
+                ).scalar()
+
+            rows = build_signal_rows(ticker, df, bar_offset=bar_offset)
+            if recompute_from is not None:
+                rows = rows[rows['date'] >= recompute_from]
+            if rows.empty:
+                continue
+
+            first_date = rows['date'].iloc[0]
+            rs = dict(db.query(RelativeStrength.date, RelativeStrength.rs_score).filter(
+                RelativeStrength.ticker == ticker,
+                RelativeStrength.window == 5,
+                RelativeStrength.date >= first_date
+            ).all())
+            rows['rs_5'] = rows['date'].map(rs)
+
+            db.query(Signal).filter(Signal.ticker == ticker, Signal.date >= first_date).delete(synchronize_session=False)
+            records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+            db.execute(Signal.__table__.insert(), records)
+            db.commit()
+
+            updated += 1
+            written += len(records)
+        except Exception as e:
+            db.rollback()
+            print(f"Failed signals for {ticker}: {e}")
+
+    instrument.count("rows_written", written)
+    print(f"Signals updated for {updated} tickers ({written} rows).")
+    return written
+
+def query_signals(db: Session, on_date=None, bullish_fvg=None, bullish_ob=None, trend=None, min_history=None):
+    """
+    Indexed lookup on the signals table.
+    on_date=None returns each ticker's latest row.
+    e.g. query_signals(db, on_date=d, bullish_fvg=True, trend='UP') -> bullish FVGs above EMA200 on d.
+    """
+    query = db.query(Signal)
+    if on_date is None:
+        latest = db.query(Signal.ticker, func.max(Signal.date).label('max_date')).group_by(Signal.ticker).subquery()
+        query = query.join(latest, (Signal.ticker == latest.c.ticker) & (Signal.date == latest.c.max_date))
+    else:
+        query = query.filter(Signal.date == on_date)
+
+    if bullish_fvg is not None:
+        query = query.filter(Signal.bullish_fvg == bullish_fvg)
+    if bullish_ob is not None:
+        query = query.filter(Signal.bullish_ob == bullish_ob)
+    if trend is not None:
+        query = query.filter(Signal.trend == trend)
+    if min_history is not None:
+        query = query.filter(Signal.history_bars >= min_history)
+
+    return pd.read_sql(query.statement, db.bind)
+
+def scan_trend_ob(db: Session, lookback=3):
+    """
+    Trend + OB scan: latest Close > EMA200 and a bullish OB within the last `lookback` sessions.
+    Returns one row per ticker (most recent OB).
+    """
+    sessions = [d for (d,) in db.query(Signal.date).distinct().order_by(Signal.date.desc()).limit(lookback).all()]
+    if not sessions:
+        return pd.DataFrame()
+
+    uptrend = query_signals(db, on_date=sessions[0], trend='UP')
+    obs = pd.read_sql(db.query(Signal.ticker, Signal.date).filter(
+        Signal.date.in_(sessions), Signal.bullish_ob == True
+    ).statement, db.bind)
+
+    if uptrend.empty or obs.empty:
+        return pd.DataFrame()
+
+    obs = obs.sort_values('date').drop_duplicates(subset=['ticker'], keep='last').rename(columns={'date': 'ob_date'})
+    return uptrend.merge(obs, on='ticker', how='inner')
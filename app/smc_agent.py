@@ -1,12 +1,13 @@
 import pandas as pd
 import numpy as np
+from app import instrument
 
 def identify_swings(df, swing_length=5):
     """
     Identify Swing Highs and Swing Lows.
     Returns df with 'swing_high' and 'swing_low' columns (boolean).
     """
-    df = df.copy()
+    df = df.copy(deep=False)
     df['swing_high'] = False
     df['swing_low'] = False
     
@@ -96,6 +97,7 @@ def identify_ob(df, swings):
                 
     return df
 
+@instrument.timed("analyze_ticker")
 def analyze_ticker(ticker, df):
     """
     Main entry point for SMC analysis.
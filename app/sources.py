@@ -0,0 +1,342 @@
+"""
+Market data sources.
+
+Every NSE / yfinance call goes through a source object, so the fetch, intraday and EOD
+paths can run against local data:
+
+    equity_history(ticker, from_date, to_date)  nselib price_volume_and_deliverable_position_data frame
+    quote(ticker)                               nsepython nse_eq payload (priceInfo / metadata)
+    index_history(symbol, period)               yfinance download frame (Open/High/Low/Close/Volume)
+    fno_equity_list()                           nselib fno_equity_list frame (symbol column)
+
+Backends:
+- LiveSource: the real APIs.
+- ReplaySource: recorded responses (see RecordingSource) or deterministic synthetic
+  data, with configurable latency, error rate and throttling.
+- RecordingSource: wraps another source and saves every response for replay.
+
+get_source() picks the backend from the environment:
+    MARKET_SOURCE=live | replay | record   (default live)
+    MARKET_REPLAY_DIR                      recordings directory (default data/replay)
+    REPLAY_LATENCY, REPLAY_ERROR_RATE, REPLAY_RATE, REPLAY_SEED
+"""
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from app import instrument
+
+MARKET_SOURCE = os.getenv("MARKET_SOURCE", "live").lower()
+REPLAY_DIR = os.getenv("MARKET_REPLAY_DIR", "data/replay")
+
+class SourceError(Exception):
+    """A source call failed (network error, bad response, injected replay error)."""
+
+class SourceThrottled(SourceError):
+    """The source rejected the call for exceeding its rate limit (NSE answers 429 / 403)."""
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%d-%m-%Y").date()
+
+def _period_days(period):
+    """yfinance period string ('6mo', '2y', '30d') -> calendar days."""
+    units = {'d': 1, 'wk': 7, 'mo': 31, 'y': 366}
+    for suffix, days in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return int(period[:-len(suffix)]) * days
+    return 366 * 10 # 'max'
+
+class MarketSource(ABC):
+    """Every market data call the app makes; a source missing one fails at instantiation."""
+    name = "source"
+
+    @abstractmethod
+    def equity_history(self, ticker, from_date, to_date):
+        ...
+
+    @abstractmethod
+    def quote(self, ticker):
+        ...
+
+    @abstractmethod
+    def index_history(self, symbol, period="6mo"):
+        ...
+
+    @abstractmethod
+    def fno_equity_list(self):
+        ...
+
+class LiveSource(MarketSource):
+    """nselib / nsepython / yfinance. Imports are lazy so unused libraries are never loaded."""
+    name = "live"
+
+    def equity_history(self, ticker, from_date, to_date):
+        from nselib import capital_market
+        instrument.network_call("nselib")
+        with instrument.stage("nse_history"):
+            return capital_market.price_volume_and_deliverable_position_data(
+                symbol=ticker,
+                from_date=_as_date(from_date).strftime("%d-%m-%Y"),
+                to_date=_as_date(to_date).strftime("%d-%m-%Y"),
+            )
+
+    def quote(self, ticker):
+        from nsepython import nse_eq
+        instrument.network_call("nse_quote")
+        return nse_eq(ticker)
+
+    def index_history(self, symbol, period="6mo"):
+        import yfinance as yf
+        instrument.network_call("yfinance")
+        with instrument.stage("yfinance_index"):
+            return yf.download(symbol, period=period, progress=False)
+
+    def fno_equity_list(self):
+        from nselib import capital_market
+        instrument.network_call("nselib")
+        return capital_market.fno_equity_list()
+
+class ReplaySource(MarketSource):
+    """
+    Local backend for load tests and benchmarks.
+
+    Serves responses recorded by RecordingSource from `directory` when present, otherwise
+    deterministic synthetic data (same ticker and dates -> same bars, across runs).
+
+    - latency: seconds per call (plus up to `jitter` extra)
+    - error_rate: fraction of calls failing with SourceError
+    - rate / burst: token bucket; calls beyond it fail with SourceThrottled, like NSE
+    """
+    name = "replay"
+
+    def __init__(self, directory=None, latency=0.0, jitter=0.0, error_rate=0.0, rate=None, burst=None,
+                 seed=42, tickers=None):
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate = rate
+        self.burst = burst if burst is not None else (rate or 0)
+        self.seed = seed
+        self.tickers = tickers or [f"SYN{i:03d}" for i in range(50)]
+
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._history_cache = {}
+
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+
+    def stats(self):
+        return {'calls': self.calls, 'errors': self.errors, 'throttled': self.throttled}
+
+    def _call(self, method):
+        """Applies throttling, latency and error injection for one call."""
+        with self._lock:
+            self.calls += 1
+            if self.rate:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens < 1:
+                    self.throttled += 1
+                    raise SourceThrottled(f"{method}: rate limit exceeded")
+                self._tokens -= 1
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0)
+        instrument.network_call(f"replay.{method}")
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            raise SourceError(f"{method}: injected error")
+
+    def _recorded(self, *parts):
+        if not self.directory:
+            return None
+        path = os.path.join(self.directory, *parts)
+        if not os.path.exists(path):
+            return None
+        if path.endswith(".json"):
+            with open(path) as f:
+                return json.load(f)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _synthetic_bars(self, ticker, end):
+        """Deterministic daily bars for `ticker` from 2015 up to `end` (business days)."""
+        import numpy as np
+        import pandas as pd
+
+        cached = self._history_cache.get(ticker)
+        if cached is not None and cached.index[-1] >= pd.Timestamp(end):
+            return cached
+
+        dates = pd.bdate_range("2015-01-01", max(pd.Timestamp(end), pd.Timestamp("2015-02-01")))
+        digest = hashlib.sha256(f"{self.seed}-{ticker}".encode()).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+        returns = rng.normal(0.0004, 0.018, len(dates))
+        close = rng.uniform(50, 3000) * np.exp(np.cumsum(returns))
+        open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.004, len(dates)))
+        bars = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, len(dates)))),
+            'Low': np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, len(dates)))),
+            'Close': close,
+            'Volume': rng.lognormal(12, 1, len(dates)).astype(int),
+        }, index=dates).round(2)
+        self._history_cache[ticker] = bars
+        return bars
+
+    def equity_history(self, ticker, from_date, to_date):
+        import pandas as pd
+        self._call("equity_history")
+        from_date, to_date = _as_date(from_date), _as_date(to_date)
+
+        recorded = self._recorded("equity", f"{ticker}.pkl")
+        if recorded is not None:
+            dates = pd.to_datetime(recorded['Date'], format='%d-%b-%Y').dt.date
+            return recorded[(dates >= from_date) & (dates <= to_date)].reset_index(drop=True)
+
+        bars = self._synthetic_bars(ticker, to_date)
+        bars = bars[(bars.index.date >= from_date) & (bars.index.date <= to_date)]
+        return pd.DataFrame({
+            'Symbol': ticker,
+            'Series': 'EQ',
+            'Date': bars.index.strftime('%d-%b-%Y'),
+            'PrevClose': bars['Close'].shift(1).values,
+            'OpenPrice': bars['Open'].values,
+            'HighPrice': bars['High'].values,
+            'LowPrice': bars['Low'].values,
+            'ClosePrice': bars['Close'].values,
+            'TotalTradedQuantity': bars['Volume'].values,
+        })
+
+    def quote(self, ticker):
+        self._call("quote")
+        recorded = self._recorded("quote", f"{ticker}.json")
+        if recorded is not None:
+            return recorded
+
+        bars = self._synthetic_bars(ticker, date.today())
+        last = bars.iloc[-1]
+        rnd = random.Random(f"{self.seed}-{ticker}")
+        return {
+            'info': {'symbol': ticker},
+            'metadata': {
+                'pdSymbolPe': f"{rnd.uniform(5, 80):.2f}",
+                'industry': rnd.choice(['Banks', 'IT - Software', 'Pharmaceuticals', 'Auto Components']),
+            },
+            'priceInfo': {
+                'lastPrice': float(last['Close']),
+                'intraDayHighLow': {'min': float(last['Low']), 'max': float(last['High'])},
+            },
+        }
+
+    def index_history(self, symbol, period="6mo"):
+        import pandas as pd
+        self._call("index_history")
+        recorded = self._recorded("index", f"{symbol}.pkl")
+        if recorded is not None:
+            return recorded
+
+        end = pd.Timestamp(date.today())
+        bars = self._synthetic_bars(symbol, end)
+        return bars[bars.index >= end - pd.Timedelta(days=_period_days(period))]
+
+    def fno_equity_list(self):
+        import pandas as pd
+        self._call("fno_equity_list")
+        recorded = self._recorded("fno_equity_list.pkl")
+        if recorded is not None:
+            return recorded
+        return pd.DataFrame({'symbol': self.tickers})
+
+class RecordingSource(MarketSource):
+    """Passes calls to `inner` and saves the responses under `directory` for ReplaySource."""
+    name = "record"
+
+    def __init__(self, inner=None, directory=REPLAY_DIR):
+        self.inner = inner or LiveSource()
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _save(self, value, *parts):
+        path = os.path.join(self.directory, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            if path.endswith(".json"):
+                with open(path, "w") as f:
+                    json.dump(value, f, default=str)
+            else:
+                with open(path, "wb") as f:
+                    pickle.dump(value, f)
+
+    def equity_history(self, ticker, from_date, to_date):
+        import pandas as pd
+        data = self.inner.equity_history(ticker, from_date, to_date)
+        if data is None or data.empty:
+            return data
+        # One file per ticker, merged with earlier recordings so replays can serve any range
+        path = os.path.join(self.directory, "equity", f"{ticker}.pkl")
+        merged = data
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                merged = pd.concat([pickle.load(f), data]).drop_duplicates(subset=['Date', 'Series'], keep='last')
+        self._save(merged, "equity", f"{ticker}.pkl")
+        return data
+
+    def quote(self, ticker):
+        data = self.inner.quote(ticker)
+        self._save(data, "quote", f"{ticker}.json")
+        return data
+
+    def index_history(self, symbol, period="6mo"):
+        data = self.inner.index_history(symbol, period)
+        self._save(data, "index", f"{symbol}.pkl")
+        return data
+
+    def fno_equity_list(self):
+        data = self.inner.fno_equity_list()
+        self._save(data, "fno_equity_list.pkl")
+        return data
+
+_source = None
+
+def get_source():
+    """Process-wide source selected by MARKET_SOURCE (see module docstring)."""
+    global _source
+    if _source is None:
+        if MARKET_SOURCE == "replay":
+            rate = os.getenv("REPLAY_RATE")
+            _source = ReplaySource(
+                directory=REPLAY_DIR,
+                latency=float(os.getenv("REPLAY_LATENCY", "0")),
+                error_rate=float(os.getenv("REPLAY_ERROR_RATE", "0")),
+                rate=float(rate) if rate else None,
+                seed=int(os.getenv("REPLAY_SEED", "42")),
+            )
+        elif MARKET_SOURCE == "record":
+            _source = RecordingSource(LiveSource(), REPLAY_DIR)
+        else:
+            _source = LiveSource()
+    return _source
+
+def set_source(source):
+    """Overrides the process-wide source (benchmarks, tests). Returns the previous one."""
+    global _source
+    previous, _source = _source, source
+    return previous
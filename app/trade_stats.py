@@ -0,0 +1,196 @@
+"""
+Closed-trade analytics over the trades table.
+
+Closed trades are loaded once into a frame (with sector) and every metric is a vectorized
+groupby over it: cumulative PnL and its drawdown, R-multiples (PnL / planned risk, i.e.
+entry - stop), win rate, expectancy and profit factor, overall and per ticker, sector,
+exit month and exit reason. Results are materialized in trade_stats.
+
+refresh_trade_stats is incremental: only the groups whose trade count or total PnL no
+longer matches the stored row (trades closed, removed or amended since the last refresh)
+are recomputed and rewritten.
+It runs when the intraday cycle closes trades and in the EOD run; the EOD report and the
+dashboard read trade_stats.
+
+Run: python -m app.trade_stats [--full] [--by all|ticker|sector|month|exit_reason]
+"""
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.database import Trade, Stock, TradeStat
+from app import instrument
+
+DIMENSIONS = ['all', 'ticker', 'sector', 'month', 'exit_reason']
+ALL_KEY = '__ALL__'
+
+# outcome -> exit reason (intraday closes at the stop or at the target)
+EXIT_REASONS = {'WIN': 'TARGET', 'LOSS': 'STOP'}
+
+STAT_COLUMNS = ['trades', 'wins', 'losses', 'win_rate', 'total_pnl', 'avg_return_pct', 'avg_r',
+                'avg_win_r', 'avg_loss_r', 'profit_factor', 'max_drawdown', 'first_exit', 'last_exit']
+
+def load_trades(db: Session, status=None, signal_date=None):
+    """trades rows (optionally one status / signal date) with the stock's sector."""
+    query = db.query(Trade, Stock.sector).outerjoin(Stock, Stock.ticker == Trade.ticker)
+    if status is not None:
+        query = query.filter(Trade.status == status)
+    if signal_date is not None:
+        query = query.filter(Trade.signal_date == signal_date)
+    df = pd.read_sql(query.statement, db.bind)
+    instrument.count("rows_read", len(df))
+    return df
+
+def add_metrics(trades):
+    """
+    Adds the per-trade columns the stats are built from, sorted by exit:
+    return_pct, r_multiple (NaN without a valid stop), win / loss, month, exit_reason,
+    cum_pnl and drawdown (from the running peak of cum_pnl, starting at 0).
+    """
+    df = trades.dropna(subset=['pnl', 'exit_date']).copy()
+    df['exit_date'] = pd.to_datetime(df['exit_date'])
+    df = df.sort_values(['exit_date', 'id'], kind='stable').reset_index(drop=True)
+
+    risk = (df['entry_price'] - df['sl_price']).to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['r_multiple'] = np.where(risk > 0, df['pnl'].to_numpy(dtype=float) / risk, np.nan)
+    df['return_pct'] = df['pnl'] / df['entry_price'] * 100
+    df['win'] = df['outcome'] == 'WIN'
+    df['loss'] = df['outcome'] == 'LOSS'
+    df['month'] = df['exit_date'].dt.strftime('%Y-%m')
+    df['exit_reason'] = df['outcome'].map(EXIT_REASONS).fillna(df['outcome'].fillna('OTHER'))
+    df['sector'] = df['sector'].fillna('Unknown')
+    df['cum_pnl'] = df['pnl'].cumsum()
+    df['drawdown'] = df['cum_pnl'] - df['cum_pnl'].cummax().clip(lower=0)
+    return df
+
+def load_closed_trades(db: Session):
+    return add_metrics(load_trades(db, status="CLOSED"))
+
+def equity_curve(trades):
+    """Cumulative PnL and drawdown per exit date (last trade of each day)."""
+    return trades.groupby('exit_date')[['cum_pnl', 'drawdown']].last()
+
+def summarize(trades, dimension):
+    """One row of stats per value of `dimension` (a trades column, or 'all'), indexed by key."""
+    if trades.empty:
+        return pd.DataFrame(columns=STAT_COLUMNS)
+    key = pd.Series(ALL_KEY, index=trades.index) if dimension == 'all' else trades[dimension].astype(str)
+    df = trades.assign(
+        key=key,
+        win_r=trades['r_multiple'].where(trades['win']),
+        loss_r=trades['r_multiple'].where(trades['loss']),
+        gross_profit=trades['pnl'].clip(lower=0),
+        gross_loss=-trades['pnl'].clip(upper=0),
+    )
+    # Group-local equity curve (trades are in exit order)
+    cum = df.groupby('key', sort=False)['pnl'].cumsum()
+    df['group_drawdown'] = cum - cum.groupby(df['key']).cummax().clip(lower=0)
+
+    stats = df.groupby('key').agg(
+        trades=('pnl', 'size'),
+        wins=('win', 'sum'),
+        losses=('loss', 'sum'),
+        total_pnl=('pnl', 'sum'),
+        avg_return_pct=('return_pct', 'mean'),
+        avg_r=('r_multiple', 'mean'),
+        avg_win_r=('win_r', 'mean'),
+        avg_loss_r=('loss_r', 'mean'),
+        gross_profit=('gross_profit', 'sum'),
+        gross_loss=('gross_loss', 'sum'),
+        max_drawdown=('group_drawdown', 'min'),
+        first_exit=('exit_date', 'min'),
+        last_exit=('exit_date', 'max'),
+    )
+    stats['win_rate'] = stats['wins'] / stats['trades'] * 100
+    stats['profit_factor'] = (stats['gross_profit'] / stats['gross_loss']).where(stats['gross_loss'] > 0)
+    return stats[STAT_COLUMNS]
+
+def _records(stats, dimension, now):
+    if stats.empty:
+        return []
+    df = stats.reset_index(names='key').assign(dimension=dimension, updated_at=now)
+    for col in ('first_exit', 'last_exit'):
+        df[col] = df[col].dt.date
+    for col in ('trades', 'wins', 'losses'):
+        df[col] = df[col].astype(int)
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def changed_keys(trades, stored, dimension):
+    """Keys of `dimension` whose trade count or total PnL differs from the stored rows."""
+    key = pd.Series(ALL_KEY, index=trades.index) if dimension == 'all' else trades[dimension].astype(str)
+    current = trades['pnl'].groupby(key).agg(['size', 'sum'])
+    old = stored[stored['dimension'] == dimension].set_index('key')[['trades', 'total_pnl']]
+    both = current.join(old, how='outer')
+    same = (both['size'] == both['trades']) & np.isclose(both['sum'], both['total_pnl'])
+    return both.index[~same].tolist()
+
+@instrument.timed("refresh_trade_stats")
+def refresh_trade_stats(db: Session, full=False):
+    """
+    Brings trade_stats up to date with the closed trades. Only groups whose trade count or
+    total PnL changed since the last refresh are rewritten (a trade closed with any exit
+    date, removed or amended); a full rebuild happens on the first run or with full=True.
+    Returns the number of rows written.
+    """
+    trades = load_closed_trades(db)
+    stored = pd.read_sql(db.query(TradeStat.dimension, TradeStat.key, TradeStat.trades,
+                                  TradeStat.total_pnl).statement, db.bind)
+    full = full or stored.empty
+
+    changed = {}
+    if not full:
+        changed = {d: changed_keys(trades, stored, d) for d in DIMENSIONS}
+        if not any(changed.values()):
+            return 0
+
+    now = datetime.utcnow()
+    records = []
+    try:
+        if full:
+            db.query(TradeStat).delete(synchronize_session=False)
+            for dimension in DIMENSIONS:
+                records += _records(summarize(trades, dimension), dimension, now)
+        else:
+            for dimension, keys in changed.items():
+                if not keys:
+                    continue
+                subset = trades if dimension == 'all' else trades[trades[dimension].astype(str).isin(keys)]
+                db.query(TradeStat).filter(TradeStat.dimension == dimension,
+                                           TradeStat.key.in_(keys)).delete(synchronize_session=False)
+                records += _records(summarize(subset, dimension), dimension, now)
+        if records:
+            db.execute(TradeStat.__table__.insert(), records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    instrument.count("rows_written", len(records))
+    print(f"Trade stats: {len(trades)} closed trades, {len(records)} rows {'rebuilt' if full else 'refreshed'}.")
+    return len(records)
+
+def get_trade_stats(db: Session, dimension='all'):
+    """Stored stats of one dimension, best total PnL first."""
+    query = db.query(TradeStat).filter(TradeStat.dimension == dimension).order_by(TradeStat.total_pnl.desc())
+    return pd.read_sql(query.statement, db.bind)
+
+def main():
+    from app.database import get_db, init_db
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true", help="Rebuild every group")
+    parser.add_argument("--by", choices=DIMENSIONS, default="all")
+    args = parser.parse_args()
+
+    init_db()
+    db = next(get_db())
+    try:
+        refresh_trade_stats(db, full=args.full)
+        stats = get_trade_stats(db, args.by)
+        print("No closed trades." if stats.empty else stats.drop(columns=['dimension', 'updated_at']).to_string(index=False))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+NSE trading sessions.
+
+Uses pandas_market_calendars (XNSE) when installed. Without it sessions are weekdays,
+and callers can drop weekday holidays with observed_holidays (weekdays on which no
+ticker in the DB has a bar).
+"""
+from datetime import date
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+CALENDAR_NAME = "XNSE"
+
+@lru_cache(maxsize=1)
+def _exchange_calendar():
+    try:
+        import pandas_market_calendars as mcal
+    except ImportError:
+        return None
+    try:
+        return mcal.get_calendar(CALENDAR_NAME)
+    except Exception as e:
+        print(f"NSE calendar unavailable ({e}), falling back to weekdays.")
+        return None
+
+def has_exchange_calendar():
+    return _exchange_calendar() is not None
+
+@lru_cache(maxsize=32)
+def _sessions(start, end):
+    cal = _exchange_calendar()
+    if cal is not None:
+        days = cal.valid_days(start_date=start, end_date=end)
+        return np.array(days.tz_localize(None).values, dtype='datetime64[D]')
+    return np.array(pd.bdate_range(start, end).values, dtype='datetime64[D]')
+
+def sessions(start, end=None):
+    """Trading sessions between start and end (inclusive) as a sorted datetime64[D] array."""
+    end = end or date.today()
+    return _sessions(pd.Timestamp(start).date(), pd.Timestamp(end).date())
+
+def last_session(on_or_before=None):
+    """Latest session on or before the given date (default today)."""
+    end = pd.Timestamp(on_or_before or date.today()).date()
+    days = sessions(end - pd.Timedelta(days=14), end)
+    return pd.Timestamp(days[-1]).date() if len(days) else None
+
+def observed_holidays(session_days, stored_days, before):
+    """
+    Sessions before `before` on which nothing is stored for any ticker: with the weekday
+    fallback these are exchange holidays, not gaps.
+    """
+    stored = np.unique(np.asarray(stored_days, dtype='datetime64[D]'))
+    session_days = np.asarray(session_days, dtype='datetime64[D]')
+    return session_days[(session_days < np.datetime64(before, 'D')) & ~np.isin(session_days, stored)]
@@ -1,5 +1,5 @@
 from app.database import get_db, Trade, DailyPrice
-from nselib import capital_market
+from app.sources import get_source
 from datetime import date, timedelta
 import pandas as pd
 import time
@@ -26,12 +26,9 @@ def audit_trades():
             print("  Signal is from today. No history to check.")
             continue
             
-        from_str = start_dt.strftime("%d-%m-%Y")
-        to_str = end_dt.strftime("%d-%m-%Y")
-        
         try:
             # Fetch NSE Data
-            data = capital_market.price_volume_and_deliverable_position_data(symbol=t.ticker, from_date=from_str, to_date=to_str)
+            data = get_source().equity_history(t.ticker, start_dt, end_dt)
             if data is None or data.empty:
                 print("  No data found from NSE.")
                 continue
@@ -1,30 +1,18 @@
 from backtesting import Backtest
 from app.backtest_strategies import TrendSMCStrategy, PureFVGStrategy
-from app.database import get_db, DailyPrice
+from app.database import get_db
+from app.panel import OHLCVPanel
 import pandas as pd
+from app import instrument, signal_cache
 
 STOCKS = ['WIPRO', 'MOTHERSON', 'DABUR', 'BEL', 'ICICIBANK', 'GLENMARK', 'ADANIENT']
 
-def load_data(ticker):
-    db_gen = get_db()
-    db = next(db_gen)
-    try:
-        query = db.query(DailyPrice).filter(DailyPrice.ticker == ticker).order_by(DailyPrice.date.asc())
-        df = pd.read_sql(query.statement, db.bind)
-        if df.empty: return None
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-        df = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume', 'ema_200': 'EMA_200'})
-        return df
-    finally:
-        db.close()
-
 def run_batch():
     db_gen = get_db()
     db = next(db_gen)
-    stocks = db.query(DailyPrice.ticker).distinct().all()
-    tickers = [s[0] for s in stocks]
-    print(f"Found {len(tickers)} tickers in DB.")
+    # Whole universe in one compact load; frames below are views into it
+    panel = OHLCVPanel.from_db(db)
+    print(f"Found {len(panel)} tickers in DB ({panel.nbytes / 1e6:.0f} MB panel).")
     db.close()
     
     results = []
@@ -32,14 +20,12 @@ def run_batch():
     print(f"{'Ticker':<12} | {'Strategy':<15} | {'Return%':<10} | {'WinRate%':<10} | {'Trades':<8}")
     print("-" * 70)
     
-    for ticker in tickers:
-        df = load_data(ticker)
-        if df is None: continue
-        
+    for ticker, df in panel.iter_frames():
         # Test PureFVG (Our Primary Strategy)
         try:
             bt_fvg = Backtest(df, PureFVGStrategy, cash=100000, commission=.002)
-            stats_fvg = bt_fvg.run()
+            with instrument.stage("backtest"):
+                stats_fvg = bt_fvg.run()
             results.append({
                 'Ticker': ticker, 'Strategy': 'PureFVG', 
                 'Return': stats_fvg['Return [%]'], 
@@ -49,6 +35,7 @@ def run_batch():
             print(f"{ticker:<12} | {'PureFVG':<15} | {stats_fvg['Return [%]']:<10.2f} | {stats_fvg['Win Rate [%]']:<10.2f} | {stats_fvg['# Trades']:<8}")
         except Exception as e:
             print(f"Error {ticker}: {e}")
+    print(signal_cache.describe())
 
     # Summary
     if results:
@@ -64,4 +51,5 @@ def run_batch():
         print(df_res.sort_values('Return', ascending=False).head(10)[['Ticker', 'Return', 'WinRate']])
 
 if __name__ == "__main__":
-    run_batch()
+    with instrument.run("batch_backtest"):
+        run_batch()
@@ -0,0 +1,79 @@
+"""
+Benchmark for app.fundamentals.refresh_fundamentals against a stubbed nse_eq source.
+No network access needed. Run: python -m benchmarks.bench_fundamentals
+"""
+import argparse
+import random
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, Stock
+from app.fundamentals import refresh_fundamentals
+
+class StubSource:
+    """Mimics nse_eq: fixed latency per call, deterministic payloads, counts calls."""
+    def __init__(self, latency=0.2, seed=42):
+        self.latency = latency
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        rnd = random.Random(f"{self.seed}-{ticker}")
+        return {
+            'info': {'symbol': ticker},
+            'metadata': {
+                'pdSymbolPe': f"{rnd.uniform(5, 80):.2f}",
+                'industry': rnd.choice(['Banks', 'IT - Software', 'Pharmaceuticals', 'Auto Components']),
+            },
+        }
+
+def make_session(n_tickers):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    db.add_all([Stock(ticker=t, company_name=t) for t in tickers])
+    db.commit()
+    return db, tickers
+
+def run_case(name, n_tickers, latency, workers, rate, warm=False):
+    db, tickers = make_session(n_tickers)
+    source = StubSource(latency=latency)
+    if warm:
+        refresh_fundamentals(db, tickers, workers=workers, rate=rate, source=source)
+        source.calls = 0
+
+    start = time.perf_counter()
+    summary = refresh_fundamentals(db, tickers, workers=workers, rate=rate, source=source)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return {'case': name, 'seconds': round(elapsed, 3), 'calls': source.calls, **summary}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency per call (s)")
+    parser.add_argument("--rate", type=float, default=20.0, help="Shared rate limit (req/s), 0 = unlimited")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    results = [
+        run_case("serial (1 worker)", args.tickers, args.latency, 1, args.rate),
+        run_case(f"concurrent ({args.workers} workers)", args.tickers, args.latency, args.workers, args.rate),
+        run_case("warm cache (all fresh)", args.tickers, args.latency, args.workers, args.rate, warm=True),
+    ]
+
+    print("\n=== Fundamentals Refresh Benchmark ===")
+    print(f"{args.tickers} tickers, {args.latency * 1000:.0f} ms stub latency, rate limit {args.rate}/s")
+    print(f"{'Case':<28} | {'Seconds':<8} | {'Calls':<6} | {'Changed':<7} | {'Skipped':<7}")
+    print("-" * 68)
+    for r in results:
+        print(f"{r['case']:<28} | {r['seconds']:<8} | {r['calls']:<6} | {r['changed']:<7} | {r['skipped']:<7}")
+
+if __name__ == "__main__":
+    main()
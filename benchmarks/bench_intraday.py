@@ -0,0 +1,83 @@
+"""
+Intraday bar recording benchmark (app/intraday.py) on a simulated session.
+
+Quotes for N tickers are polled every `--poll` seconds from 09:15 to 15:30 IST. Each poll
+cycle uses a fresh IntradayRecorder and flushes at the end, like the cron-driven
+intraday monitor (--loop: one recorder for the whole session, flushed every cycle).
+Reports fold / flush / query timings and storage per day, before and after compaction.
+
+Run: python -m benchmarks.bench_intraday [--tickers 200] [--poll 180] [--loop]
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from app.intraday import IST, IntradayRecorder, IntradayStore
+
+def session_quotes(n_tickers, poll, seed=42):
+    """(timestamps, price, day_high, day_low) arrays of shape (polls, tickers)."""
+    day = datetime(2024, 1, 15, 9, 15, tzinfo=IST)
+    start = int(day.timestamp())
+    stamps = np.arange(start, start + 375 * 60, poll)
+    rng = np.random.default_rng(seed)
+    # Random walk sampled every second, observed at the poll times
+    seconds = len(stamps) * poll
+    paths = rng.uniform(50, 3000, n_tickers) * np.exp(np.cumsum(rng.normal(0, 0.0002, (seconds, n_tickers)), axis=0))
+    idx = np.arange(len(stamps)) * poll
+    price = paths[idx]
+    day_high = np.maximum.accumulate(paths, axis=0)[idx]
+    day_low = np.minimum.accumulate(paths, axis=0)[idx]
+    return stamps, price.round(2), day_high.round(2), day_low.round(2)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--poll", type=int, default=180, help="Seconds between polls")
+    parser.add_argument("--loop", action="store_true", help="Keep one recorder across cycles")
+    args = parser.parse_args()
+
+    tickers = [f"SYN{i:04d}" for i in range(args.tickers)]
+    stamps, price, day_high, day_low = session_quotes(args.tickers, args.poll)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = IntradayStore(root)
+        fold = flush = 0.0
+        recorder = None
+        for i, ts in enumerate(stamps):
+            if recorder is None or not args.loop:
+                recorder = IntradayRecorder(IntradayStore(root))
+            start = time.perf_counter()
+            for j, t in enumerate(tickers):
+                recorder.add_quote(t, price[i, j], day_high[i, j], day_low[i, j], ts=int(ts))
+            fold += time.perf_counter() - start
+            start = time.perf_counter()
+            recorder.flush()
+            flush += time.perf_counter() - start
+
+        day = recorder._day
+        quotes = len(stamps) * args.tickers
+        start = time.perf_counter()
+        for t in tickers[:20]:
+            store.read(t, day, '1m')
+        query_ms = (time.perf_counter() - start) / 20 * 1000
+
+        before = store.storage_report(day, scale_to=200)
+        store.compact(day)
+        store._ids.clear()
+        after = store.storage_report(day, scale_to=200)
+        start = time.perf_counter()
+        bars = store.read(tickers[0], day, '5m')
+        compact_query_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{args.tickers} tickers, {len(stamps)} polls ({args.poll}s), {quotes} quotes")
+    print(f"fold        {fold / quotes * 1e6:.1f} us / quote (incl. recorder setup)")
+    print(f"flush       {flush / len(stamps) * 1000:.2f} ms / cycle")
+    print(f"query       {query_ms:.2f} ms / (ticker, day) over {before['timeframes']['1m']['segments']} segments, "
+          f"{compact_query_ms:.2f} ms compacted ({len(bars)} 5m bars)")
+    for label, report in (("segments", before), ("compacted", after)):
+        per_tf = ", ".join(f"{tf} {r['bars']} bars / {r['bytes'] / 1024:.0f} KiB" for tf, r in report['timeframes'].items())
+        print(f"storage     {label:<10} {report['bytes_per_200_tickers'] / 1024:.0f} KiB per day for 200 tickers ({per_tf})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Memory of a full-universe price load: pd.read_sql frame vs app.panel.OHLCVPanel.
+
+Each representation is built in a fresh interpreter and measured as the growth of its
+resident set (RSS, after handing freed temporaries back to the OS) and of the peak RSS. The read_sql baseline and the
+panel are first loaded from the same temp SQLite DB (--db-tickers x --bars); the panel
+is then built at full size (--tickers x --bars) from benchmarks.synthetic.make_panel.
+A 5,000 x 5,000 read_sql frame does not fit in a small box, so its size is
+extrapolated from the per-bar cost measured on the DB subset.
+
+Run: python -m benchmarks.bench_panel [--tickers 5000] [--bars 5000] [--db-tickers 400]
+"""
+import argparse
+import ctypes
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE = os.sysconf("SC_PAGE_SIZE")
+MIB = 1024 * 1024
+
+def trim():
+    """Hands freed heap back to the OS so RSS counts only live objects (glibc only)."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE
+
+def peak():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def child(kind, args):
+    """Builds one representation and prints {'rss', 'peak', 'bars', 'seconds', ...} as JSON."""
+    import numpy as np
+    import pandas as pd
+    from app.panel import OHLCVPanel
+    out = {}
+
+    if kind == "synthetic":
+        from benchmarks.synthetic import make_panel
+        source = make_panel(args.tickers, args.bars)
+        cols = {k: source[k] for k in ('open', 'high', 'low', 'close', 'volume')}
+        trim()
+        before, peak_before = rss(), peak()
+        start = time.perf_counter()
+        built = OHLCVPanel.from_arrays(source['tickers'], source['dates'], **cols)
+        out['seconds'] = time.perf_counter() - start
+    else:
+        from sqlalchemy.orm import sessionmaker
+        from app.database import DailyPrice, create_db_engine
+        # SQLite defaults: the production page cache / mmap would show up in RSS for both
+        db = sessionmaker(bind=create_db_engine(args.db, pragmas={}))()
+        # Warm up imports, statement compilation and the SQLite page cache on a few rows
+        (first,), = db.query(DailyPrice.ticker).limit(1).all()
+        if kind == "read_sql":
+            pd.read_sql(db.query(DailyPrice).filter(DailyPrice.ticker == first).statement, db.bind)
+        else:
+            OHLCVPanel.from_db(db, tickers=[first], adjusted=False)
+        trim()
+        before, peak_before = rss(), peak()
+        start = time.perf_counter()
+        if kind == "read_sql":
+            built = pd.read_sql(db.query(DailyPrice).statement, db.bind)
+        else:
+            built = OHLCVPanel.from_db(db, adjusted=False)
+        out['seconds'] = time.perf_counter() - start
+
+    # Peak growth is only known if the build pushed past the earlier high-water mark
+    out['peak'] = peak() - before if peak() > peak_before else None
+    trim()
+    out['rss'] = rss() - before
+    if kind == "read_sql":
+        out['bars'] = len(built)
+    else:
+        out['bars'] = built.n_bars
+        out['nbytes'] = built.nbytes
+        # Per-ticker frames are views: time handing every ticker to a consumer
+        start = time.perf_counter()
+        shared = all(np.shares_memory(df['Close'].to_numpy(), built.columns['close'])
+                     for _, df in built.iter_frames())
+        out['frames_seconds'] = time.perf_counter() - start
+        out['zero_copy'] = shared
+    print(json.dumps(out))
+
+def measure(kind, **params):
+    argv = [sys.executable, "-m", "benchmarks.bench_panel", "--child", kind]
+    for key, value in params.items():
+        argv += [f"--{key.replace('_', '-')}", str(value)]
+    proc = subprocess.run(argv, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def report(name, shape, m):
+    per_bar = m['rss'] / m['bars'] if m['bars'] else 0
+    peak_mib = f"{m['peak'] / MIB:.1f}" if m['peak'] is not None else "-"
+    print(f"{name:<24} {shape:>13} {m['rss'] / MIB:>9.1f} {peak_mib:>9} {per_bar:>9.1f} {m['seconds']:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--db-tickers", type=int, default=400, help="Tickers in the SQLite comparison")
+    parser.add_argument("--child", choices=["synthetic", "read_sql", "from_db"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args)
+        return
+
+    from benchmarks.synthetic import make_panel, write_sqlite
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.db")
+        print(f"Writing {args.db_tickers} x {args.bars} bars to SQLite...")
+        engine, _ = write_sqlite(path, make_panel(args.db_tickers, args.bars))
+        engine.dispose()
+        sql_frame = measure("read_sql", db=path)
+        sql_panel = measure("from_db", db=path)
+    full = measure("synthetic", tickers=args.tickers, bars=args.bars)
+
+    small, big = f"{args.db_tickers}x{args.bars}", f"{args.tickers}x{args.bars}"
+    print(f"\n{'representation':<24} {'shape':>13} {'RSS MiB':>9} {'peak MiB':>9} {'B/bar':>9} {'load s':>8}")
+    report("read_sql frame", small, sql_frame)
+    report("OHLCVPanel.from_db", small, sql_panel)
+    report("OHLCVPanel (synthetic)", big, full)
+
+    frame_per_bar = sql_frame['rss'] / sql_frame['bars']
+    panel_per_bar = full['rss'] / full['bars']
+    print(f"\nread_sql frame at {big}: ~{frame_per_bar * full['bars'] / MIB:.0f} MiB (extrapolated)")
+    print(f"OHLCVPanel at {big}:     {full['rss'] / MIB:.0f} MiB ({full['nbytes'] / MIB:.0f} MiB of arrays)")
+    print(f"reduction                {frame_per_bar / panel_per_bar:.1f}x "
+          f"(same DB: {sql_frame['rss'] / max(sql_panel['rss'], 1):.1f}x)")
+    print(f"per-ticker frames        {full['frames_seconds'] * 1e6 / args.tickers:.0f} us each, "
+          f"zero-copy: {full['zero_copy'] and sql_panel['zero_copy']}")
+
+if __name__ == "__main__":
+    main()
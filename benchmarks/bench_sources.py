@@ -0,0 +1,99 @@
+"""
+End-to-end fetch benchmarks against app.sources.ReplaySource (no network access).
+
+    fundamentals   refresh_fundamentals: workers x client rate vs a throttling source
+    history        update_market_data into a temp SQLite DB
+    quotes         intraday quote loop (daily_run.get_live_price)
+
+Run: python -m benchmarks.bench_sources [--tickers 100] [--latency 0.05] [--error-rate 0.02]
+"""
+import argparse
+import os
+import tempfile
+import time
+from app.database import Base, Stock, create_db_engine
+from app.sources import ReplaySource, set_source
+from sqlalchemy.orm import sessionmaker
+
+def make_db(workdir, tickers):
+    engine = create_db_engine(os.path.join(workdir, "bench.db"))
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Stock(ticker=t, company_name=t) for t in tickers])
+    db.commit()
+    return engine, db
+
+def bench_fundamentals(args, tickers):
+    from app.fundamentals import refresh_fundamentals
+
+    rows = []
+    # Client rate at / above the source limit, with more or fewer workers
+    for workers in (1, 4, 8):
+        for client_rate in (args.source_rate, args.source_rate * 2):
+            source = ReplaySource(latency=args.latency, error_rate=args.error_rate,
+                                  rate=args.source_rate, burst=2, tickers=tickers)
+            with tempfile.TemporaryDirectory() as workdir:
+                engine, db = make_db(workdir, tickers)
+                start = time.perf_counter()
+                summary = refresh_fundamentals(db, tickers, workers=workers, rate=client_rate, source=source.quote)
+                elapsed = time.perf_counter() - start
+                db.close()
+                engine.dispose()
+            rows.append({'case': 'fundamentals', 'workers': workers, 'client_rate': client_rate,
+                         'seconds': round(elapsed, 3), 'fetched': summary['fetched'],
+                         'failed': summary['failed'], **source.stats()})
+    return rows
+
+def bench_history(args, tickers):
+    try:
+        from app.fetcher import update_market_data
+    except ImportError as e:
+        return [{'case': 'history', 'skipped': str(e)}]
+
+    source = ReplaySource(latency=args.latency, error_rate=args.error_rate, tickers=tickers)
+    with tempfile.TemporaryDirectory() as workdir:
+        engine, db = make_db(workdir, tickers)
+        start = time.perf_counter()
+        update_market_data(db, tickers, source=source, rate=0)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        update_market_data(db, tickers, source=source, rate=0)
+        warm = time.perf_counter() - start
+        db.close()
+        engine.dispose()
+    return [{'case': 'history', 'cold_seconds': round(cold, 3), 'incremental_seconds': round(warm, 3), **source.stats()}]
+
+def bench_quotes(args, tickers):
+    import daily_run
+
+    source = ReplaySource(latency=args.latency, error_rate=args.error_rate, tickers=tickers)
+    previous = set_source(source)
+    try:
+        start = time.perf_counter()
+        ok = sum(1 for t in tickers if daily_run.get_live_price(t)[2])
+        elapsed = time.perf_counter() - start
+    finally:
+        set_source(previous)
+    return [{'case': 'quotes', 'seconds': round(elapsed, 3), 'ok': ok, **source.stats()}]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Replay latency per call (s)")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--source-rate", type=float, default=20.0, help="Replay throttle (calls/s)")
+    parser.add_argument("--cases", nargs="+", default=["fundamentals", "history", "quotes"])
+    args = parser.parse_args()
+
+    tickers = [f"SYN{i:04d}" for i in range(args.tickers)]
+    cases = {'fundamentals': bench_fundamentals, 'history': bench_history, 'quotes': bench_quotes}
+    results = []
+    for name in args.cases:
+        results += cases[name](args, tickers)
+
+    print()
+    for row in results:
+        print(row)
+
+if __name__ == "__main__":
+    main()
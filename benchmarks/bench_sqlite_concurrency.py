@@ -0,0 +1,146 @@
+"""
+Benchmark: parallel readers while a writer bulk-upserts DailyPrice rows.
+
+Compares SQLite defaults (rollback journal) with the tuned profile from
+app.database.create_db_engine (WAL + pragmas, read-only reader URIs).
+Run: python -m benchmarks.bench_sqlite_concurrency
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.database import Base, Stock, DailyPrice, create_db_engine, SQLITE_PRAGMAS
+
+# Pragmas that only differ from SQLite defaults in lock waiting, so both
+# profiles get the same busy timeout and only journaling / caching differ.
+DEFAULT_PRAGMAS = {'busy_timeout': SQLITE_PRAGMAS['busy_timeout']}
+
+PROFILES = {
+    'default': {'pragmas': DEFAULT_PRAGMAS, 'read_only': False},
+    'tuned': {'pragmas': SQLITE_PRAGMAS, 'read_only': True},
+}
+
+READ_QUERY = text(
+    "SELECT date, open, high, low, close, volume FROM daily_prices "
+    "WHERE ticker = :ticker ORDER BY date DESC LIMIT 250"
+)
+
+def _price_rows(tickers, start, days, seed=7):
+    rnd = random.Random(seed)
+    rows = []
+    for t in tickers:
+        price = rnd.uniform(100, 2000)
+        for i in range(days):
+            price *= 1 + rnd.gauss(0, 0.015)
+            rows.append({
+                'ticker': t, 'date': start + timedelta(days=i),
+                'open': price, 'high': price * 1.01, 'low': price * 0.99, 'close': price,
+                'volume': rnd.randint(10_000, 1_000_000),
+            })
+    return rows
+
+def seed_db(path, profile, n_tickers, days):
+    engine = create_db_engine(path, pragmas=PROFILES[profile]['pragmas'])
+    Base.metadata.create_all(bind=engine)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    with engine.begin() as conn:
+        conn.execute(Stock.__table__.insert(), [{'ticker': t, 'company_name': t} for t in tickers])
+        conn.execute(DailyPrice.__table__.insert(), _price_rows(tickers, date(2020, 1, 1), days))
+    engine.dispose()
+    return tickers
+
+def writer(path, profile, tickers, days, batch, result):
+    """Upserts `days` new bars per ticker (delete + insert per batch, like update_market_data)."""
+    engine = create_db_engine(path, pragmas=PROFILES[profile]['pragmas'])
+    rows = _price_rows(tickers, date(2020, 1, 1) + timedelta(days=days - 5), days, seed=11)
+    start = time.perf_counter()
+    errors = 0
+    for i in range(0, len(rows), batch):
+        chunk = rows[i:i + batch]
+        chunk_tickers = sorted({r['ticker'] for r in chunk})
+        try:
+            with engine.begin() as conn:
+                conn.execute(DailyPrice.__table__.delete().where(
+                    DailyPrice.ticker.in_(chunk_tickers),
+                    DailyPrice.date >= chunk[0]['date']
+                ))
+                conn.execute(DailyPrice.__table__.insert(), chunk)
+        except OperationalError:
+            errors += 1
+    result['writer_seconds'] = round(time.perf_counter() - start, 3)
+    result['writer_errors'] = errors
+    engine.dispose()
+
+def reader(path, profile, tickers, stop, seed, out):
+    """Runs point reads until the writer is done; reports latencies and lock errors."""
+    cfg = PROFILES[profile]
+    engine = create_db_engine(path, pragmas=cfg['pragmas'], read_only=cfg['read_only'], pool_size=1)
+    rnd = random.Random(seed)
+    latencies, locked = [], 0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ_QUERY, {'ticker': rnd.choice(tickers)}).fetchall()
+            latencies.append(time.perf_counter() - t0)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    engine.dispose()
+    out.put((latencies, locked))
+
+def run_profile(profile, n_tickers, seed_days, new_days, readers, batch):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        tickers = seed_db(path, profile, n_tickers, seed_days)
+
+        stop, out = mp.Event(), mp.Queue()
+        procs = [mp.Process(target=reader, args=(path, profile, tickers, stop, i, out)) for i in range(readers)]
+        for p in procs:
+            p.start()
+        time.sleep(0.5) # Let readers connect before the write burst
+
+        result = {}
+        start = time.perf_counter()
+        write_thread = threading.Thread(target=writer, args=(path, profile, tickers, seed_days + new_days, batch, result))
+        write_thread.start()
+        write_thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    latencies = sorted(l for lat, _ in results for l in lat)
+    return {
+        'profile': profile,
+        'reads': len(latencies),
+        'reads_per_s': round(len(latencies) / elapsed, 1),
+        'read_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        'read_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        'locked_errors': sum(lk for _, lk in results),
+        **result,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--seed-days", type=int, default=500, help="Bars per ticker before the run")
+    parser.add_argument("--new-days", type=int, default=30, help="Bars per ticker upserted during the run")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=500, help="Rows per write transaction")
+    args = parser.parse_args()
+
+    for profile in PROFILES:
+        print(run_profile(profile, args.tickers, args.seed_days, args.new_days, args.readers, args.batch))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup (import) cost of each daily_run.py mode, measured with `python -X importtime`.
+
+Each mode is started with --import-only in a fresh interpreter, so the numbers are
+what a scheduled run pays before doing any work. Exits non-zero when a mode exceeds
+its threshold, or regresses more than --tolerance vs a saved baseline.
+
+Run: python -m benchmarks.bench_startup [--save-baseline]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# Absolute ceilings (ms of cumulative import time, median of --runs)
+THRESHOLDS_MS = {
+    "intraday": 600, # sqlalchemy + requests, no pandas
+    "premarket": 2500,
+    "eod": 2500,
+}
+
+def parse_importtime(stderr):
+    """
+    Parses -X importtime output into {module: cumulative_us} for top-level imports
+    (the ones not nested under another import) and the total.
+    """
+    top, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:    self |  cumulative | <indent>module", nested imports are indented
+        _, cumulative, name = line.split("|")
+        name = name[1:]
+        if not name.startswith(" "):
+            top[name] = int(cumulative)
+            total += int(cumulative)
+    return top, total
+
+def measure(mode, python=sys.executable):
+    proc = subprocess.run(
+        [python, "-X", "importtime", "daily_run.py", "--mode", mode, "--import-only"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        lines = [l for l in proc.stderr.splitlines() if l.strip() and not l.startswith("import time:")]
+        error = lines[-1] if lines else f"exit {proc.returncode}"
+        return None, {}, error
+    top, total = parse_importtime(proc.stderr)
+    return total / 1000, top, None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=list(THRESHOLDS_MS))
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per mode (median is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level imports to show")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression vs baseline (0.25 = +25%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+
+    results, failures = {}, []
+    for mode in args.modes:
+        samples, top, error = [], {}, None
+        for _ in range(args.runs):
+            ms, top, error = measure(mode)
+            if error:
+                break
+            samples.append(ms)
+        if error:
+            print(f"{mode:<10} FAILED: {error}")
+            failures.append(mode)
+            continue
+
+        ms = sorted(samples)[len(samples) // 2]
+        results[mode] = round(ms, 1)
+        heaviest = sorted(top.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        status = "ok"
+        if ms > THRESHOLDS_MS.get(mode, float("inf")):
+            status = f"OVER THRESHOLD ({THRESHOLDS_MS[mode]} ms)"
+        elif mode in baseline and ms > baseline[mode] * (1 + args.tolerance):
+            status = f"REGRESSION vs baseline {baseline[mode]} ms"
+        if status != "ok":
+            failures.append(mode)
+
+        print(f"{mode:<10} {ms:8.1f} ms  {status}")
+        for name, us in heaviest:
+            print(f"    {name:<30} {us / 1000:8.1f} ms")
+
+    if args.save_baseline and results:
+        baseline.update(results)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
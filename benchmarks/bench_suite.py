@@ -0,0 +1,194 @@
+"""
+End-to-end benchmark on deterministic synthetic data (see benchmarks/synthetic.py).
+
+For each scale (tickers x bars) a temp SQLite DB and a columnar store are built, then:
+
+    load_sqlite / load_columnar   per-ticker price frame loads
+    analyze_ticker                SMC annotation
+    signal_bundle                 SMC annotation + entry / stop arrays of every strategy
+    fvg_signals / trend_ob_signals backtest_strategies signal functions (first call: memo misses)
+    fvg_signals_memo              fvg_signals again, served by app.signal_cache
+    rs_backfill                   update_rs_table on an empty rs_scores table
+    signals_backfill              update_signals on an empty signals table
+    premarket_scan                one new bar: incremental signals + RS snapshot + setup query
+    screener                      screen_universe (all default screens)
+    universe_backtest             PureFVGStrategy over the sample tickers (signals from the memo)
+
+Results are appended to benchmarks/history.json (with the git commit) and compared
+with the previous run of the same scale.
+
+Run: python -m benchmarks.bench_suite [--scales 50x500 500x500 50x5000] [--sample 20]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_panel, write_sqlite, append_bars, write_columnar, ColumnarStore, SyntheticMarket
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(ROOT, "benchmarks", "history.json")
+
+DEFAULT_SCALES = ["50x500", "500x500", "50x5000"]
+
+# Slowdown vs the previous run of the same case that gets flagged
+REGRESSION_RATIO = 1.25
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def _timed(func, items=1):
+    start = time.perf_counter()
+    out = func()
+    seconds = time.perf_counter() - start
+    return {'seconds': round(seconds, 4), 'items': items, 'per_item_ms': round(seconds / max(items, 1) * 1000, 3)}, out
+
+def run_scale(n_tickers, n_bars, sample, seed, workdir):
+    from app.prices import load_price_frame
+    from app.smc_agent import analyze_ticker
+    from app.signal_bundle import compute_signal_bundle
+    from app.relative_strength import update_rs_table, get_rs_snapshot
+    from app.signals import update_signals, query_signals
+    from app.screener import screen_universe
+
+    results = {}
+    panel = make_panel(n_tickers, n_bars, seed=seed)
+    market = SyntheticMarket(panel)
+    sample_tickers = panel['tickers'][:sample].tolist()
+
+    # Setup (reported, not compared): everything but the last bar, which the premarket case appends
+    results['setup_sqlite'], (engine, Session) = _timed(
+        lambda: write_sqlite(os.path.join(workdir, "bench.db"), panel, bars=n_bars - 1), items=n_tickers)
+    store_dir = os.path.join(workdir, "columnar")
+    results['setup_columnar'], _ = _timed(lambda: write_columnar(store_dir, panel), items=n_tickers)
+    store = ColumnarStore(store_dir)
+
+    db = Session()
+    try:
+        results['load_sqlite'], frames = _timed(
+            lambda: {t: load_price_frame(db, t) for t in sample_tickers}, items=len(sample_tickers))
+        results['load_columnar'], _ = _timed(
+            lambda: [store.frame(t) for t in sample_tickers], items=len(sample_tickers))
+
+        results['analyze_ticker'], _ = _timed(
+            lambda: [analyze_ticker(t, frames[t]) for t in sample_tickers], items=len(sample_tickers))
+        results['signal_bundle'], _ = _timed(
+            lambda: [compute_signal_bundle(frames[t], t) for t in sample_tickers], items=len(sample_tickers))
+
+        try:
+            from app.backtest_strategies import get_fvg_signals, get_trend_ob_signals
+            results['fvg_signals'], _ = _timed(
+                lambda: [get_fvg_signals(frames[t]) for t in sample_tickers], items=len(sample_tickers))
+            results['trend_ob_signals'], _ = _timed(
+                lambda: [get_trend_ob_signals(frames[t]) for t in sample_tickers], items=len(sample_tickers))
+            results['fvg_signals_memo'], _ = _timed(
+                lambda: [get_fvg_signals(frames[t]) for t in sample_tickers], items=len(sample_tickers))
+        except ImportError as e:
+            results['fvg_signals'] = results['trend_ob_signals'] = results['fvg_signals_memo'] = {'skipped': str(e)}
+
+        results['rs_backfill'], _ = _timed(lambda: update_rs_table(db, market=market), items=n_tickers)
+        results['signals_backfill'], _ = _timed(lambda: update_signals(db), items=n_tickers)
+
+        # EOD of the new session (untimed), then the premarket scan on it
+        append_bars(engine, panel, n_bars - 1, n_bars)
+        update_rs_table(db, market=market)
+
+        def premarket():
+            rs = get_rs_snapshot(db, window=5)
+            update_signals(db)
+            setups = query_signals(db, bullish_fvg=True, min_history=50)
+            return setups[setups['ticker'].map(rs).fillna(-1) > 0]
+        results['premarket_scan'], setups = _timed(premarket, items=n_tickers)
+        results['premarket_scan']['setups'] = len(setups)
+
+        results['screener'], screened = _timed(lambda: screen_universe(db, market=market), items=n_tickers)
+
+        try:
+            from backtesting import Backtest
+            from app.backtest_strategies import PureFVGStrategy
+
+            def backtest():
+                return [Backtest(frames[t], PureFVGStrategy, cash=100000, commission=.002).run()
+                        for t in sample_tickers]
+            results['universe_backtest'], _ = _timed(backtest, items=len(sample_tickers))
+        except ImportError as e:
+            results['universe_backtest'] = {'skipped': str(e)}
+    finally:
+        db.close()
+        engine.dispose()
+
+    return results
+
+def _load_history():
+    if not os.path.exists(HISTORY_FILE):
+        return []
+    with open(HISTORY_FILE) as f:
+        return json.load(f)
+
+def _previous(history, scale):
+    for entry in reversed(history):
+        if entry['scale'] == scale:
+            return entry['results']
+    return {}
+
+def report(scale, results, previous):
+    print(f"\n=== {scale} ===")
+    print(f"{'case':<20} {'seconds':>10} {'per item ms':>12} {'vs prev':>9}")
+    regressions = []
+    for case, r in results.items():
+        if 'skipped' in r:
+            print(f"{case:<20} {'skipped':>10}   {r['skipped']}")
+            continue
+        prev = previous.get(case, {}).get('seconds')
+        ratio = r['seconds'] / prev if prev else None
+        flag = ""
+        if ratio is not None and ratio > REGRESSION_RATIO and not case.startswith('setup'):
+            flag = "  REGRESSION"
+            regressions.append(case)
+        ratio_txt = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{case:<20} {r['seconds']:>10.3f} {r['per_item_ms']:>12.3f} {ratio_txt:>9}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help="TICKERSxBARS, e.g. 5000x500")
+    parser.add_argument("--sample", type=int, default=20, help="Tickers used for the per-ticker cases")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-save", action="store_true", help="Don't append to the history file")
+    args = parser.parse_args()
+
+    history = _load_history()
+    meta = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+    }
+
+    regressions = []
+    for scale in args.scales:
+        n_tickers, n_bars = (int(x) for x in scale.lower().split("x"))
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_scale(n_tickers, n_bars, min(args.sample, n_tickers), args.seed, workdir)
+        regressions += [f"{scale}:{c}" for c in report(scale, results, _previous(history, scale))]
+        history.append({**meta, 'scale': scale, 'sample': args.sample, 'results': results})
+
+    if not args.no_save:
+        with open(HISTORY_FILE, "w") as f:
+            json.dump(history, f, indent=1)
+        print(f"\nResults appended to {HISTORY_FILE}")
+    if regressions:
+        print(f"Regressions (> {REGRESSION_RATIO}x previous): {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
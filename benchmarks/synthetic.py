@@ -0,0 +1,142 @@
+"""
+Deterministic synthetic market data for benchmarks.
+
+make_panel() builds an OHLCV panel (tickers x bars) from a seeded random walk with
+occasional gaps, so SMC patterns (swings, FVGs, OBs) show up at realistic rates.
+The same panel can be written to a temp SQLite DB (same schema as production) and
+to a columnar store (one .npy file per column, memory-mapped on read).
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+
+SECTORS = ['Banks', 'IT - Software', 'Pharmaceuticals', 'Auto Components', 'FMCG', 'Metals', 'Power', 'Realty']
+
+PANEL_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+def make_panel(n_tickers, n_bars, seed=42, start="2000-01-03"):
+    """
+    Returns a dict of numpy arrays:
+    tickers (n_tickers,), dates (n_bars,) datetime64[D], open/high/low/close/volume (n_tickers, n_bars)
+    plus per-ticker fundamentals (sector, current_pe, quarterly_earnings_growth).
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=n_bars).values.astype('datetime64[D]')
+    tickers = np.array([f"SYN{i:05d}" for i in range(n_tickers)])
+
+    drift = rng.normal(0.0003, 0.0004, size=(n_tickers, 1))
+    vol = rng.uniform(0.01, 0.03, size=(n_tickers, 1))
+    returns = drift + vol * rng.standard_normal((n_tickers, n_bars))
+    # Occasional gap days create fair value gaps
+    gaps = rng.random((n_tickers, n_bars)) < 0.03
+    returns += gaps * rng.normal(0, 0.04, size=(n_tickers, n_bars))
+
+    start_price = rng.uniform(50, 3000, size=(n_tickers, 1))
+    close = start_price * np.exp(np.cumsum(returns, axis=1))
+    prev_close = np.concatenate([start_price, close[:, :-1]], axis=1)
+    open_ = prev_close * (1 + rng.normal(0, 0.004, size=close.shape) + gaps * (close / prev_close - 1) * 0.7)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, size=close.shape)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, size=close.shape)))
+    volume = rng.lognormal(12, 1, size=close.shape).astype(np.int64)
+
+    return {
+        'tickers': tickers,
+        'dates': dates,
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+        'sector': rng.choice(SECTORS, size=n_tickers),
+        'current_pe': rng.uniform(-10, 90, size=n_tickers).round(2),
+        'quarterly_earnings_growth': rng.normal(0.12, 0.2, size=n_tickers).round(4),
+    }
+
+def nifty_close(panel):
+    """Equal-weight index of the panel, as a Series indexed by date (stand-in for Nifty 50)."""
+    rel = panel['close'] / panel['close'][:, :1]
+    return pd.Series(1000 * rel.mean(axis=0), index=pd.to_datetime(panel['dates']))
+
+class SyntheticMarket:
+    """MarketAnalyzer stand-in (get_nifty_close / get_nifty_trend) backed by the panel."""
+    def __init__(self, panel):
+        self.close = nifty_close(panel)
+
+    def get_nifty_close(self):
+        return self.close
+
+    def get_nifty_trend(self):
+        ema = self.close.ewm(span=50, adjust=False).mean()
+        return "UPTREND" if self.close.iloc[-1] > ema.iloc[-1] else "DOWNTREND"
+
+def _ema(values, span):
+    return pd.DataFrame(values.T).ewm(span=span, adjust=False).mean().to_numpy().T
+
+def write_sqlite(path, panel, bars=None, chunk=50_000):
+    """
+    Writes stocks + daily_prices (with EMA 20/50/200) to a SQLite file.
+    `bars` limits how many leading bars are written (the rest can be appended later).
+    Returns (engine, Session factory).
+    """
+    engine = create_db_engine(path)
+    Base.metadata.create_all(bind=engine)
+
+    n_bars = len(panel['dates']) if bars is None else bars
+    tickers = panel['tickers']
+    emas = {span: _ema(panel['close'], span) for span in (20, 50, 200)}
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO stocks (ticker, company_name, sector, current_pe, quarterly_earnings_growth) VALUES (?, ?, ?, ?, ?)",
+            [(t, t, s, float(pe), float(g)) for t, s, pe, g in zip(
+                tickers, panel['sector'], panel['current_pe'], panel['quarterly_earnings_growth'])]
+        )
+    append_bars(engine, panel, 0, n_bars, emas=emas, chunk=chunk)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def append_bars(engine, panel, start, stop, emas=None, chunk=50_000):
+    """Inserts bars [start, stop) of every ticker into daily_prices."""
+    emas = emas or {span: _ema(panel['close'], span) for span in (20, 50, 200)}
+    dates = [str(d) for d in panel['dates'][start:stop]]
+    sql = ("INSERT INTO daily_prices (ticker, date, open, high, low, close, volume, ema_20, ema_50, ema_200) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    rows = []
+    with engine.begin() as conn:
+        for i, t in enumerate(panel['tickers']):
+            cols = [panel[c][i, start:stop].tolist() for c in PANEL_COLUMNS] + \
+                   [emas[s][i, start:stop].tolist() for s in (20, 50, 200)]
+            rows.extend((t, d, *vals) for d, *vals in zip(dates, *cols))
+            if len(rows) >= chunk:
+                conn.exec_driver_sql(sql, rows)
+                rows = []
+        if rows:
+            conn.exec_driver_sql(sql, rows)
+
+def write_columnar(directory, panel):
+    """One .npy per column (tickers x bars) + a small JSON index. Read back with ColumnarStore."""
+    os.makedirs(directory, exist_ok=True)
+    for col in PANEL_COLUMNS:
+        np.save(os.path.join(directory, f"{col}.npy"), panel[col])
+    np.save(os.path.join(directory, "dates.npy"), panel['dates'])
+    with open(os.path.join(directory, "index.json"), "w") as f:
+        json.dump({'tickers': panel['tickers'].tolist()}, f)
+
+class ColumnarStore:
+    """Memory-mapped reader for write_columnar() output."""
+    def __init__(self, directory):
+        with open(os.path.join(directory, "index.json")) as f:
+            self.tickers = json.load(f)['tickers']
+        self._pos = {t: i for i, t in enumerate(self.tickers)}
+        self.dates = np.load(os.path.join(directory, "dates.npy"))
+        self.columns = {c: np.load(os.path.join(directory, f"{c}.npy"), mmap_mode='r') for c in PANEL_COLUMNS}
+
+    def frame(self, ticker):
+        """Date-indexed Title Case frame, same shape as app.prices.load_price_frame."""
+        i = self._pos[ticker]
+        return pd.DataFrame(
+            {c.capitalize(): np.asarray(self.columns[c][i]) for c in PANEL_COLUMNS},
+            index=pd.DatetimeIndex(self.dates, name='date'),
+        )
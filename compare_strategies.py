@@ -1,17 +1,11 @@
 from backtesting import Backtest
 from app.backtest_strategies import PureFVGStrategy
-from app.database import get_db, DailyPrice, Stock
+from app.database import get_db, Stock
+from app.panel import OHLCVPanel
+from app.rules import DEFAULT_SCREENS, Screen, explain_failures
 import pandas as pd
 import numpy as np
-
-def load_data(ticker, db):
-    query = db.query(DailyPrice).filter(DailyPrice.ticker == ticker).order_by(DailyPrice.date.asc())
-    df = pd.read_sql(query.statement, db.bind)
-    if df.empty: return None
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    df = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume', 'ema_200': 'EMA_200'})
-    return df
+from app import instrument, signal_cache
 
 def run_comparison():
     print("Starting Comparative Backtest...")
@@ -25,41 +19,35 @@ def run_comparison():
     # Group A: All Stocks (Pure Technical)
     group_a = [s.ticker for s in stocks]
     
-    # Group B: Fundamental Filter (PE > 0 and PE < 85)
+    # Group B: Fundamental Filter (pe_band screen: 0 <= PE <= 85)
     # Filter out loss making (PE < 0 or None) and extremely overvalued (PE > 85)
-    group_b = []
-    skipped_reasons = {}
+    # The screen is pushed down to SQL, the skipped reasons come from the same rules.
+    pe_band = Screen("pe_band", DEFAULT_SCREENS["pe_band"])
+    clauses, _ = pe_band.sql_filters(Stock)
+    group_b = [t for (t,) in db.query(Stock.ticker).filter(*clauses).all()]
     
-    for s in stocks:
-        pe = s.current_pe
-        if pe is None:
-            skipped_reasons[s.ticker] = "Missing Data"
-            continue
-        if pe < 0:
-            skipped_reasons[s.ticker] = "Negative PE"
-            continue
-        if pe > 85:
-            skipped_reasons[s.ticker] = f"Overvalued (PE {pe:.1f})"
-            continue
-            
-        group_b.append(s.ticker)
+    # Reasons are the labels of the failing rules ("current_pe between (0, 85)"), which
+    # replace the former "Missing Data" / "Negative PE" / "Overvalued (PE x)" texts
+    universe = pd.DataFrame({'ticker': group_a, 'current_pe': [s.current_pe for s in stocks]})
+    reasons = explain_failures(universe, pe_band)
+    skipped_reasons = dict(zip(universe['ticker'][reasons.notna()], reasons.dropna()))
         
     print(f"Group A (Pure Tech): {len(group_a)} stocks")
     print(f"Group B (Fund + Tech): {len(group_b)} stocks (Filtered {len(group_a) - len(group_b)})")
     
     # 3. Run Backtest Helper
+    # Both groups read frames (views) from one compact load of group A (B is a subset)
+    panel = OHLCVPanel.from_db(db, tickers=group_a)
+
     def run_group(tickers, name):
         results = []
         print(f"\nRunning {name}...")
-        for t in tickers:
+        # Basic check for data length: at least 50 bars
+        for t, df in panel.iter_frames(tickers, min_bars=50):
             try:
-                df = load_data(t, db)
-                if df is None: continue
-                # Basic check for data length
-                if len(df) < 50: continue
-                
                 bt = Backtest(df, PureFVGStrategy, cash=100000, commission=.002)
-                stats = bt.run()
+                with instrument.stage("backtest"):
+                    stats = bt.run()
                 results.append({
                     'Ticker': t, 
                     'Return': stats['Return [%]'], 
@@ -74,6 +62,8 @@ def run_comparison():
     # Execute
     res_a = run_group(group_a, "Pure FVG (All Stocks)")
     res_b = run_group(group_b, "Techno-Fundamental (Filtered)")
+    # Group B is a subset of group A: its signals come from the memo
+    print(signal_cache.describe())
     
     db.close()
     
@@ -103,4 +93,5 @@ def run_comparison():
         print(f"{k}: {v}")
 
 if __name__ == "__main__":
-    run_comparison()
+    with instrument.run("compare_strategies"):
+        run_comparison()
@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+from app import corporate_actions
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on an empty SQLite DB with every table (SQLite default pragmas)."""
+    engine = create_db_engine(str(tmp_path / "test.db"), pragmas={})
+    Base.metadata.create_all(bind=engine)
+    corporate_actions._cache.clear()
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
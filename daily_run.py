@@ -1,24 +1,33 @@
 import argparse
-from app.database import get_db, init_db, Stock, DailyPrice, Trade
-from app.fetcher import update_market_data
-from app.smc_agent import analyze_ticker
-from datetime import date
-import pandas as pd
+import importlib
 import os
-import requests
-from nsepython import nse_eq
+from datetime import date
+from app import instrument
+
+# Modules each mode needs, imported only once the mode is known (see load_mode).
+# The intraday monitor runs every 3 minutes, so it must not pay for pandas / nselib / pandas_ta.
+# Modules only needed on some paths (chart rendering) stay lazy inside the functions;
+# app.sources imports nsepython / nselib / yfinance only on the first call, app.intraday
+# (numpy) on the first quote.
+MODE_IMPORTS = {
+    "premarket": ["pandas", "app.database", "app.market_utils", "app.relative_strength", "app.signals"],
+    "intraday": ["app.database", "app.alerts", "app.sources"],
+    "eod": ["app.database", "app.fetcher", "app.relative_strength", "app.signals", "app.resampled", "app.trade_stats", "app.screener"],
+}
 
 # Telegram Settings
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
+@instrument.timed("nse_quote")
 def get_live_price(ticker):
     """
     Fetches Day High, Day Low, and Current Price from NSE directly.
     Returns: (day_low, day_high, current_price) or (None, None, None)
     """
     try:
-        data = nse_eq(ticker)
+        from app.sources import get_source
+        data = get_source().quote(ticker)
         if 'priceInfo' in data:
             curr = data['priceInfo']['lastPrice']
             d_high = data['priceInfo']['intraDayHighLow']['max']
@@ -30,22 +39,59 @@ def get_live_price(ticker):
                  return None, None, None
 
             print(f"[{ticker}] Live NSE Data: Price={curr}, High={d_high}, Low={d_low}")
+            record_quote(ticker, curr, d_high, d_low)
             return d_low, d_high, curr
     except Exception as e:
         print(f"Failed to fetch NSE data for {ticker}: {e}")
     return None, None, None
 
+_recorder = None
+
+def get_recorder():
+    """Process-wide intraday bar recorder (quotes -> 1m / 5m bars, see app.intraday)."""
+    global _recorder
+    if _recorder is None:
+        from app.intraday import IntradayRecorder
+        _recorder = IntradayRecorder()
+    return _recorder
+
+def record_quote(ticker, price, day_high, day_low):
+    # Bar recording must never cost us the quote itself
+    try:
+        get_recorder().add_quote(ticker, price, day_high, day_low)
+    except Exception as e:
+        print(f"[{ticker}] Failed to record intraday bar: {e}")
+
+def flush_bars():
+    """Appends the bars recorded this cycle to the intraday store."""
+    if _recorder is not None:
+        with instrument.stage("flush_bars"):
+            written = _recorder.flush()
+        instrument.count("bars_written", written)
+
+_dispatcher = None
+
+def get_dispatcher():
+    """Process-wide Telegram dispatcher (background queue + pooled session)."""
+    global _dispatcher
+    if _dispatcher is None:
+        from app.alerts import AlertDispatcher
+        _dispatcher = AlertDispatcher(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+    return _dispatcher
+
 def send_alert(message):
-    print(f"ALERT: {message}")
-    if TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
-        try:
-            url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-            data = {'chat_id': TELEGRAM_CHAT_ID, 'text': message, 'parse_mode': 'Markdown'}
-            requests.post(url, data=data)
-        except Exception as e:
-            print(f"Failed to send Telegram alert: {e}")
-    else:
-        print("Telegram Chat ID not found. Set TELEGRAM_CHAT_ID env var.")
+    # Non-blocking: queued and delivered by the dispatcher thread
+    get_dispatcher().send(message)
+
+def send_chart(path, caption=""):
+    get_dispatcher().send_photo(path, caption)
+
+def close_alerts():
+    """Waits for queued alerts to be delivered and prints delivery stats."""
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.close()
+        _dispatcher = None
 
 def run_premarket_scan():
     """
@@ -53,6 +99,9 @@ def run_premarket_scan():
     Scans for Valid Setups based on YESTERDAY'S Data.
     Creates trades with status = 'POTENTIAL'.
     """
+    import pandas as pd
+    from app.database import get_db, init_db, Stock, Trade
+    
     print("Starting PRE-MARKET Scan (Analysis of Yesterday)...")
     init_db()
     db = next(get_db())
@@ -68,7 +117,8 @@ def run_premarket_scan():
     ma = MarketAnalyzer()
     
     print("Checking Market Regime (Nifty 50 Trend)...")
-    market_trend = ma.get_nifty_trend()
+    with instrument.stage("market_regime"):
+        market_trend = ma.get_nifty_trend()
     print(f"Market Trend: {market_trend}")
     
     if market_trend == "DOWNTREND":
@@ -79,82 +129,78 @@ def run_premarket_scan():
         return
     # ----------------------------
     
+    # Precomputed 5-day RS (written by the EOD run). Falls back to a live check per ticker
+    # if missing, or if the RS table is behind the latest stored session.
+    from app.relative_strength import get_rs_snapshot
+    with instrument.stage("rs_snapshot"):
+        rs_snapshot = get_rs_snapshot(db, window=5)
+    if not rs_snapshot:
+        print("No RS scores for the latest session, using live RS checks.")
+    
+    # Setups come from the precomputed signals table (written by the EOD run).
+    # The update is a no-op when signals already cover the latest bars.
+    from app.signals import update_signals, query_signals
+    with instrument.stage("update_signals"):
+        update_signals(db, tickers)
+    
+    # Each ticker's latest bar with a Bullish FVG and at least 50 bars of history
+    with instrument.stage("query_signals"):
+        setups = query_signals(db, bullish_fvg=True, min_history=50)
+    instrument.count("setups", len(setups))
+    print(f"{len(setups)} tickers with a fresh Bullish FVG.")
+    
     potential_count = 0
     
-    for ticker in tickers:
+    for setup in setups.itertuples(index=False):
+        ticker = setup.ticker
         try:
-            # 1. Fetch Historical Data (Up to Yesterday)
-            query = db.query(DailyPrice).filter(DailyPrice.ticker == ticker).order_by(DailyPrice.date.asc())
-            df = pd.read_sql(query.statement, db.bind)
-            
-            if df.empty or len(df) < 50: continue
-            
-            # Prepare Data
-            df['date'] = pd.to_datetime(df['date'])
-            df.set_index('date', inplace=True)
-            df = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume', 'ema_200': 'EMA_200'})
-            
-            # 2. Analyze Strategy (Pure FVG)
-            _, s_df = analyze_ticker(ticker, df)
-            latest = s_df.iloc[-1]
-            
             # --- RELATIVE STRENGTH CHECK ---
-            if not ma.get_relative_strength(ticker, db):
+            if ticker in rs_snapshot:
+                is_strong = rs_snapshot[ticker] > 0
+            else:
+                is_strong = ma.get_relative_strength(ticker, db)
+            
+            if not is_strong:
                 # Skip if stock is weaker than market
-                # print(f"[{ticker}] Skipped: Relative Weakness")
                 continue
             # -------------------------------
             
-            # 3. Check for Setup
-            if latest['bullish_fvg']: # Bullish FVG Found
-                entry = latest['Low'] # Top of FVG Gap (Yesterday's Low? No, FVG logic defines entry)
-                
-                # Double check FVG Logic interpretation:
-                # Usually FVG Entry is the top of the gap candle (candle i-2 Low vs i High)
-                # Ensure we use the calculated entry from analyze_ticker if available or derive it.
-                # Assuming analyze_ticker returns a DF where 'Low' of the last candle IS the setup candle?
-                # Actually, verify analyze_ticker logic. 
-                # Assuming standard FVG: We want to enter at the retest of the gap.
-                # latest['Low'] is likely just yesterday's low.
-                # We need the Top of the 3rd candle in the sequence?
-                # For safety, let's trust the 'price' logic we had before:
-                # entry = latest['Low'] (This seems to be what was used: "Entry: Top of Gap (Current Low)")
-                
-                # Check duplication for TODAY
-                existing = db.query(Trade).filter(
-                    Trade.ticker == ticker, 
-                    Trade.signal_date == today
-                ).first()
-                
-                if not existing:
-                    # Risk Management
-                    if len(s_df) >= 3:
-                        sl = s_df['Low'].iloc[-3] # i-2 Low
-                    else:
-                        sl = entry * 0.95 # Fallback
-                        
-                    risk = entry - sl
-                    if risk > 0:
-                        tp = entry + (2 * risk)
-                        
-                        # Create POTENTIAL Trade
-                        new_trade = Trade(
-                            ticker=ticker,
-                            signal_date=today,
-                            entry_price=entry,
-                            sl_price=sl,
-                            tp_price=tp,
-                            status="POTENTIAL",
-                            reason="Pre-Market Scan"
-                        )
-                        db.add(new_trade)
-                        potential_count += 1
-                        print(f"[{ticker}] Found Potential Setup. Entry: {entry}")
+            # Entry: Top of Gap (Low of the FVG candle), Stop: Low of candle i-2
+            entry = setup.low
+            
+            # Check duplication for TODAY
+            existing = db.query(Trade).filter(
+                Trade.ticker == ticker, 
+                Trade.signal_date == today
+            ).first()
+            
+            if not existing:
+                # Risk Management
+                sl = setup.setup_low if pd.notna(setup.setup_low) else entry * 0.95 # Fallback
+                    
+                risk = entry - sl
+                if risk > 0:
+                    tp = entry + (2 * risk)
+                    
+                    # Create POTENTIAL Trade
+                    new_trade = Trade(
+                        ticker=ticker,
+                        signal_date=today,
+                        entry_price=entry,
+                        sl_price=sl,
+                        tp_price=tp,
+                        status="POTENTIAL",
+                        reason="Pre-Market Scan"
+                    )
+                    db.add(new_trade)
+                    potential_count += 1
+                    print(f"[{ticker}] Found Potential Setup. Entry: {entry}")
 
         except Exception as e:
             print(f"Error scanning {ticker}: {e}")
             
     db.commit()
+    instrument.count("rows_written", potential_count)
     
     if potential_count > 0:
         msg = f"🌅 **PRE-MARKET SCAN COMPLETED**\nFound {potential_count} potential setups for today.\nWaiting for Market Open..."
@@ -171,10 +217,24 @@ def run_intraday_execution():
     1. Checks 'POTENTIAL' trades for Validation & Entry.
     2. Manages 'OPEN' trades for Exits.
     """
+    from app.database import get_db, init_db
+    
     print("Starting INTRADAY EXECUTION Cycle...")
     init_db()
     db = next(get_db())
-    today = date.today()
+    
+    try:
+        # All entry / exit alerts of this cycle go out as one coalesced message
+        with get_dispatcher().batch():
+            _run_intraday_cycle(db, date.today())
+    finally:
+        db.close()
+        # Bars polled before a failure are still written
+        flush_bars()
+    print("Intraday Execution Cycle Complete.")
+
+def _run_intraday_cycle(db, today):
+    from app.database import Trade
     
     # -------------------------------
     # 1. Process POTENTIAL Trades
@@ -221,24 +281,20 @@ def run_intraday_execution():
         # AND Price is within range (Low <= Entry <= High) - implied if Current <= Entry and Valid
         
         if nse_curr <= trade.entry_price:
-             # DOUBLE CHECK: One trade per day
-             # Ensure no other "OPEN" or "CLOSED" trade exists for this ticker today
-             # just to be super safe against race conditions or manual inserts
-             pass 
-             
-             trade.status = "OPEN"
-             trade.entry_date = today
-             trade.reason = "Entry Triggered Checks Passed"
-             
-             msg = f"🚀 **ENTRY TRIGGERED**: {trade.ticker}\nPrice: {trade.entry_price}\nSL: {trade.sl_price}\nTP: {trade.tp_price}"
-             send_alert(msg)
-             
+            trade.status = "OPEN"
+            trade.entry_date = today
+            trade.reason = "Entry Triggered Checks Passed"
+            
+            msg = f"🚀 **ENTRY TRIGGERED**: {trade.ticker}\nPrice: {trade.entry_price}\nSL: {trade.sl_price}\nTP: {trade.tp_price}"
+            send_alert(msg)
+            
     db.commit()
 
     # -------------------------------
     # 2. Manage ACTIVE Trades (OPEN)
     # -------------------------------
     active_trades = db.query(Trade).filter(Trade.status == "OPEN").all()
+    closed = 0
     
     for trade in active_trades:
         nse_low, nse_high, nse_curr = get_live_price(trade.ticker)
@@ -251,6 +307,7 @@ def run_intraday_execution():
             trade.exit_price = trade.sl_price
             trade.exit_date = today
             trade.pnl = trade.exit_price - trade.entry_price
+            closed += 1
             msg = f"🛑 **STOP LOSS HIT**: {trade.ticker}\nExit: {trade.exit_price}\nPnL: {trade.pnl:.2f}"
             send_alert(msg)
             
@@ -261,14 +318,27 @@ def run_intraday_execution():
             trade.exit_price = trade.tp_price
             trade.exit_date = today
             trade.pnl = trade.exit_price - trade.entry_price
+            closed += 1
             msg = f"💰 **TARGET HIT**: {trade.ticker}\nExit: {trade.exit_price}\nPnL: {trade.pnl:.2f}"
             send_alert(msg)
             
     db.commit()
-    db.close()
-    print("Intraday Execution Cycle Complete.")
+    
+    if closed:
+        # Fold the closed trades into trade_stats (pandas is only imported on these cycles)
+        try:
+            from app.trade_stats import refresh_trade_stats
+            with instrument.stage("update_trade_stats"):
+                refresh_trade_stats(db)
+        except Exception as e:
+            print(f"Trade stats update failed: {e}")
+            db.rollback()
 
 def run_eod_report():
+    import pandas as pd
+    from app.database import get_db, init_db, Stock
+    from app.fetcher import update_market_data
+    
     print("Generating EOD Report...")
     init_db()
     db = next(get_db())
@@ -278,70 +348,153 @@ def run_eod_report():
     stocks = db.query(Stock).all()
     tickers = [s.ticker for s in stocks]
     print(f"Updating EOD data for {len(tickers)} stocks...")
-    update_market_data(db, tickers)
+    with instrument.stage("update_market_data"):
+        update_market_data(db, tickers)
+    
+    # 1b. Refresh RS ranks (incremental, only new sessions)
+    from app.relative_strength import update_rs_table
+    try:
+        with instrument.stage("update_rs"):
+            update_rs_table(db)
+    except Exception as e:
+        print(f"RS update failed: {e}")
+        db.rollback()
+    
+    # 1c. Refresh signals table (incremental, only new bars)
+    from app.signals import update_signals
+    try:
+        with instrument.stage("update_signals"):
+            update_signals(db, tickers)
+    except Exception as e:
+        print(f"Signals update failed: {e}")
+        db.rollback()
+    
+    # 1d. Fold the new bars into the weekly / monthly store (only the open periods are rebuilt)
+    from app.resampled import update_resampled
+    try:
+        with instrument.stage("update_resampled"):
+            update_resampled(db, tickers)
+    except Exception as e:
+        print(f"Resampled bars update failed: {e}")
+        db.rollback()
+    
+    # 1e. Closed-trade analytics (only groups with newly closed trades are recomputed)
+    from app.trade_stats import refresh_trade_stats, get_trade_stats, load_trades
+    try:
+        with instrument.stage("update_trade_stats"):
+            refresh_trade_stats(db)
+    except Exception as e:
+        print(f"Trade stats update failed: {e}")
+        db.rollback()
+    
+    # 1f. Sector medians: stocks may have been added outside a fundamentals refresh
+    from app.screener import refresh_sector_stats
+    try:
+        with instrument.stage("refresh_sector_stats"):
+            refresh_sector_stats(db)
+    except Exception as e:
+        print(f"Sector stats refresh failed: {e}")
+        db.rollback()
     
     # 2. Compile Report from DB
-    # Fetch all activity for today
-    todays_trades = db.query(Trade).filter(Trade.signal_date == today).all()
+    # Fetch all activity for today (one frame, split by status)
+    todays_trades = load_trades(db, signal_date=today)
+    status = todays_trades['status']
+    closed = todays_trades[status == "CLOSED"].assign(pnl_pct=lambda d: d['pnl'] / d['entry_price'] * 100)
     
     msg = f"🔔 **EOD Summary ({today})**\n"
     
-    entries = [t for t in todays_trades if t.status == "OPEN"]
-    wins = [t for t in todays_trades if t.status == "CLOSED" and t.outcome == "WIN"]
-    losses = [t for t in todays_trades if t.status == "CLOSED" and t.outcome == "LOSS"]
-    skipped = [t for t in todays_trades if t.status == "SKIPPED"]
-    potential = [t for t in todays_trades if t.status == "POTENTIAL"] # Still waiting?
+    entries = todays_trades[status == "OPEN"]
+    wins = closed[closed['outcome'] == "WIN"]
+    losses = closed[closed['outcome'] == "LOSS"]
+    skipped = todays_trades[status == "SKIPPED"]
+    potential = todays_trades[status == "POTENTIAL"] # Still waiting?
     
     events = False
     
-    if wins:
+    if not wins.empty:
         msg += "\n🎉 **Wins Today:**\n"
-        for t in wins: 
-            pnl_pct = (t.pnl / t.entry_price) * 100
-            msg += f"{t.ticker}: {t.pnl:.2f} ({pnl_pct:.2f}%)\n"
+        msg += "".join(f"{t}: {p:.2f} ({pct:.2f}%)\n" for t, p, pct in zip(wins['ticker'], wins['pnl'], wins['pnl_pct']))
         events = True
         
-    if losses:
+    if not losses.empty:
         msg += "\n💀 **Losses Today:**\n"
-        for t in losses: 
-            pnl_pct = (t.pnl / t.entry_price) * 100
-            msg += f"{t.ticker}: {t.pnl:.2f} ({pnl_pct:.2f}%)\n"
+        msg += "".join(f"{t}: {p:.2f} ({pct:.2f}%)\n" for t, p, pct in zip(losses['ticker'], losses['pnl'], losses['pnl_pct']))
         events = True
         
-    if entries:
+    if not entries.empty:
         msg += "\n✅ **Active Positions:**\n"
-        for t in entries: 
-            msg += f"{t.ticker} @ {t.entry_price}\n"
+        msg += "".join(f"{t} @ {e}\n" for t, e in zip(entries['ticker'], entries['entry_price']))
         events = True
         
-    if skipped:
+    if not skipped.empty:
         msg += "\n⚠️ **Skipped Scenarios:**\n"
-        for t in skipped:
-            msg += f"{t.ticker}: {t.reason}\n"
+        msg += "".join(f"{t}: {r}\n" for t, r in zip(skipped['ticker'], skipped['reason']))
         events = True
         
-    if potential:
+    if not potential.empty:
         msg += "\n⏳ **Untriggered Potentials:**\n"
-        for t in potential:
-             msg += f"{t.ticker} Entry: {t.entry_price}\n"
+        msg += "".join(f"{t} Entry: {e}\n" for t, e in zip(potential['ticker'], potential['entry_price']))
         events = True
 
     if events:
+        overall = get_trade_stats(db, 'all')
+        if not overall.empty:
+            o = overall.iloc[0]
+            expectancy = f"{o['avg_r']:+.2f}R" if pd.notna(o['avg_r']) else "n/a"
+            msg += (f"\n📊 **Track Record:** {o['trades']} trades, win rate {o['win_rate']:.1f}%, "
+                    f"expectancy {expectancy}, PnL {o['total_pnl']:.2f}, max DD {o['max_drawdown']:.2f}\n")
         send_alert(msg)
+        
+        # 3. Attach charts for every reported setup (rendered in parallel, unchanged charts reused)
+        alerted = sorted(set(pd.concat([wins['ticker'], losses['ticker'], entries['ticker'], potential['ticker']])))
+        if alerted:
+            from utils.plotter import render_batch
+            try:
+                with instrument.stage("render_charts"):
+                    charts = render_batch(alerted, db=db)
+                for ticker in alerted:
+                    if ticker in charts:
+                        send_chart(charts[ticker], caption=f"{ticker} - SMC ({today})")
+            except Exception as e:
+                print(f"Chart rendering failed: {e}")
     else:
         print("No events to report for EOD.")
         
     db.close()
     print("EOD Cycle Complete.")
 
-if __name__ == "__main__":
+MODES = {
+    "premarket": run_premarket_scan,
+    "intraday": run_intraday_execution,
+    "eod": run_eod_report,
+}
+
+def load_mode(mode):
+    """Imports what `mode` needs and returns its runner."""
+    for module in MODE_IMPORTS[mode]:
+        importlib.import_module(module)
+    return MODES[mode]
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument("--mode", choices=["premarket", "intraday", "eod"], default="intraday", help="Operational mode")
-    args = parser.parse_args()
-    
-    if args.mode == "premarket":
-        run_premarket_scan()
-    elif args.mode == "intraday":
-        run_intraday_execution()
-    elif args.mode == "eod":
-        run_eod_report()
+    parser.add_argument("--mode", choices=list(MODES), default="intraday", help="Operational mode")
+    parser.add_argument("--import-only", action="store_true", help="Load the mode's modules and exit (startup benchmark)")
+    args = parser.parse_args(argv)
+    
+    runner = load_mode(args.mode)
+    if args.import_only:
+        return
+    
+    with instrument.run(f"daily_run.{args.mode}"):
+        try:
+            runner()
+        finally:
+            with instrument.stage("alerts_flush"):
+                close_alerts()
+            # Fold the WAL back into the .db file before it is synced / copied
+            from app.database import checkpoint
+            checkpoint()
+
+if __name__ == "__main__":
+    main()
@@ -48,10 +48,9 @@ def populate_db():
             time.sleep(2) 
             
         # 4. Update Fundamentals
+        # One concurrent, rate-limited pass. Tickers refreshed recently are skipped.
         print("Updating Fundamentals...")
-        for i in range(0, len(all_tickers), chunk_size):
-            chunk = all_tickers[i:i+chunk_size]
-            update_fundamentals(db, chunk)
+        update_fundamentals(db, all_tickers)
         
     finally:
         db.close()
@@ -2,6 +2,8 @@ from backtesting import Backtest
 from app.backtest_strategy import SMCStrategy
 from app.database import get_db, DailyPrice
 import pandas as pd
+from app.corporate_actions import adjust_frame
+from app import instrument
 
 def run_simulation(ticker='TATASTEEL'):
     print(f"Running Backtest for {ticker}...")
@@ -9,7 +11,9 @@ def run_simulation(ticker='TATASTEEL'):
     # Load Data
     db = next(get_db())
     query = db.query(DailyPrice).filter(DailyPrice.ticker == ticker).order_by(DailyPrice.date.asc())
-    df = pd.read_sql(query.statement, db.bind)
+    with instrument.stage("load_data"):
+        df = pd.read_sql(query.statement, db.bind)
+    instrument.count("rows_read", len(df))
     
     if df.empty:
         print("No data.")
@@ -21,10 +25,13 @@ def run_simulation(ticker='TATASTEEL'):
     df = df.rename(columns={
         'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'
     })
+    # Split / bonus adjusted, so corporate actions don't show up as FVGs
+    df = adjust_frame(db, ticker, df)
     
     # Run
     bt = Backtest(df, SMCStrategy, cash=100000, commission=.002)
-    stats = bt.run()
+    with instrument.stage("backtest"):
+        stats = bt.run()
     
     print("\n=== Backtest Results ===")
     print(stats)
@@ -39,4 +46,5 @@ def run_simulation(ticker='TATASTEEL'):
     # print(f"Plot saved to charts/{ticker}_backtest.html")
 
 if __name__ == "__main__":
-    run_simulation()
+    with instrument.run("run_backtest"):
+        run_simulation()
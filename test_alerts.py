@@ -0,0 +1,44 @@
+from app.alerts import AlertDispatcher, coalesce
+
+class Response:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return {}
+
+class FakeSession:
+    """Rejects Markdown requests like Telegram does for a broken entity."""
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, data=None, files=None, timeout=None):
+        self.posts.append(dict(data))
+        if 'parse_mode' in data:
+            return Response(400, '{"ok":false,"description":"Bad Request: can\'t parse entities: Can\'t find end of the entity starting at byte offset 12"}')
+        return Response(200)
+
+    def close(self):
+        pass
+
+def test_coalesce_packs_events_within_the_limit():
+    chunks = coalesce(["a" * 40, "b" * 40, "c" * 40], limit=90)
+    assert chunks == ["a" * 40 + "\n\n" + "b" * 40, "c" * 40]
+
+def test_coalesce_splits_long_lines_on_spaces():
+    words = [f"**W{i}**" for i in range(200)]
+    chunks = coalesce([" ".join(words)], limit=100)
+    assert all(len(c) <= 100 for c in chunks)
+    # No word (or bold entity) is cut in half
+    assert [w for c in chunks for w in c.split()] == words
+
+def test_coalesce_hard_splits_only_without_spaces():
+    chunks = coalesce(["x" * 250], limit=100)
+    assert [len(c) for c in chunks] == [100, 100, 50]
+
+def test_unparseable_markdown_is_resent_as_plain_text():
+    dispatcher = AlertDispatcher(token="t", chat_id="c", base_url="http://stub", backoff=0)
+    dispatcher.session = FakeSession()
+    assert dispatcher._deliver('sendMessage', "🚀 **ENTRY: cut")
+    assert ['parse_mode' in p for p in dispatcher.session.posts] == [True, False]
@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from app.database import Stock, PriceGap, DailyPrice, Signal, ResampledPrice
+from app import backfill
+from app.backfill import coalesce, enqueue, drain, MAX_ATTEMPTS, RETRY_AFTER
+
+class FailingSource:
+    def __init__(self):
+        self.calls = 0
+
+    def equity_history(self, ticker, start, end):
+        self.calls += 1
+        raise ConnectionError("NSE unavailable")
+
+def tail_range(end):
+    return pd.DataFrame({'ticker': ["AAA"], 'start_date': [date(2024, 3, 1)], 'end_date': [end], 'sessions': [3]})
+
+def fail_until_capped(db, source, ranges):
+    for _ in range(MAX_ATTEMPTS + 2):
+        enqueue(db, ranges)
+        drain(db, source=source, rate=0)
+
+def test_coalesce_runs_and_bridge():
+    days = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-11'))
+    missing = np.array([[1, 1, 0, 1, 0, 0, 0, 1, 1, 1],
+                        [0, 0, 0, 0, 0, 0, 0, 0, 0, 1]], dtype=bool)
+    ranges = coalesce(missing, days, ["AAA", "BBB"])
+    assert ranges[['ticker', 'sessions']].values.tolist() == [["AAA", 2], ["AAA", 1], ["AAA", 3], ["BBB", 1]]
+    assert ranges['end_date'].iloc[2] == date(2024, 1, 10)
+
+    bridged = coalesce(missing, days, ["AAA", "BBB"], bridge=1)
+    assert bridged[['ticker', 'start_date', 'end_date']].values.tolist() == [
+        ["AAA", date(2024, 1, 1), date(2024, 1, 4)],
+        ["AAA", date(2024, 1, 8), date(2024, 1, 10)],
+        ["BBB", date(2024, 1, 10), date(2024, 1, 10)],
+    ]
+
+def test_capped_tail_range_is_retried_after_a_new_session(db):
+    db.add(Stock(ticker="AAA", company_name="AAA"))
+    db.commit()
+    source = FailingSource()
+    fail_until_capped(db, source, tail_range(date(2024, 3, 5)))
+    assert source.calls == MAX_ATTEMPTS
+
+    # Next EOD run: the tail range now ends one session later
+    enqueue(db, tail_range(date(2024, 3, 6)))
+    drain(db, source=source, rate=0)
+    assert source.calls == MAX_ATTEMPTS + 1
+
+def test_capped_range_is_retried_after_backoff(db, monkeypatch):
+    class Clock(datetime):
+        now = datetime(2024, 3, 6, 18)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now
+
+    monkeypatch.setattr(backfill, "datetime", Clock)
+    db.add(Stock(ticker="AAA", company_name="AAA"))
+    db.commit()
+    source = FailingSource()
+    hole = pd.DataFrame({'ticker': ["AAA"], 'start_date': [date(2024, 1, 8)], 'end_date': [date(2024, 1, 9)], 'sessions': [2]})
+
+    # One EOD run a day: the daily re-enqueue must not keep the capped range young
+    for _ in range(15):
+        enqueue(db, hole)
+        drain(db, source=source, rate=0)
+        Clock.now += timedelta(days=1)
+    assert source.calls > MAX_ATTEMPTS
+    assert db.query(PriceGap.last_error).scalar() == "NSE unavailable"
+
+class HistorySource:
+    def equity_history(self, ticker, start, end):
+        days = pd.bdate_range(start, end)
+        return pd.DataFrame({'Series': "EQ", 'Date': days.strftime('%d-%b-%Y'), 'OpenPrice': 10.0,
+                             'HighPrice': 11.0, 'LowPrice': 9.0, 'ClosePrice': 10.5, 'TotalTradedQuantity': 100})
+
+def test_filled_hole_drops_derived_rows_after_it(db):
+    db.add(Stock(ticker="AAA", company_name="AAA"))
+    db.add_all([Signal(ticker="AAA", date=d, close=10.0, low=9.0) for d in (date(2024, 1, 5), date(2024, 1, 12))])
+    db.add_all([ResampledPrice(ticker="AAA", timeframe='W', period_start=s, period_end=e, open=10.0, high=11.0,
+                               low=9.0, close=10.5, volume=100)
+                for s, e in ((date(2024, 1, 1), date(2024, 1, 5)), (date(2024, 1, 8), date(2024, 1, 12)))])
+    db.commit()
+    enqueue(db, pd.DataFrame({'ticker': ["AAA"], 'start_date': [date(2024, 1, 8)],
+                              'end_date': [date(2024, 1, 9)], 'sessions': [2]}))
+    drain(db, source=HistorySource(), rate=0)
+
+    assert db.query(DailyPrice).count() == 2
+    assert [d for (d,) in db.query(Signal.date)] == [date(2024, 1, 5)]
+    assert [d for (d,) in db.query(ResampledPrice.period_end)] == [date(2024, 1, 5)]
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from app.database import Stock, DailyPrice
+from app.corporate_actions import record_action, split_factor
+from app.prices import load_price_frame
+from app.panel import OHLCVPanel
+
+def stored_ema(close, length=200):
+    """EMA as app.fetcher stores it (pandas_ta: SMA seed, NaN before it)."""
+    x = pd.Series(close, dtype=float)
+    x.iloc[length - 1] = x.iloc[:length].mean()
+    x.iloc[:length - 1] = np.nan
+    return x.ewm(span=length, adjust=False).mean().to_numpy()
+
+def add_split_history(db, ticker="SPLITCO", before=400, after=60):
+    """Flat 1000 close, then a Rs 10 -> Rs 2 split: 200 after the ex_date."""
+    dates = pd.bdate_range("2022-01-03", periods=before + after).date
+    close = np.r_[np.full(before, 1000.0), np.full(after, 200.0)]
+    ema = stored_ema(close)
+    db.add(Stock(ticker=ticker, company_name=ticker))
+    db.execute(DailyPrice.__table__.insert(), [
+        {'ticker': ticker, 'date': d, 'open': c, 'high': c * 1.01, 'low': c * 0.99, 'close': c,
+         'volume': 1000, 'ema_200': None if np.isnan(e) else float(e)}
+        for d, c, e in zip(dates, close, ema)
+    ])
+    db.commit()
+    record_action(db, ticker, dates[before], split_factor(10, 2))
+    return dates, close
+
+def test_adjusted_ema_follows_adjusted_closes_after_split(db):
+    dates, _ = add_split_history(db)
+    df = load_price_frame(db, "SPLITCO")
+
+    assert np.allclose(df['Close'], 200.0)
+    after = df.index >= pd.Timestamp(dates[400])
+    # Raw EMA 50 bars after the split is ~700; the adjusted one sits on the (flat) adjusted closes
+    assert np.allclose(df.loc[after, 'EMA_200'], 200.0)
+    assert (df.loc[after, 'Close'] >= df.loc[after, 'EMA_200'] - 1e-6).all()
+    assert df['EMA_200'].iloc[:199].isna().all()
+
+def test_panel_adjusts_ema_like_frames(db):
+    add_split_history(db)
+    frame = load_price_frame(db, "SPLITCO")
+    panel_frame = OHLCVPanel.from_db(db).frame("SPLITCO")
+
+    assert np.allclose(panel_frame['EMA_200'].to_numpy(dtype=float), frame['EMA_200'].to_numpy(),
+                       rtol=1e-5, equal_nan=True)
+
+def test_unadjusted_frame_keeps_stored_ema(db):
+    _, close = add_split_history(db)
+    df = load_price_frame(db, "SPLITCO", adjusted=False)
+    assert np.allclose(df['EMA_200'].to_numpy(dtype=float), stored_ema(close), equal_nan=True)
+    assert df['EMA_200'].iloc[-1] > 500
@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+WRITER = """
+import sys
+from app.database import init_db, get_db, Stock
+init_db()
+db = next(get_db())
+db.add_all([Stock(ticker=f"T{i}", company_name="x" * 200) for i in range(int(sys.argv[1]))])
+db.commit()
+"""
+
+def test_writes_through_get_engine_are_checkpointed_at_exit(tmp_path):
+    db_file = tmp_path / "market.db"
+    env = dict(os.environ, MARKET_DB_FILE=str(db_file), PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", WRITER, "0"], cwd=tmp_path, env=env, check=True)
+
+    # Another process (dashboard) holds the DB open, so the writer's exit is not the last close
+    reader = sqlite3.connect(db_file)
+    try:
+        reader.execute("SELECT count(*) FROM stocks").fetchone()
+        subprocess.run([sys.executable, "-c", WRITER, "500"], cwd=tmp_path, env=env, check=True)
+
+        wal = tmp_path / "market.db-wal"
+        assert not wal.exists() or wal.stat().st_size == 0
+        assert reader.execute("SELECT count(*) FROM stocks").fetchone() == (500,)
+    finally:
+        reader.close()
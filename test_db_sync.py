@@ -0,0 +1,87 @@
+import os
+from datetime import date
+import pandas as pd
+import pytest
+from app.database import Base, Stock, DailyPrice, Trade, create_db_engine
+from app import db_sync
+
+def make_db(path):
+    engine = create_db_engine(str(path))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Stock.__table__.insert(), [{'ticker': t, 'company_name': t} for t in ("AAA", "BBB")])
+        conn.execute(DailyPrice.__table__.insert(), [
+            {'ticker': t, 'date': date(2024, 1, d), 'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5, 'volume': 100}
+            for t in ("AAA", "BBB") for d in (1, 2, 3)])
+        conn.execute(Trade.__table__.insert(), [{'ticker': "AAA", 'signal_date': date(2024, 1, 2), 'entry_price': 10.0,
+                                                  'sl_price': 9.0, 'tp_price': 12.0, 'status': "OPEN"}])
+    return engine
+
+def table(path, name, keys):
+    engine = create_db_engine(str(path))
+    df = pd.read_sql_query(f'SELECT * FROM "{name}"', engine).drop(columns='id', errors='ignore')
+    engine.dispose()
+    return df.sort_values(list(keys)).reset_index(drop=True)
+
+def assert_same_data(a, b):
+    for name, keys in (('stocks', ('ticker',)), ('daily_prices', ('ticker', 'date')), ('trades', ('ticker',))):
+        pd.testing.assert_frame_equal(table(a, name, keys), table(b, name, keys))
+
+@pytest.fixture(autouse=True)
+def no_auto_compaction(monkeypatch):
+    # A tiny base would be compacted after every segment
+    monkeypatch.setattr(db_sync, "COMPACT_RATIO", float("inf"))
+
+def segment_rows(path):
+    return {(r['table'], r['op']): len(r['rows']) for r in db_sync._read(path)}
+
+def test_export_writes_only_changed_rows_and_restores(tmp_path):
+    sync_dir, db_file = str(tmp_path / "sync"), tmp_path / "market.db"
+    engine = make_db(db_file)
+    db_sync.export(str(db_file), sync_dir) # First export becomes the base
+
+    # NULL -> value flips the inferred dtype of ema_200 / pnl; only the touched rows may be exported
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE daily_prices SET ema_200 = 10.2 WHERE ticker = 'AAA' AND date >= '2024-01-02'")
+        conn.exec_driver_sql("UPDATE trades SET status = 'CLOSED', exit_price = 12, pnl = 2")
+        conn.exec_driver_sql("DELETE FROM daily_prices WHERE ticker = 'BBB' AND date = '2024-01-03'")
+    engine.dispose()
+    segment = db_sync.export(str(db_file), sync_dir)
+    assert segment_rows(segment) == {('daily_prices', 'upsert'): 2, ('daily_prices', 'delete'): 1,
+                                     ('trades', 'upsert'): 1}
+    assert db_sync.export(str(db_file), sync_dir) is None
+
+    copy = tmp_path / "copy.db"
+    db_sync.restore(str(copy), sync_dir)
+    assert_same_data(db_file, copy)
+
+def test_restore_applies_only_new_segments(tmp_path):
+    sync_dir, db_file, copy = str(tmp_path / "sync"), tmp_path / "market.db", tmp_path / "copy.db"
+    engine = make_db(db_file)
+    db_sync.export(str(db_file), sync_dir)
+    db_sync.restore(str(copy), sync_dir)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE daily_prices SET close = 11.0 WHERE date = '2024-01-03'")
+    engine.dispose()
+    db_sync.export(str(db_file), sync_dir)
+    assert db_sync.restore(str(copy), sync_dir) == 2
+    assert_same_data(db_file, copy)
+
+def test_compact_folds_segments_into_a_new_base(tmp_path):
+    sync_dir, db_file = str(tmp_path / "sync"), tmp_path / "market.db"
+    engine = make_db(db_file)
+    first = db_sync.export(str(db_file), sync_dir)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE stocks SET sector = 'Banks' WHERE ticker = 'BBB'")
+    engine.dispose()
+    db_sync.export(str(db_file), sync_dir)
+
+    base = db_sync.compact(str(db_file), sync_dir)
+    assert not os.path.exists(first) and db_sync._segment_files(sync_dir) == []
+    assert db_sync._base_file(sync_dir) == base
+
+    copy = tmp_path / "copy.db"
+    db_sync.restore(str(copy), sync_dir)
+    assert_same_data(db_file, copy)
+    assert db_sync.export(str(db_file), sync_dir) is None
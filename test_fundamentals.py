@@ -0,0 +1,30 @@
+from app.database import Stock, FundamentalSnapshot
+from app.fundamentals import refresh_fundamentals
+
+PAYLOAD = {'metadata': {'pdSymbolPe': '21.5', 'industry': 'Banks'}}
+
+class Source:
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    def __call__(self, ticker):
+        self.calls.append(ticker)
+        return self.payloads[ticker]
+
+def test_empty_payload_is_not_cached_as_fresh(db):
+    db.add_all([Stock(ticker=t, company_name=t) for t in ("AAA", "BBB")])
+    db.commit()
+
+    source = Source({"AAA": PAYLOAD, "BBB": {}})
+    summary = refresh_fundamentals(db, ["AAA", "BBB"], source=source, rate=0)
+    assert (summary['fetched'], summary['failed']) == (1, 1)
+    assert [s.ticker for s in db.query(FundamentalSnapshot)] == ["AAA"]
+    assert db.get(Stock, "AAA").current_pe == 21.5
+
+    # AAA is fresh, BBB is asked for again
+    source.payloads["BBB"] = PAYLOAD
+    summary = refresh_fundamentals(db, ["AAA", "BBB"], source=source, rate=0)
+    assert source.calls[2:] == ["BBB"]
+    assert summary['skipped'] == 1 and summary['failed'] == 0
+    assert db.get(Stock, "BBB").sector == "Banks"
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime
+import numpy as np
+import pytest
+from app.intraday import BarRing, IntradayStore, IntradayRecorder, BAR_DTYPE, IST
+
+DAY_OPEN = int(datetime(2024, 1, 2, 9, 15, tzinfo=IST).timestamp())
+DAY = datetime(2024, 1, 2).date()
+
+def bars(*rows):
+    return np.array([(t, ts, c, c, c, c, c, c, 1) for t, ts, c in rows], dtype=BAR_DTYPE)
+
+def test_ring_folds_quotes_of_one_bar_into_one_slot():
+    ring = BarRing(60, capacity=4)
+    ring.fold(0, DAY_OPEN + 1, 100.0, 100.0, 100.0, 100.0, 100.0)
+    ring.fold(0, DAY_OPEN + 20, 102.0, 103.0, 99.0, 103.0, 99.0)
+    out = ring.drain()
+    assert len(out) == 1
+    assert (out['open'][0], out['high'][0], out['low'][0], out['close'][0], out['quotes'][0]) == (100, 103, 99, 102, 2)
+    assert len(ring.drain()) == 0
+
+def test_ring_wraps_and_drains_oldest_first():
+    ring = BarRing(60, capacity=3)
+    for minute in range(3):
+        ring.fold(0, DAY_OPEN + 60 * minute, 100.0 + minute, 0, 0, 0, 0)
+    assert ring.full
+    assert ring.drain()['close'].tolist() == [100, 101, 102]
+    assert not ring.full
+
+    # Slots 0 and 1 are reused; the still-open bar in slot 2 is updated in place
+    ring.fold(0, DAY_OPEN + 120, 110.0, 110.0, 110.0, 0, 0)
+    ring.fold(0, DAY_OPEN + 180, 103.0, 0, 0, 0, 0)
+    ring.fold(0, DAY_OPEN + 240, 104.0, 0, 0, 0, 0)
+    out = ring.drain()
+    assert out['ts'].tolist() == [DAY_OPEN + 120, DAY_OPEN + 180, DAY_OPEN + 240]
+    assert out['close'].tolist() == [110, 103, 104]
+
+def test_read_day_keeps_the_last_write_of_each_bar(tmp_path):
+    store = IntradayStore(root=str(tmp_path))
+    store.append(DAY, '1m', bars((0, DAY_OPEN, 100.0), (1, DAY_OPEN, 50.0)))
+    store.append(DAY, '1m', bars((0, DAY_OPEN, 101.0), (0, DAY_OPEN + 60, 102.0)))
+    day = store.read_day(DAY, '1m')
+    assert [(int(b['ticker']), int(b['ts']), float(b['close'])) for b in day] == [
+        (0, DAY_OPEN, 101.0), (0, DAY_OPEN + 60, 102.0), (1, DAY_OPEN, 50.0)]
+
+def three_segments(tmp_path):
+    store = IntradayStore(root=str(tmp_path))
+    store.append(DAY, '1m', bars((0, DAY_OPEN, 100.0)))
+    store.append(DAY, '1m', bars((0, DAY_OPEN, 101.0), (0, DAY_OPEN + 60, 102.0)))
+    store.append(DAY, '1m', bars((0, DAY_OPEN + 60, 103.0)))
+    return store, store.read_day(DAY, '1m')
+
+@pytest.mark.parametrize("step", ["replace", "remove"])
+def test_compact_keeps_bars_when_interrupted(tmp_path, monkeypatch, step):
+    store, expected = three_segments(tmp_path)
+    real = getattr(os, step)
+    calls = []
+    def crash(*args):
+        # Killed on the first os.replace / on the second removal
+        calls.append(args)
+        if step == "replace" or len(calls) == 2:
+            raise OSError("killed")
+        return real(*args)
+    monkeypatch.setattr(os, step, crash)
+    with pytest.raises(OSError):
+        store.compact(DAY)
+    monkeypatch.setattr(os, step, real)
+    assert np.array_equal(store.read_day(DAY, '1m'), expected)
+
+    store.compact(DAY)
+    assert len(store._segments(DAY, '1m')) == 1
+    assert np.array_equal(store.read_day(DAY, '1m'), expected)
+
+def test_recorder_resumes_open_bar_of_an_earlier_run(tmp_path):
+    store = IntradayStore(root=str(tmp_path))
+    first = IntradayRecorder(store=store)
+    first.add_quote("AAA", 100.0, day_high=101.0, day_low=99.0, ts=DAY_OPEN + 5)
+    first.flush()
+
+    # Next cron run, same minute: a new session high was traded between the polls
+    second = IntradayRecorder(store=IntradayStore(root=str(tmp_path)))
+    second.add_quote("AAA", 100.5, day_high=104.0, day_low=99.0, ts=DAY_OPEN + 40)
+    second.flush()
+
+    bar = store.read_day(DAY, '1m')
+    assert len(bar) == 1
+    assert (bar['open'][0], bar['high'][0], bar['low'][0], bar['close'][0], bar['quotes'][0]) == (100, 104, 100, 100.5, 2)
+
+def test_full_ring_is_flushed_before_reuse(tmp_path):
+    store = IntradayStore(root=str(tmp_path))
+    recorder = IntradayRecorder(store=store, capacity=2)
+    for i, ticker in enumerate(["AAA", "BBB", "CCC", "DDD", "EEE"]):
+        recorder.add_quote(ticker, 100.0 + i, day_high=110.0, day_low=90.0, ts=DAY_OPEN + i)
+    recorder.flush()
+    assert sorted(store.read_day(DAY, '1m')['close'].tolist()) == [100, 101, 102, 103, 104]
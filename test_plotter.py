@@ -0,0 +1,29 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from utils.plotter import render_batch, MANIFEST_FILE
+
+def frame(n=30):
+    close = 100 + np.arange(n, dtype=float)
+    return pd.DataFrame({'Open': close - 0.5, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': 1000, 'bullish_ob': False, 'bullish_fvg': False},
+                        index=pd.bdate_range("2024-01-01", periods=n))
+
+def test_failed_chart_does_not_lose_the_batch(tmp_path):
+    out_dir = str(tmp_path)
+    frames = {"AAA": frame(), "BAD": frame().drop(columns='Close'), "CCC": frame()}
+    paths = render_batch(list(frames), frames=frames, out_dir=out_dir, workers=1)
+
+    assert sorted(paths) == ["AAA", "CCC"]
+    assert all(os.path.exists(p) for p in paths.values())
+    with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+        assert sorted(json.load(f)) == ["AAA", "CCC"]
+
+def test_annotated_and_plain_charts_render(tmp_path):
+    annotated = frame()
+    annotated.loc[annotated.index[5], 'bullish_ob'] = True
+    annotated.loc[annotated.index[9], 'bullish_fvg'] = True
+    frames = {"AAA": annotated, "BBB": frame()}
+    paths = render_batch(list(frames), frames=frames, out_dir=str(tmp_path), workers=1)
+    assert sorted(paths) == ["AAA", "BBB"]
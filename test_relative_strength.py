@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from app.database import Stock, DailyPrice, RelativeStrength
+from app.relative_strength import compute_rs_scores, update_rs_table, get_rs_snapshot
+
+class FakeMarket:
+    def __init__(self, nifty):
+        self.nifty = nifty
+
+    def get_nifty_close(self):
+        return self.nifty
+
+def make_panel(n=40, tickers=("AAA", "BBB", "CCC")):
+    rng = np.random.default_rng(3)
+    index = pd.bdate_range("2024-01-01", periods=n)
+    panel = pd.DataFrame({t: 100 * np.cumprod(1 + rng.normal(0, 0.01, n)) for t in tickers}, index=index)
+    nifty = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.005, n)), index=index)
+    return panel, nifty
+
+def store(db, panel):
+    for t in panel.columns:
+        db.add(Stock(ticker=t, company_name=t, sector="Banks" if t != "CCC" else "IT"))
+    db.execute(DailyPrice.__table__.insert(), [
+        {'ticker': t, 'date': d.date(), 'open': c, 'high': c, 'low': c, 'close': c, 'volume': 1}
+        for t in panel.columns for d, c in panel[t].items()])
+    db.commit()
+
+def stored_scores(db):
+    df = pd.read_sql(db.query(RelativeStrength).statement, db.bind)
+    return df.sort_values(['date', 'window', 'ticker']).reset_index(drop=True)
+
+def test_scores_and_ranks():
+    panel, nifty = make_panel()
+    panel.iloc[30, 1] = np.nan # BBB has no bar that day
+    scores = compute_rs_scores(panel, nifty, windows=(5,), sectors={"AAA": "Banks", "BBB": "Banks", "CCC": "IT"})
+
+    day = scores[scores['date'] == panel.index[-1]].set_index('ticker')
+    expected = panel.iloc[-1] / panel.iloc[-6] - 1 - (nifty.iloc[-1] / nifty.iloc[-6] - 1)
+    assert np.allclose(day['rs_score'], expected[day.index])
+    assert sorted(day['rank']) == [1, 2, 3]
+    assert day.loc[expected.idxmax(), 'rank'] == 1
+    assert day.loc["CCC", 'sector_rank'] == 1
+    assert not ((scores['date'] == panel.index[30]) & (scores['ticker'] == "BBB")).any()
+
+def test_incremental_update_matches_full_scoring(db):
+    panel, nifty = make_panel()
+    store(db, panel.iloc[:-3])
+    update_rs_table(db, windows=(5, 20), market=FakeMarket(nifty))
+    db.query(DailyPrice).delete()
+    db.commit()
+    db.execute(DailyPrice.__table__.insert(), [
+        {'ticker': t, 'date': d.date(), 'open': c, 'high': c, 'low': c, 'close': c, 'volume': 1}
+        for t in panel.columns for d, c in panel[t].items()])
+    db.commit()
+    update_rs_table(db, windows=(5, 20), market=FakeMarket(nifty))
+    incremental = stored_scores(db)
+
+    db.query(RelativeStrength).delete()
+    db.commit()
+    update_rs_table(db, windows=(5, 20), market=FakeMarket(nifty))
+    pd.testing.assert_frame_equal(incremental, stored_scores(db))
+
+def test_snapshot_is_empty_when_rs_is_behind_prices(db):
+    panel, nifty = make_panel()
+    store(db, panel.iloc[:-1])
+    update_rs_table(db, windows=(5,), market=FakeMarket(nifty))
+    assert len(get_rs_snapshot(db, window=5)) == 3
+
+    # EOD wrote a new session but the RS update failed
+    db.execute(DailyPrice.__table__.insert(), [
+        {'ticker': t, 'date': panel.index[-1].date(), 'open': c, 'high': c, 'low': c, 'close': c, 'volume': 1}
+        for t, c in panel.iloc[-1].items()])
+    db.commit()
+    assert get_rs_snapshot(db, window=5) == {}
+    assert len(get_rs_snapshot(db, window=5, as_of=panel.index[-2].date())) == 3
@@ -0,0 +1,45 @@
+import pandas as pd
+from app.resampled import htf_zones
+
+def weekly_bars(rows):
+    """(period_start, open, high, low, close) rows -> resampled frame with Friday period_end."""
+    df = pd.DataFrame(rows, columns=['period_start', 'Open', 'High', 'Low', 'Close'])
+    df['period_start'] = pd.to_datetime(df['period_start'])
+    df['period_end'] = df['period_start'] + pd.Timedelta(days=4)
+    df['Volume'] = 1000
+    return df.set_index('period_start')
+
+def test_htf_ob_comes_from_ob_candle_and_confirming_bar():
+    htf = weekly_bars([
+        ('2024-01-01', 11.0, 11.5, 10.0, 11.2),
+        ('2024-01-08', 12.0, 12.5, 10.5, 11.0),
+        ('2024-01-15', 11.0, 13.0, 10.8, 12.8),
+        ('2024-01-22', 14.0, 14.2, 12.0, 12.5), # Bearish OB candle
+        ('2024-01-29', 12.6, 16.0, 12.4, 15.8), # Displacement
+        ('2024-02-05', 15.9, 17.0, 15.0, 16.5), # Low > 14.2: bullish FVG confirms the OB
+        ('2024-02-12', 16.5, 17.2, 16.0, 16.8),
+    ])
+    ob, fvg = htf_zones(htf, 'W')
+
+    assert len(ob) == 1
+    zone = ob.iloc[0]
+    assert zone['available_from'] == pd.Timestamp('2024-02-09')
+    assert zone['W_ob_top'] == 14.2
+    assert zone['W_ob_bottom'] == 12.0
+    assert pd.Timestamp('2024-02-09') in set(fvg['available_from'])
+
+def test_htf_zones_never_available_before_confirmation():
+    htf = weekly_bars([
+        ('2024-01-01', 10.0, 10.5, 9.0, 9.2),   # Bearish
+        ('2024-01-08', 9.3, 12.0, 9.2, 11.8),
+        ('2024-01-15', 11.9, 13.0, 11.0, 12.5), # Low > 10.5
+        ('2024-01-22', 12.5, 12.6, 11.5, 11.6), # Bearish
+        ('2024-01-29', 11.7, 14.0, 11.6, 13.9),
+        ('2024-02-05', 14.0, 15.0, 13.0, 14.8), # Low > 12.6
+    ])
+    ob, _ = htf_zones(htf, 'W')
+    assert len(ob) == 2
+    ends = htf['period_end']
+    for _, zone in ob.iterrows():
+        candle = htf[htf['High'] == zone['W_ob_top']].index[0]
+        assert zone['available_from'] == ends.iloc[htf.index.get_loc(candle) + 2]
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.database import Stock
+from app.rules import DEFAULT_SCREENS, Predicate, Screen, evaluate_screens, explain_failures
+
+STOCKS = [
+    # ticker, sector, current_pe, peg_ratio, quarterly_earnings_growth
+    ("AAA", "Banks", 12.0, 1.2, 0.30),
+    ("BBB", "Banks", None, 0.8, 0.20),
+    ("CCC", "IT", -4.0, None, 0.50),
+    ("DDD", "IT", 0.0, 2.0, None),
+    ("EEE", None, 85.0, 3.5, 0.10),
+    ("FFF", "Energy", 90.5, 0.5, 0.16),
+]
+
+# Every operator, on columns pushed down to SQL
+PREDICATES = [
+    ["current_pe", ">", 0], ["current_pe", ">=", 0], ["current_pe", "<", 85], ["current_pe", "<=", 85],
+    ["current_pe", "==", 12.0], ["current_pe", "!=", 12.0], ["current_pe", "between", [0, 85]],
+    ["sector", "in", ["Banks", "IT"]], ["sector", "!=", "Banks"], ["peg_ratio", "notnull"],
+    ["quarterly_earnings_growth", "isnull"],
+]
+
+@pytest.fixture
+def stocks(db):
+    db.add_all([Stock(ticker=t, company_name=t, sector=s, current_pe=pe, peg_ratio=peg, quarterly_earnings_growth=g)
+                for t, s, pe, peg, g in STOCKS])
+    db.commit()
+    return pd.read_sql(db.query(Stock).statement, db.bind)
+
+@pytest.mark.parametrize("rule", PREDICATES, ids=lambda r: " ".join(map(str, r)))
+def test_mask_matches_sql(db, stocks, rule):
+    predicate = Predicate(*rule)
+    in_sql = {t for (t,) in db.query(Stock.ticker).filter(predicate.to_sql(Stock))}
+    assert set(stocks['ticker'][predicate.evaluate(stocks)]) == in_sql
+
+@pytest.mark.parametrize("name", sorted(DEFAULT_SCREENS))
+def test_pushed_down_screens_match_pandas(db, stocks, name):
+    screen = Screen(name, DEFAULT_SCREENS[name])
+    clauses, residual = screen.sql_filters(Stock)
+    in_sql = pd.read_sql(db.query(Stock).filter(*clauses).statement, db.bind)
+
+    frame = stocks.assign(sector_median_pe=20.0, calc_peg=stocks['peg_ratio'], rs_score=1.0)
+    in_sql = in_sql.merge(frame[['ticker', 'sector_median_pe', 'calc_peg', 'rs_score']], on='ticker')
+    passed = np.ones(len(in_sql), dtype=bool)
+    for p in residual:
+        passed &= p.evaluate(in_sql)
+    expected = frame['ticker'][evaluate_screens(frame, [screen])[name]]
+    assert sorted(in_sql['ticker'][passed]) == sorted(expected)
+
+def test_column_references_and_unknown_columns_stay_in_pandas():
+    assert Predicate("current_pe", "<", "$sector_median_pe").to_sql(Stock) is None
+    assert Predicate("rs_score", ">", 0).to_sql(Stock) is None
+
+def test_evaluate_screens_shares_predicates_and_fails_nulls():
+    df = pd.DataFrame({'pe': [10.0, np.nan, 30.0], 'median': [20.0, 20.0, np.nan]})
+    result = evaluate_screens(df, [Screen("cheap", [["pe", "<", "$median"]]),
+                                   Screen("band", [["pe", ">", 0], ["pe", "<", 25]]),
+                                   Screen("not_ten", [["pe", "!=", 10]])])
+    assert result.to_dict('list') == {'cheap': [True, False, False], 'band': [True, False, False],
+                                      'not_ten': [False, False, True]}
+
+def test_explain_failures_reports_first_failing_predicate(stocks):
+    reasons = explain_failures(stocks, DEFAULT_SCREENS["value_growth"][:1] + [["peg_ratio", "<", 2.0]])
+    assert dict(zip(stocks['ticker'], reasons)) == {
+        "AAA": None, "BBB": "current_pe > 0", "CCC": "current_pe > 0", "DDD": "current_pe > 0",
+        "EEE": "peg_ratio < 2.0", "FFF": None,
+    }
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        Predicate("current_pe", "~", 1)
+    with pytest.raises(ValueError):
+        Predicate("current_pe", "between", [1])
@@ -0,0 +1,29 @@
+from app.database import Stock, SectorStats
+from app.screener import refresh_sector_stats, load_screener_frame, GLOBAL_SECTOR
+
+def add_stocks(db, rows):
+    db.add_all([Stock(ticker=t, company_name=t, sector=s, current_pe=pe) for t, s, pe in rows])
+    db.commit()
+
+def test_stocks_added_outside_fundamentals_refresh_update_the_medians(db):
+    add_stocks(db, [("A", "Banks", 10.0), ("B", "Banks", 20.0), ("C", "IT", 30.0)])
+    refresh_sector_stats(db)
+
+    # e.g. a DB sync restore: no fundamentals refresh runs
+    add_stocks(db, [("D", "Banks", 40.0), ("E", "Pharma", 50.0)])
+    df = load_screener_frame(db).set_index('ticker')
+
+    assert df.loc["A", 'sector_median_pe'] == 20.0
+    assert df.loc["E", 'sector_median_pe'] == 50.0
+    assert db.get(SectorStats, GLOBAL_SECTOR).stock_count == 5
+
+def test_fresh_sector_stats_are_not_rebuilt(db):
+    add_stocks(db, [("A", "Banks", 10.0), ("B", None, None)])
+    refresh_sector_stats(db)
+    stamp = db.get(SectorStats, GLOBAL_SECTOR).updated_at
+
+    # A stock without PE (backfill.ensure_stocks) does not change any median
+    add_stocks(db, [("C", "Unknown", None)])
+    load_screener_frame(db)
+    db.expire_all()
+    assert db.get(SectorStats, GLOBAL_SECTOR).updated_at == stamp
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from app.database import Stock, DailyPrice, Signal
+from app import signals
+from app.signals import update_signals
+
+def add_bars(db, ticker, dates, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 2, len(dates)))
+    if db.get(Stock, ticker) is None:
+        db.add(Stock(ticker=ticker, company_name=ticker))
+    db.execute(DailyPrice.__table__.insert(), [
+        {'ticker': ticker, 'date': d, 'open': c - 0.5, 'high': c + 1.5, 'low': c - 1.5, 'close': c, 'volume': 1000}
+        for d, c in zip(dates, close)
+    ])
+    db.commit()
+
+def stored_signals(db, ticker):
+    df = pd.read_sql(db.query(Signal).filter(Signal.ticker == ticker).order_by(Signal.date).statement, db.bind)
+    return df.drop(columns='rs_5').reset_index(drop=True)
+
+def test_incremental_signals_match_full_rebuild(db):
+    dates = pd.bdate_range("2024-01-01", periods=80).date
+    add_bars(db, "AAA", dates[:70])
+    update_signals(db)
+    db.query(DailyPrice).filter(DailyPrice.ticker == "AAA").delete()
+    add_bars(db, "AAA", dates)
+    update_signals(db)
+    incremental = stored_signals(db, "AAA")
+    assert len(incremental) == len(dates)
+
+    db.query(Signal).delete()
+    db.commit()
+    update_signals(db)
+    pd.testing.assert_frame_equal(incremental, stored_signals(db, "AAA"))
+
+def test_rewritten_last_bar_is_recomputed(db):
+    dates = pd.bdate_range("2024-01-01", periods=40).date
+    add_bars(db, "AAA", dates)
+    update_signals(db)
+
+    # Same date, new content (partial bar refreshed at EOD)
+    db.query(DailyPrice).filter(DailyPrice.ticker == "AAA", DailyPrice.date == dates[-1]).update(
+        {'close': 123.45, 'low': 120.0})
+    db.commit()
+    update_signals(db)
+
+    last = db.query(Signal).filter(Signal.ticker == "AAA", Signal.date == dates[-1]).one()
+    assert last.close == 123.45
+    assert last.low == 120.0
+
+def test_failed_ticker_keeps_its_rows(db, monkeypatch):
+    dates = pd.bdate_range("2024-01-01", periods=40).date
+    add_bars(db, "AAA", dates)
+    add_bars(db, "BBB", dates, seed=8)
+    update_signals(db)
+    before = stored_signals(db, "AAA")
+
+    build = signals.build_signal_rows
+    def failing(ticker, df, bar_offset=0):
+        rows = build(ticker, df, bar_offset)
+        if ticker == "AAA":
+            rows['close'] = "not a number" # Insert fails after the delete
+        return rows
+    monkeypatch.setattr(signals, "build_signal_rows", failing)
+    update_signals(db)
+
+    pd.testing.assert_frame_equal(before, stored_signals(db, "AAA"))
+    assert db.query(Signal).filter(Signal.ticker == "BBB").count() == len(dates)
@@ -0,0 +1,13 @@
+import pytest
+from app.sources import MarketSource, LiveSource
+
+def test_incomplete_source_fails_at_instantiation():
+    class QuoteOnly(MarketSource):
+        def quote(self, ticker):
+            return {}
+
+    with pytest.raises(TypeError, match="abstract"):
+        QuoteOnly()
+
+def test_live_source_implements_every_call():
+    assert LiveSource().name == "live"
@@ -0,0 +1,61 @@
+from datetime import date
+import pandas as pd
+from app.database import Stock, Trade, TradeStat
+from app.trade_stats import refresh_trade_stats, get_trade_stats, DIMENSIONS
+
+STOCKS = {"AAA": "Energy", "BBB": "Banks", "CCC": "Energy"}
+
+def add_trades(db, rows):
+    for ticker, sector in STOCKS.items():
+        if db.get(Stock, ticker) is None:
+            db.add(Stock(ticker=ticker, company_name=ticker, sector=sector))
+    for ticker, exit_date, pnl in rows:
+        db.add(Trade(ticker=ticker, signal_date=exit_date, entry_date=exit_date, entry_price=100.0,
+                     sl_price=95.0, tp_price=110.0, status="CLOSED", outcome="WIN" if pnl > 0 else "LOSS",
+                     exit_date=exit_date, exit_price=100.0 + pnl, pnl=pnl))
+    db.commit()
+
+def all_stats(db):
+    frames = [get_trade_stats(db, d).drop(columns=['id', 'updated_at'], errors='ignore') for d in DIMENSIONS]
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(['dimension', 'key']).reset_index(drop=True)
+
+def assert_matches_full_rebuild(db):
+    incremental = all_stats(db)
+    refresh_trade_stats(db, full=True)
+    pd.testing.assert_frame_equal(incremental, all_stats(db))
+
+def test_incremental_refresh_matches_full_rebuild(db):
+    add_trades(db, [("AAA", date(2024, 1, 3), 10.0), ("BBB", date(2024, 1, 10), -5.0),
+                    ("CCC", date(2024, 2, 1), 4.0)])
+    refresh_trade_stats(db)
+
+    # Same exit day as the watermark, a new month and a new exit reason for an old ticker
+    add_trades(db, [("AAA", date(2024, 2, 1), -5.0), ("BBB", date(2024, 3, 4), 8.0)])
+    written = refresh_trade_stats(db)
+    assert 0 < written < len(all_stats(db))
+    assert_matches_full_rebuild(db)
+
+def test_nothing_new_writes_nothing(db):
+    add_trades(db, [("AAA", date(2024, 1, 3), 10.0)])
+    refresh_trade_stats(db)
+    assert refresh_trade_stats(db) == 0
+
+def test_trade_closed_before_last_exit_is_counted(db):
+    add_trades(db, [("AAA", date(2024, 1, 3), 10.0), ("BBB", date(2024, 2, 1), -5.0)])
+    refresh_trade_stats(db)
+
+    add_trades(db, [("CCC", date(2024, 1, 15), 6.0)])
+    refresh_trade_stats(db)
+    assert db.query(TradeStat).filter(TradeStat.dimension == 'ticker', TradeStat.key == 'CCC').count() == 1
+    assert_matches_full_rebuild(db)
+
+def test_removed_trade_drops_its_groups(db):
+    add_trades(db, [("AAA", date(2024, 1, 3), 10.0), ("BBB", date(2024, 2, 1), -5.0)])
+    refresh_trade_stats(db)
+
+    db.query(Trade).filter(Trade.ticker == "BBB").delete()
+    db.commit()
+    refresh_trade_stats(db)
+    assert get_trade_stats(db, 'ticker')['key'].tolist() == ["AAA"]
+    assert_matches_full_rebuild(db)
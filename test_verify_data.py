@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from app.database import Stock, DailyPrice, Signal
+from verify_data import reconcile, repair, load_db_prices, verify_integrity
+
+def ema_indicators(ticker, df):
+    """Stand-in for fetcher.process_stock_data."""
+    df['EMA_20'] = df['Close'].ewm(span=20, adjust=False).mean()
+    return df
+
+def setup_prices(db, n=120):
+    dates = pd.bdate_range("2024-01-01", periods=n).date
+    close = 100 + np.arange(n, dtype=float)
+    db.add(Stock(ticker="AAA", company_name="AAA"))
+    db.execute(DailyPrice.__table__.insert(), [
+        {'ticker': "AAA", 'date': d, 'open': c, 'high': c + 1, 'low': c - 1, 'close': c, 'volume': 100}
+        for d, c in zip(dates, close)
+    ])
+    db.execute(Signal.__table__.insert(), [{'ticker': "AAA", 'date': d, 'close': c} for d, c in zip(dates, close)])
+    db.commit()
+    return dates, close
+
+def stored(db):
+    return pd.read_sql(db.query(DailyPrice).filter(DailyPrice.ticker == "AAA").order_by(DailyPrice.date).statement,
+                       db.bind)
+
+def test_repair_recomputes_indicators_and_drops_signals(db):
+    dates, close = setup_prices(db)
+    reference = pd.DataFrame({'ticker': "AAA", 'date': dates, 'open': close, 'high': close + 1,
+                              'low': close - 1, 'close': close, 'volume': 100.0})
+    bad_day = 80
+    reference.loc[bad_day, ['close', 'high']] = [150.0, 151.0]
+
+    mismatches = reconcile(load_db_prices(db, ["AAA"], dates[0], dates[-1]), reference)
+    assert mismatches['status'].tolist() == ['mismatch']
+    repair(db, mismatches, indicators=ema_indicators)
+
+    df = stored(db)
+    assert df['close'].iloc[bad_day] == 150.0
+    expected = pd.Series(reference['close']).ewm(span=20, adjust=False).mean()
+    # Indicators from the repaired bar on (including every later EMA) follow the new closes
+    assert np.allclose(df['ema_20'].iloc[bad_day:], expected.iloc[bad_day:])
+    assert df['ema_20'].iloc[:bad_day].isna().all()
+
+    kept = [d for (d,) in db.query(Signal.date).filter(Signal.ticker == "AAA")]
+    assert max(kept) < dates[bad_day] and len(kept) == bad_day
+
+def test_bhavcopy_is_compared_on_its_own_sessions(db, tmp_path):
+    dates, close = setup_prices(db)
+    day = 10
+    path = tmp_path / "cm15JAN2024bhav.csv"
+    pd.DataFrame({'SYMBOL': ["AAA"], 'SERIES': ["EQ"], 'OPEN': [close[day]], 'HIGH': [close[day] + 1],
+                  'LOW': [close[day] - 1], 'CLOSE': [close[day] * 1.02], 'TOTTRDQTY': [100],
+                  'TIMESTAMP': [dates[day].strftime('%d-%b-%Y').upper()]}).to_csv(path, index=False)
+
+    # A file months old, one session: no other DB bar is reported, nothing is "missing"
+    mismatches = verify_integrity(tickers=["AAA"], bhavcopy=[str(path)], db=db)
+    assert mismatches[['status', 'date']].values.tolist() == [['mismatch', dates[day]]]
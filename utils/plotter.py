@@ -1,17 +1,32 @@
+import matplotlib
+# Charts are only ever written to files. Agg is the fastest backend and is safe in worker processes.
+matplotlib.use("Agg")
 import mplfinance as mpf
 import pandas as pd
 import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
-def plot_ticker_smc(ticker, df):
+# Bars shown on a chart
+PLOT_BARS = 100
+
+# Columns that change what a chart looks like (used for the content hash)
+HASH_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'bullish_ob', 'bullish_fvg']
+
+MANIFEST_FILE = ".manifest.json"
+
+def plot_ticker_smc(ticker, df, out_dir="charts"):
     """
     Plots the candlestick chart with SMC annotations.
+    Returns the path of the saved PNG.
     """
     # Ensure index is Datetime
     if not isinstance(df.index, pd.DatetimeIndex):
         df.index = pd.to_datetime(df.index)
         
     # Filter last 100 candles for clarity
-    plot_df = df.tail(100)
+    plot_df = df.tail(PLOT_BARS)
     
     # Create AddPlots
     apds = []
@@ -43,8 +58,8 @@ def plot_ticker_smc(ticker, df):
     # Style
     style = mpf.make_mpf_style(base_mpf_style='yahoo', rc={'font.size': 10})
     
-    filename = f"charts/{ticker}_smc.png"
-    os.makedirs("charts", exist_ok=True)
+    filename = os.path.join(out_dir, f"{ticker}_smc.png")
+    os.makedirs(out_dir, exist_ok=True)
     
     print(f"Generating chart for {ticker}...")
     mpf.plot(
@@ -52,8 +67,100 @@ def plot_ticker_smc(ticker, df):
         type='candle',
         style=style,
         title=f"{ticker} - SMC Analysis",
-        addplot=apds if apds else None,
         volume=True,
-        savefig=filename
+        savefig=filename,
+        # mplfinance rejects addplot=None: only pass it when there is something to overlay
+        **({'addplot': apds} if apds else {})
     )
     print(f"Saved chart to {filename}")
+    return filename
+
+def chart_hash(ticker, df):
+    """Content hash of what the chart would show: last PLOT_BARS bars and their annotations."""
+    plot_df = df.tail(PLOT_BARS)
+    cols = [c for c in HASH_COLUMNS if c in plot_df.columns]
+    digest = hashlib.sha1(ticker.encode())
+    digest.update(pd.util.hash_pandas_object(plot_df[cols], index=True).values.tobytes())
+    return digest.hexdigest()
+
+def _load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(out_dir, manifest):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+def _render_one(args):
+    """(ticker, png path), or (ticker, None) if this ticker's chart could not be drawn."""
+    ticker, plot_df, out_dir = args
+    try:
+        return ticker, plot_ticker_smc(ticker, plot_df, out_dir=out_dir)
+    except Exception as e:
+        print(f"Chart failed for {ticker}: {e}")
+        return ticker, None
+
+def render_batch(tickers, db=None, frames=None, out_dir="charts", workers=None):
+    """
+    Renders SMC charts for many tickers in a process pool.
+
+    Frames come from `frames` ({ticker: annotated df}) or are loaded from the DB and
+    analyzed here. Tickers whose last PLOT_BARS bars + annotations hash to the image
+    already on disk are skipped.
+
+    Returns {ticker: png path} for every ticker that has a chart (fresh or reused); a
+    ticker whose chart fails is left out, the rest of the batch still renders.
+    """
+    from app.smc_agent import analyze_ticker
+    from app.prices import load_recent_price_frame
+
+    frames = dict(frames or {})
+    manifest = _load_manifest(out_dir)
+    paths, jobs, hashes = {}, [], {}
+
+    for ticker in tickers:
+        df = frames.get(ticker)
+        if df is None:
+            if db is None:
+                continue
+            # 20 extra bars give the SMC windows context at the left edge
+            df = load_recent_price_frame(db, ticker, PLOT_BARS + 20)
+            if df.empty:
+                continue
+            _, df = analyze_ticker(ticker, df)
+
+        plot_df = df.tail(PLOT_BARS)
+        h = chart_hash(ticker, plot_df)
+        filename = os.path.join(out_dir, f"{ticker}_smc.png")
+
+        if manifest.get(ticker) == h and os.path.exists(filename):
+            paths[ticker] = filename
+            continue
+
+        hashes[ticker] = h
+        jobs.append((ticker, plot_df, out_dir))
+
+    print(f"Charts: {len(jobs)} to render, {len(paths)} unchanged.")
+
+    if jobs:
+        if workers == 1 or len(jobs) == 1:
+            results = [_render_one(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_render_one, jobs))
+
+        for ticker, filename in results:
+            if filename is None:
+                continue
+            paths[ticker] = filename
+            manifest[ticker] = hashes[ticker]
+        _save_manifest(out_dir, manifest)
+
+    return paths
@@ -0,0 +1,108 @@
+"""
+Local stand-in for the Telegram Bot API, for tests and load runs of app.alerts.
+
+    python -m utils.telegram_stub --port 8081 --latency 0.3 --fail-rate 0.1
+    TELEGRAM_API_URL=http://127.0.0.1:8081 TELEGRAM_TOKEN=x TELEGRAM_CHAT_ID=1 python daily_run.py --mode=intraday
+
+Or in-process:
+
+    with TelegramStub(latency=0.2) as stub:
+        dispatcher = AlertDispatcher("x", "1", base_url=stub.url)
+        ...
+        stub.messages  # received texts
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+class TelegramStub:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, max_len=4096, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_len = max_len
+        self.messages = []
+        self.photos = 0
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    fail = stub._rng.random() < stub.fail_rate
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if fail:
+                    return self._reply(500, {"ok": False, "description": "Injected failure"})
+
+                method = self.path.rsplit("/", 1)[-1]
+                if method == "sendMessage":
+                    text = parse_qs(body.decode()).get("text", [""])[0]
+                    if len(text) > stub.max_len:
+                        return self._reply(400, {"ok": False, "description": "Bad Request: message is too long"})
+                    with stub._lock:
+                        stub.messages.append(text)
+                elif method == "sendPhoto":
+                    with stub._lock:
+                        stub.photos += 1
+                else:
+                    return self._reply(404, {"ok": False, "description": "Not Found"})
+                self._reply(200, {"ok": True, "result": {}})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    stub = TelegramStub(port=args.port, latency=args.latency, fail_rate=args.fail_rate)
+    print(f"Telegram stub listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
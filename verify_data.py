@@ -1,93 +1,285 @@
+"""
+Reconciles daily_prices against reference data for the whole universe.
+
+Reference bars come from the market source (concurrent equity_history calls behind one
+shared RateLimiter) or from NSE bhavcopy CSV files (--bhavcopy, old or new UDiFF layout).
+Reference and DB rows are aligned on (ticker, date) in one outer merge and all
+open / high / low / close deviations are computed column-wise. With --bhavcopy only the
+sessions the files cover are compared (--days is ignored).
+
+Output is a mismatch table, one row per problem:
+    mismatch        both sides have the bar, some field deviates by more than --tolerance
+    missing_in_db   reference has a bar the DB lacks
+    missing_in_ref  DB has a bar the reference lacks (holiday / bad date)
+
+--repair overwrites mismatching DB bars with the reference OHLCV and inserts missing ones,
+then recomputes each repaired ticker's indicators from its earliest repaired bar and drops
+the signals / resampled bars built on the old prices (the next EOD run rebuilds them).
+
+Run: python verify_data.py [--days 30] [--tickers A B ...] [--repair] [--output mismatches.csv]
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+import numpy as np
 import pandas as pd
+from sqlalchemy import bindparam
 from app.database import get_db, Stock, DailyPrice
-from nselib import capital_market
-from datetime import date, timedelta
-import time
-
-def verify_integrity():
-    db = next(get_db())
-    stocks = db.query(Stock).all()
-    tickers = [s.ticker for s in stocks]
-    
-    print(f"Verifying data for {len(tickers)} stocks...")
-    
-    issues_found = []
-    
-    today = date.today()
-    start_check = today - timedelta(days=5) # Check last 5 days
-    from_str = start_check.strftime("%d-%m-%Y")
-    to_str = today.strftime("%d-%m-%Y")
-    
-    # We will fetch a batch of 'reference' data
-    # Ideally we do this ticker by ticker or use a bulk method if available.
-    # nselib is per ticker.
-    
-    for ticker in tickers[:10]: # Check first 10 for quick sanity, then maybe more
-        print(f"Checking {ticker}...")
-        try:
-            # Fetch Reference Data
-            ref_data = capital_market.price_volume_and_deliverable_position_data(symbol=ticker, from_date=from_str, to_date=to_str)
-            if ref_data is None or ref_data.empty:
-                print(f"   No reference data for {ticker}")
+from app.sources import get_source
+from app.fundamentals import RateLimiter
+from app.backfill import _update_indicators
+from app.corporate_actions import invalidate_derived
+from app import instrument
+
+FIELDS = ['open', 'high', 'low', 'close']
+
+# Relative deviation that counts as a mismatch (0.5%, as before)
+TOLERANCE = 0.005
+
+DEFAULT_WORKERS = 8
+HISTORY_RATE = float(os.getenv("NSE_HISTORY_RATE", "1.0"))
+
+# bhavcopy layouts -> reference columns
+BHAVCOPY_COLUMNS = [
+    # Old cm<DD><MON><YYYY>bhav.csv
+    {'SYMBOL': 'ticker', 'SERIES': 'series', 'TIMESTAMP': 'date', 'OPEN': 'open', 'HIGH': 'high',
+     'LOW': 'low', 'CLOSE': 'close', 'TOTTRDQTY': 'volume'},
+    # UDiFF BhavCopy_NSE_CM_..._F_0000.csv
+    {'TckrSymb': 'ticker', 'SctySrs': 'series', 'TradDt': 'date', 'OpnPric': 'open', 'HghPric': 'high',
+     'LwPric': 'low', 'ClsPric': 'close', 'TtlTradgVol': 'volume'},
+]
+
+def _to_float(col):
+    return pd.to_numeric(col.astype(str).str.replace(',', '', regex=False), errors='coerce')
+
+def normalize_reference(data):
+    """nselib equity history frame(s) -> ticker, date, open, high, low, close, volume (EQ series only)."""
+    if 'Series' in data.columns:
+        data = data[data['Series'] == 'EQ']
+    ref = pd.DataFrame({
+        'ticker': data['Symbol'].astype(str).str.strip().values,
+        'date': pd.to_datetime(data['Date'], format='%d-%b-%Y').dt.date.values,
+    })
+    for field, col in zip(FIELDS + ['volume'], ['OpenPrice', 'HighPrice', 'LowPrice', 'ClosePrice', 'TotalTradedQuantity']):
+        ref[field] = _to_float(data[col]).values
+    return ref.dropna(subset=['close'])
+
+def load_bhavcopy(paths, tickers=None):
+    """Reference bars from NSE bhavcopy CSVs (one file per trading day, all symbols)."""
+    frames = []
+    for path in paths:
+        raw = pd.read_csv(path)
+        raw.columns = raw.columns.str.strip()
+        mapping = next((m for m in BHAVCOPY_COLUMNS if set(m) <= set(raw.columns)), None)
+        if mapping is None:
+            print(f"Unrecognised bhavcopy layout: {path}")
+            continue
+        df = raw[list(mapping)].rename(columns=mapping)
+        df = df[df['series'].astype(str).str.strip() == 'EQ'].drop(columns='series')
+        df['ticker'] = df['ticker'].astype(str).str.strip()
+        df['date'] = pd.to_datetime(df['date'], format='mixed', dayfirst=True).dt.date
+        for c in FIELDS + ['volume']:
+            df[c] = _to_float(df[c])
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['ticker', 'date'] + FIELDS + ['volume'])
+    ref = pd.concat(frames, ignore_index=True)
+    if tickers is not None:
+        ref = ref[ref['ticker'].isin(tickers)]
+    return ref
+
+def fetch_reference(tickers, start, end, source=None, workers=DEFAULT_WORKERS, rate=HISTORY_RATE):
+    """Reference bars for all tickers, fetched concurrently. Returns (frame, {ticker: error})."""
+    source = source or get_source()
+    limiter = RateLimiter(rate)
+
+    def fetch(ticker):
+        limiter.wait()
+        return source.equity_history(ticker, start, end)
+
+    frames, errors = [], {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch, t): t for t in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                errors[ticker] = e
                 continue
-                
-            # Clean Reference Data
-            cols = ['OpenPrice', 'HighPrice', 'LowPrice', 'ClosePrice', 'Date']
-            # Adjust for different column names in nselib return
-            if 'ClosePrice' not in ref_data.columns:
-                 # fallback for missing cols?
-                 pass
-            
-            # Helper to parse Price
-            def clean_price(v):
-                return float(str(v).replace(',', ''))
-
-            ref_map = {}
-            for _, row in ref_data.iterrows():
-                try:
-                    d_str = row['Date']
-                    d_obj = pd.to_datetime(d_str, format='%d-%b-%Y').date()
-                    ref_map[d_obj] = {
-                        'High': clean_price(row['HighPrice']),
-                        'Low': clean_price(row['LowPrice']),
-                        'Close': clean_price(row['ClosePrice'])
-                    }
-                except: continue
-
-            # Fetch DB Data
-            db_recs = db.query(DailyPrice).filter(
-                DailyPrice.ticker == ticker, 
-                DailyPrice.date >= start_check
-            ).all()
-            
-            for rec in db_recs:
-                if rec.date in ref_map:
-                    ref = ref_map[rec.date]
-                    
-                    # Check for discrepancies (allow small rounding diff)
-                    diff_close = abs(rec.close - ref['Close'])
-                    diff_high = abs(rec.high - ref['High'])
-                    
-                    # Threshold: 0.5% or 0.5 absolute (handle rounding)
-                    if diff_close > (rec.close * 0.005) or diff_high > (rec.high * 0.005):
-                        err = f"MISMATCH {ticker} on {rec.date}: DB Close={rec.close}, Ref Close={ref['Close']}"
-                        print(f"   ❌ {err}")
-                        issues_found.append(err)
-                    else:
-                        # print(f"   ✅ {rec.date} OK")
-                        pass
-                else:
-                    print(f"   ⚠️ {ticker} has date {rec.date} in DB but not in Reference (Holiday/weekend?)")
-
-        except Exception as e:
-            print(f"   Error verifying {ticker}: {e}")
-            
-    if issues_found:
-        print("\n\nSUMMARY OF ISSUES:")
-        for i in issues_found:
-            print(i)
+            if data is not None and not data.empty:
+                frames.append(data)
+
+    if not frames:
+        return pd.DataFrame(columns=['ticker', 'date'] + FIELDS + ['volume']), errors
+    # One parse for the whole universe
+    return normalize_reference(pd.concat(frames, ignore_index=True)), errors
+
+def load_db_prices(db, tickers, start, end, dates=None):
+    """DB bars of `tickers` in [start, end], optionally only on `dates` (the sessions a bhavcopy covers)."""
+    query = db.query(DailyPrice.id, DailyPrice.ticker, DailyPrice.date, DailyPrice.open, DailyPrice.high,
+                     DailyPrice.low, DailyPrice.close, DailyPrice.volume).filter(
+        DailyPrice.date >= start, DailyPrice.date <= end)
+    df = pd.read_sql(query.statement, db.bind)
+    instrument.count("rows_read", len(df))
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    keep = df['ticker'].isin(tickers)
+    if dates is not None:
+        keep &= df['date'].isin(dates)
+    return df[keep]
+
+@instrument.timed("reconcile")
+def reconcile(db_prices, reference, tolerance=TOLERANCE, skip_tickers=()):
+    """
+    Outer-joins DB and reference bars on (ticker, date) and returns the problem rows:
+    ticker, date, status, id (DB row), db_* / ref_* values, max_dev (largest relative deviation)
+    and fields (the deviating ones). Tickers in `skip_tickers` (no reference) are left out.
+    """
+    merged = db_prices.merge(reference, on=['ticker', 'date'], how='outer',
+                             suffixes=('_db', '_ref'), indicator=True)
+    merged = merged[~merged['ticker'].isin(skip_tickers)]
+
+    db_vals = merged[[f'{f}_db' for f in FIELDS]].to_numpy(dtype=float)
+    ref_vals = merged[[f'{f}_ref' for f in FIELDS]].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dev = np.abs(db_vals - ref_vals) / np.abs(ref_vals)
+    bad = np.nan_to_num(dev, nan=0.0) > tolerance
+
+    both = (merged['_merge'] == 'both').to_numpy()
+    status = np.select(
+        [both & bad.any(axis=1), merged['_merge'].to_numpy() == 'right_only', merged['_merge'].to_numpy() == 'left_only'],
+        ['mismatch', 'missing_in_db', 'missing_in_ref'], default='ok')
+
+    names = np.array(FIELDS)
+    out = merged.assign(
+        status=status,
+        max_dev=np.where(both, np.nan_to_num(dev, nan=0.0).max(axis=1), np.nan),
+        fields=[",".join(names[row]) for row in bad],
+    )
+    out = out[out['status'] != 'ok'].drop(columns='_merge')
+    out = out.rename(columns={f'{f}_db': f'db_{f}' for f in FIELDS + ['volume']})
+    out = out.rename(columns={f'{f}_ref': f'ref_{f}' for f in FIELDS + ['volume']})
+    return out.sort_values(['status', 'ticker', 'date']).reset_index(drop=True)
+
+def repair(db, mismatches, indicators=None):
+    """
+    Writes reference OHLCV over mismatching bars and inserts bars missing from the DB.
+    `indicators(ticker, df) -> df` (fetcher.process_stock_data) recomputes RSI / EMA columns
+    from each ticker's earliest repaired bar on; derived signals / resampled rows from that
+    date are dropped.
+    """
+    cols = FIELDS + ['volume']
+    fix = mismatches[mismatches['status'] == 'mismatch']
+    add = mismatches[mismatches['status'] == 'missing_in_db']
+
+    def records(df, keys):
+        df = df[keys + [f'ref_{c}' for c in cols]].rename(columns={f'ref_{c}': c for c in cols})
+        df['volume'] = df['volume'].fillna(0).astype('int64')
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+    updates = records(fix.assign(_id=fix['id'].astype('int64')), ['_id'])
+    inserts = records(add, ['ticker', 'date'])
+
+    try:
+        if updates:
+            table = DailyPrice.__table__
+            db.execute(table.update().where(table.c.id == bindparam('_id')).values(
+                **{c: bindparam(c) for c in cols}), updates)
+        if inserts:
+            # Tickers must exist in stocks (foreign key)
+            known = {t for (t,) in db.query(Stock.ticker)}
+            db.add_all([Stock(ticker=t, company_name=t, sector="Unknown")
+                        for t in sorted({r['ticker'] for r in inserts} - known)])
+            db.flush()
+            db.execute(DailyPrice.__table__.insert(), inserts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    instrument.count("rows_written", len(updates) + len(inserts))
+    print(f"Repaired {len(updates)} bars, inserted {len(inserts)} missing bars.")
+
+    # Later EMAs depend on the repaired closes too: recompute from the earliest repaired bar
+    earliest = pd.concat([fix, add])[['ticker', 'date']].groupby('ticker')['date'].min()
+    try:
+        for ticker, from_date in earliest.items():
+            if indicators is not None:
+                _update_indicators(db, ticker, from_date, indicators)
+            invalidate_derived(db, ticker, from_date)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if indicators is not None:
+        print(f"Indicators recomputed for {len(earliest)} tickers.")
+    return len(updates), len(inserts)
+
+def verify_integrity(days=30, tickers=None, bhavcopy=None, workers=DEFAULT_WORKERS, rate=HISTORY_RATE,
+                     tolerance=TOLERANCE, fix=False, output=None, source=None, db=None):
+    db = db or next(get_db())
+    if tickers is None:
+        tickers = [t for (t,) in db.query(Stock.ticker)]
+
+    end = date.today()
+    start = end - timedelta(days=days)
+    sessions = None
+
+    with instrument.stage("load_reference"):
+        if bhavcopy:
+            # The files decide the window: only the sessions they cover are compared
+            reference, errors = load_bhavcopy(bhavcopy, tickers), {}
+            sessions = set(reference['date'])
+            if sessions:
+                start, end = min(sessions), max(sessions)
+            print(f"Verifying {len(tickers)} stocks on {len(sessions)} bhavcopy sessions from {start} to {end}...")
+        else:
+            print(f"Verifying {len(tickers)} stocks from {start} to {end}...")
+            reference, errors = fetch_reference(tickers, start, end, source=source, workers=workers, rate=rate)
+    for ticker, e in errors.items():
+        print(f"   Error fetching reference for {ticker}: {e}")
+
+    with instrument.stage("load_db"):
+        db_prices = load_db_prices(db, tickers, start, end, dates=sessions)
+
+    # No reference at all for a ticker says nothing about its DB rows
+    no_reference = set(tickers) - set(reference['ticker'])
+    mismatches = reconcile(db_prices, reference, tolerance, skip_tickers=no_reference)
+
+    counts = mismatches['status'].value_counts().to_dict()
+    print(f"\nChecked {len(db_prices)} DB bars against {len(reference)} reference bars "
+          f"({len(no_reference)} tickers without reference).")
+    if mismatches.empty:
+        print("✅ Data integrity check passed.")
     else:
-        print("\n\n✅ Data integrity check passed for sampled stocks.")
+        print(f"❌ Issues: {counts}")
+        cols = ['status', 'ticker', 'date', 'fields', 'max_dev', 'db_close', 'ref_close']
+        print(mismatches[cols].head(50).to_string(index=False))
+
+    if output:
+        mismatches.to_csv(output, index=False)
+        print(f"Mismatch table written to {output}")
+
+    if fix and not mismatches.empty:
+        from app.fetcher import process_stock_data
+        repair(db, mismatches, indicators=process_stock_data)
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--tickers", nargs="+", help="Default: every ticker in stocks")
+    parser.add_argument("--bhavcopy", nargs="+", help="Reference from bhavcopy CSV files instead of the source")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=HISTORY_RATE, help="Source calls per second (0 = unlimited)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--repair", action="store_true", help="Overwrite / insert DB bars from the reference")
+    parser.add_argument("--output", help="Write the mismatch table to this CSV")
+    args = parser.parse_args()
+
+    with instrument.run("verify_data"):
+        verify_integrity(days=args.days, tickers=args.tickers, bhavcopy=args.bhavcopy, workers=args.workers,
+                         rate=args.rate, tolerance=args.tolerance, fix=args.repair, output=args.output)
 
 if __name__ == "__main__":
-    verify_integrity()
+    main()